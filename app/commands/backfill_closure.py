@@ -0,0 +1,84 @@
+"""
+Builds the transaction_closure table for transactions written without the closure hierarchy mode.
+
+    python -m app.commands.backfill_closure [--chunk-size 10000] [--rebuild]
+
+The table is built top-down one tree level at a time (see schema.backfill_by_level): the rows of a level are its
+self rows plus the rows of the level above extended to the children, kept in a temporary table, so every closure
+row is computed once by a set based INSERT ... SELECT, in committed ranges of `chunk-size` ids of the level.
+Rows that already exist are skipped, the command can be interrupted and run again.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.commands.schema import backfill_by_level
+from app.database.db import get_engine
+from app.model.transection import TransactionClosure
+
+# closure rows of the previous level and of the level being filled
+CLOSURE_TABLES = {
+    "backfill_closure_level": "(ancestor_id BIGINT, descendant_id BIGINT, PRIMARY KEY (descendant_id, ancestor_id))",
+    "backfill_closure_next": "(ancestor_id BIGINT, descendant_id BIGINT, PRIMARY KEY (descendant_id, ancestor_id))",
+}
+
+LEVEL_ROWS_QUERY = text("""
+    INSERT INTO backfill_closure_next (ancestor_id, descendant_id)
+    SELECT r.ancestor_id, t.id
+    FROM backfill_level l
+    INNER JOIN transactions t ON t.id = l.id
+    INNER JOIN backfill_closure_level r ON r.descendant_id = t.parent_id
+    WHERE l.id >= :low AND l.id < :high
+    UNION ALL
+    SELECT l.id, l.id FROM backfill_level l WHERE l.id >= :low AND l.id < :high;
+""")
+
+CLOSURE_ROWS_QUERY = text("""
+    INSERT INTO transaction_closure (ancestor_id, descendant_id)
+    SELECT n.ancestor_id, n.descendant_id FROM backfill_closure_next n
+    WHERE n.descendant_id >= :low AND n.descendant_id < :high
+      AND NOT EXISTS (
+          SELECT 1 FROM transaction_closure existing
+          WHERE existing.ancestor_id = n.ancestor_id AND existing.descendant_id = n.descendant_id
+      );
+""")
+
+# the rows of the completed level are the parents' rows of the next one
+NEXT_LEVEL_QUERIES = [
+    text("DELETE FROM backfill_closure_level"),
+    text("INSERT INTO backfill_closure_level (ancestor_id, descendant_id) "
+         "SELECT ancestor_id, descendant_id FROM backfill_closure_next"),
+    text("DELETE FROM backfill_closure_next"),
+]
+
+
+def backfill_closure(bind, chunk_size: int, rebuild: bool = False) -> int:
+    """
+    :param bind: engine of the database
+    :param chunk_size: max number of transactions of a level whose rows are inserted per DB transaction
+    :param rebuild: drop the existing closure rows first
+    :return: number of closure rows inserted
+    """
+    TransactionClosure.__table__.create(bind=bind, checkfirst=True)
+    if rebuild:
+        with bind.begin() as connection:
+            connection.execute(text("DELETE FROM transaction_closure"))
+    return backfill_by_level(bind, [CLOSURE_ROWS_QUERY], [CLOSURE_ROWS_QUERY], chunk_size,
+                             temporary_tables=CLOSURE_TABLES, scratch_queries=[LEVEL_ROWS_QUERY],
+                             level_end_queries=NEXT_LEVEL_QUERIES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the transaction_closure table from parent_id links")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--rebuild", action="store_true", help="delete the existing closure rows first")
+    args = parser.parse_args(argv)
+    engine = get_engine()
+
+    print(f"inserted {backfill_closure(engine, args.chunk_size, args.rebuild)} closure row(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
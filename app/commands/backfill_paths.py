@@ -0,0 +1,72 @@
+"""
+Migration/backfill for the materialized path hierarchy mode.
+
+    python -m app.commands.backfill_paths [--chunk-size 10000]
+
+Adds the path column and its index when missing, then derives the path of every transaction from the
+parent_id links, top-down one tree level at a time: the roots first, then the children of the rows filled by
+the previous level, in committed ranges of `chunk-size` ids of the level (see schema.backfill_by_level).
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.commands.schema import add_missing_column, backfill_by_level, create_missing_index
+from app.database.db import get_engine
+from app.model.transection import Transaction
+
+ROOT_PATHS_QUERY = text("""
+    UPDATE transactions SET path = '/' || CAST(id AS VARCHAR) || '/'
+    WHERE path IS NULL AND id IN (SELECT id FROM backfill_level WHERE id >= :low AND id < :high);
+""")
+
+CHILD_PATHS_QUERY = text("""
+    UPDATE transactions
+    SET path = (SELECT p.path FROM transactions p WHERE p.id = transactions.parent_id) || CAST(id AS VARCHAR) || '/'
+    WHERE path IS NULL AND id IN (SELECT id FROM backfill_level WHERE id >= :low AND id < :high)
+      AND EXISTS (SELECT 1 FROM transactions p WHERE p.id = transactions.parent_id AND p.path IS NOT NULL);
+""")
+
+
+def ensure_path_column(bind) -> bool:
+    added = add_missing_column(bind, "transactions", "path", "VARCHAR")
+    path_index = next(index for index in Transaction.__table__.indexes if index.name == "ix_transactions_path")
+    create_missing_index(bind, path_index)
+    return added
+
+
+def backfill_paths(bind, chunk_size: int) -> int:
+    """
+    :param bind: engine of the database
+    :param chunk_size: max number of transactions of a level updated per DB transaction
+    :return: number of rows updated
+    """
+    return backfill_by_level(bind, [ROOT_PATHS_QUERY], [CHILD_PATHS_QUERY], chunk_size)
+
+
+def count_missing_paths(bind) -> int:
+    with bind.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM transactions WHERE path IS NULL")).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the materialized path of every transaction")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+    engine = get_engine()
+
+    if ensure_path_column(engine):
+        print("added missing path column")
+    print(f"backfilled {backfill_paths(engine, args.chunk_size)} path(s)")
+
+    missing = count_missing_paths(engine)
+    if missing:
+        # only possible for parent_id links pointing to missing rows or forming a cycle
+        print(f"{missing} transaction(s) could not be reached from a root")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Migration/backfill for the root_id and depth columns.
+
+    python -m app.commands.backfill_tree_columns [--chunk-size 10000]
+
+Adds the columns and the (root_id, depth) index when missing, then derives the root and the depth of every
+transaction from the parent_id links, top-down one tree level at a time, in committed ranges of `chunk-size` ids
+of the level (see schema.backfill_by_level).
+Set TREE_COLUMNS_BACKFILLED once it reports every row as reached.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.commands.schema import add_missing_column, backfill_by_level, create_missing_index
+from app.database.db import get_engine
+from app.model.transection import Transaction
+
+ROOT_POSITIONS_QUERY = text("""
+    UPDATE transactions SET root_id = id, depth = 0
+    WHERE root_id IS NULL AND id IN (SELECT id FROM backfill_level WHERE id >= :low AND id < :high);
+""")
+
+CHILD_POSITIONS_QUERY = text("""
+    UPDATE transactions
+    SET root_id = (SELECT p.root_id FROM transactions p WHERE p.id = transactions.parent_id),
+        depth = (SELECT p.depth + 1 FROM transactions p WHERE p.id = transactions.parent_id)
+    WHERE root_id IS NULL AND id IN (SELECT id FROM backfill_level WHERE id >= :low AND id < :high)
+      AND EXISTS (SELECT 1 FROM transactions p WHERE p.id = transactions.parent_id AND p.root_id IS NOT NULL);
+""")
+
+
+def ensure_tree_columns(bind) -> bool:
+    added = add_missing_column(bind, "transactions", "root_id", "BIGINT")
+    added = add_missing_column(bind, "transactions", "depth", "INTEGER") or added
+    root_index = next(index for index in Transaction.__table__.indexes if index.name == "ix_transactions_root_depth")
+    create_missing_index(bind, root_index)
+    return added
+
+
+def backfill_tree_columns(bind, chunk_size: int) -> int:
+    """
+    :param bind: engine of the database
+    :param chunk_size: max number of transactions of a level updated per DB transaction
+    :return: number of rows updated
+    """
+    return backfill_by_level(bind, [ROOT_POSITIONS_QUERY], [CHILD_POSITIONS_QUERY], chunk_size)
+
+
+def count_missing_positions(bind) -> int:
+    with bind.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM transactions WHERE root_id IS NULL")).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the root_id and depth of every transaction")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+    engine = get_engine()
+
+    if ensure_tree_columns(engine):
+        print("added missing root_id/depth columns")
+    print(f"backfilled {backfill_tree_columns(engine, args.chunk_size)} transaction(s)")
+
+    missing = count_missing_positions(engine)
+    if missing:
+        # only possible for parent_id links pointing to missing rows or forming a cycle
+        print(f"{missing} transaction(s) could not be reached from a root")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
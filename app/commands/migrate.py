@@ -0,0 +1,136 @@
+"""
+Versioned schema migrations, run once per deploy before the workers start (the service no longer creates
+its tables at startup).
+
+    python -m app.commands.migrate             # apply the pending migrations
+    python -m app.commands.migrate --status    # list the applied and pending migrations
+    python -m app.commands.migrate --to 3      # stop after version 3
+
+The applied versions are recorded in the schema_migrations table. Every migration checks the catalog before
+changing it (schema.add_missing_column / create_missing_index / drop_existing_index, CREATE TABLE ... checkfirst),
+so a database created by an older version of the service is adopted by recording the steps it already has,
+and a migration interrupted half way can simply be run again. The DDL is committed statement by statement.
+
+Migrations only change the schema, the existing rows are filled by the backfill commands:
+subtree_sums rebuild, backfill_paths, type_stats, backfill_tree_columns and backfill_closure.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import (BigInteger, Column, DateTime, Double, ForeignKey, Integer, MetaData, String, Table, select,
+                        text)
+
+from app.commands.backfill_paths import ensure_path_column
+from app.commands.backfill_tree_columns import ensure_tree_columns
+from app.commands.subtree_sums import ensure_subtree_sum_column, ensure_version_column
+from app.commands.type_stats import drop_type_index, ensure_type_stats_schema
+from app.database.db import get_engine
+
+# key of the postgres advisory lock held while migrating, two deploys cannot run the same DDL concurrently
+MIGRATION_LOCK_ID = 72_615_011
+
+_versions = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _versions,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# the tables as first released, frozen here: the columns and indexes added later have their own migration
+_initial = MetaData()
+Table(
+    "transactions", _initial,
+    Column("id", BigInteger, primary_key=True, index=True),
+    Column("amount", Double, nullable=False),
+    Column("type", String, index=True, nullable=False),
+    Column("parent_id", BigInteger, ForeignKey("transactions.id"), nullable=True),
+)
+Table(
+    "transaction_closure", _initial,
+    Column("ancestor_id", BigInteger, ForeignKey("transactions.id"), primary_key=True),
+    Column("descendant_id", BigInteger, ForeignKey("transactions.id"), primary_key=True),
+)
+
+
+def create_initial_tables(bind):
+    _initial.create_all(bind=bind, checkfirst=True)
+
+
+# (version, name, migration), in order, never renumber or edit a released migration: append a new one
+MIGRATIONS = [
+    (1, "transactions and transaction_closure tables", create_initial_tables),
+    (2, "subtree_sum aggregate column", ensure_subtree_sum_column),
+    (3, "materialized path column and index", ensure_path_column),
+    (4, "transaction_type_stats aggregate table and (type, id) index", ensure_type_stats_schema),
+    (5, "version column of the /sum ETag", ensure_version_column),
+    (6, "root_id/depth columns and (root_id, depth) index", ensure_tree_columns),
+    (7, "drop the type index covered by the (type, id) index", drop_type_index),
+]
+
+
+def applied_versions(bind) -> set:
+    schema_migrations.create(bind=bind, checkfirst=True)
+    with bind.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(bind, target: int = None) -> list:
+    """
+    :param bind: engine of the database
+    :param target: last version to apply, the latest when None
+    :return: the (version, name, migration) not applied yet, in order
+    """
+    applied = applied_versions(bind)
+    return [migration for migration in MIGRATIONS
+            if migration[0] not in applied and (target is None or migration[0] <= target)]
+
+
+def migrate(bind, target: int = None) -> list:
+    """
+    Applies the pending migrations in order, each one is recorded once its DDL went through.
+
+    :param bind: engine of the database
+    :param target: last version to apply, the latest when None
+    :return: the (version, name) applied
+    """
+    with bind.connect() as lock:
+        if bind.dialect.name == "postgresql":
+            lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock.commit()
+        try:
+            applied = []
+            for version, name, migration in pending_migrations(bind, target):
+                migration(bind)
+                with bind.begin() as connection:
+                    connection.execute(schema_migrations.insert().values(
+                        version=version, name=name, applied_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+                applied.append((version, name))
+            return applied
+        finally:
+            if bind.dialect.name == "postgresql":
+                lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the versioned schema migrations")
+    parser.add_argument("--to", type=int, default=None, help="last version to apply, the latest by default")
+    parser.add_argument("--status", action="store_true", help="list the migrations without applying them")
+    args = parser.parse_args(argv)
+    engine = get_engine()
+
+    if args.status:
+        applied = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in applied else 'pending':<8} {name}")
+        return 0
+
+    for version, name in migrate(engine, args.to):
+        print(f"applied {version}: {name}")
+    print(f"schema at version {max(applied_versions(engine), default=0)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Optional hash partitioning of the transactions table by root_id (postgres only).
+
+    python -m app.commands.partition_by_root --partitions 16            # print the DDL
+    python -m app.commands.partition_by_root --partitions 16 --apply    # run it in one DB transaction
+
+Every tree lives in a single partition, so the tree walks of the service (SUM_STRATEGY=tree, GET /tree of a
+root) only touch the indexes of one partition and very large deployments keep the hot indexes in memory.
+The data is copied into a new partitioned table, the old table is kept as transactions_unpartitioned.
+
+Postgres requires the partition key in every unique constraint of a partitioned table:
+    - the primary key becomes (root_id, id), the id is only unique inside a tree at the database level.
+      The existence checks of the create paths still reject duplicate ids, but SINGLE_STATEMENT_CREATE
+      (ON CONFLICT (id)) cannot be used on the partitioned table.
+    - foreign keys to transactions(id) (parent_id, transaction_closure) are dropped.
+Run app.commands.backfill_tree_columns first, every row needs its root_id. Pause writes while it runs.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.commands.backfill_tree_columns import count_missing_positions
+from app.database.db import get_engine
+
+
+def partition_statements(partitions: int) -> list:
+    """
+    :param partitions: number of hash partitions
+    :return: DDL/DML statements, in order
+    """
+    statements = [
+        "CREATE TABLE transactions_partitioned (LIKE transactions INCLUDING DEFAULTS) PARTITION BY HASH (root_id)",
+        "ALTER TABLE transactions_partitioned ADD PRIMARY KEY (root_id, id)",
+    ]
+    statements.extend(
+        f"CREATE TABLE transactions_p{remainder} PARTITION OF transactions_partitioned "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    )
+    statements.extend([
+        # same columns in the same order, LIKE copies the definition of the source table
+        "INSERT INTO transactions_partitioned SELECT * FROM transactions",
+        "ALTER TABLE transaction_closure DROP CONSTRAINT IF EXISTS transaction_closure_ancestor_id_fkey",
+        "ALTER TABLE transaction_closure DROP CONSTRAINT IF EXISTS transaction_closure_descendant_id_fkey",
+        "ALTER TABLE transactions RENAME TO transactions_unpartitioned",
+        "ALTER INDEX IF EXISTS ix_transactions_id RENAME TO ix_transactions_unpartitioned_id",
+        "ALTER INDEX IF EXISTS ix_transactions_type RENAME TO ix_transactions_unpartitioned_type",
+        "ALTER INDEX IF EXISTS ix_transactions_path RENAME TO ix_transactions_unpartitioned_path",
+        "ALTER INDEX IF EXISTS ix_transactions_type_id RENAME TO ix_transactions_unpartitioned_type_id",
+        "ALTER INDEX IF EXISTS ix_transactions_root_depth RENAME TO ix_transactions_unpartitioned_root_depth",
+        "ALTER TABLE transactions_partitioned RENAME TO transactions",
+        # the indexes of the model, created on every partition
+        "CREATE INDEX ix_transactions_id ON transactions (id)",
+        "CREATE INDEX ix_transactions_path ON transactions (path text_pattern_ops)",
+        "CREATE INDEX ix_transactions_type_id ON transactions (type, id) INCLUDE (amount)",
+        "CREATE INDEX ix_transactions_root_depth ON transactions (root_id, depth) INCLUDE (amount, parent_id)",
+    ])
+    return statements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hash partition the transactions table by root_id (postgres)")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--apply", action="store_true", help="run the statements instead of printing them")
+    args = parser.parse_args(argv)
+
+    statements = partition_statements(args.partitions)
+    if not args.apply:
+        print(";\n".join(statements) + ";")
+        return 0
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        print(f"hash partitioning needs postgres, not {engine.dialect.name}")
+        return 1
+    missing = count_missing_positions(engine)
+    if missing:
+        print(f"{missing} transaction(s) without root_id, run app.commands.backfill_tree_columns first")
+        return 1
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    print(f"transactions partitioned in {args.partitions} partition(s), previous table kept as "
+          f"transactions_unpartitioned")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
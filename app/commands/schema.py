@@ -0,0 +1,114 @@
+"""
+Helpers used by the maintenance commands to upgrade tables created by an older version of the service.
+"""
+from sqlalchemy import inspect, text
+
+# upper bound of the last id range of a level, the ids are BIGINT
+MAX_ID = 2 ** 63 - 1
+
+
+def add_missing_column(bind, table: str, column: str, ddl: str) -> bool:
+    """
+    :param bind: engine of the database
+    :param table: table name
+    :param column: column name
+    :param ddl: column definition used by ALTER TABLE ... ADD COLUMN
+    :return: True if the column had to be added
+    """
+    columns = {existing["name"] for existing in inspect(bind).get_columns(table)}
+    if column in columns:
+        return False
+    with bind.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+
+def create_missing_index(bind, index) -> bool:
+    """
+    :param bind: engine of the database
+    :param index: sqlalchemy Index declared on a model
+    :return: True if the index had to be created
+    """
+    indexes = {existing["name"] for existing in inspect(bind).get_indexes(index.table.name)}
+    if index.name in indexes:
+        return False
+    index.create(bind=bind)
+    return True
+
+
+def drop_existing_index(bind, table: str, name: str) -> bool:
+    """
+    :param bind: engine of the database
+    :param table: table name
+    :param name: index name
+    :return: True if the index had to be dropped
+    """
+    indexes = {existing["name"] for existing in inspect(bind).get_indexes(table)}
+    if name not in indexes:
+        return False
+    with bind.begin() as connection:
+        connection.execute(text(f"DROP INDEX {name}"))
+    return True
+
+
+def backfill_by_level(bind, root_queries: list, child_queries: list, chunk_size: int,
+                      temporary_tables: dict = None, scratch_queries: list = (), level_end_queries: list = ()) -> int:
+    """
+    Runs backfill UPDATE/INSERT statements over the transactions, top-down one tree level at a time, so every row
+    is written once from its parent, which was completed by the previous level.
+
+    The ids of the level being filled are kept in the temporary table backfill_level, the queries receive an id
+    range of that level as :low (inclusive) and :high (exclusive), at most `chunk_size` ids per range and one
+    committed DB transaction per range, so memory stays flat and locks stay short.
+    Rows not reachable from a root (parent missing or parent cycle) are never visited.
+
+    :param bind: engine of the database
+    :param root_queries: queries filling the roots (level 0)
+    :param child_queries: queries filling the following levels from their parents
+    :param temporary_tables: name -> column definitions of the temporary tables used by the queries
+    :param scratch_queries: queries run on every range before the others and not counted, e.g. for the
+                            temporary tables
+    :param level_end_queries: queries run once a level is complete
+    :param chunk_size: max number of level ids per range
+    :return: number of rows changed
+    """
+    tables = {"backfill_level": "(id BIGINT PRIMARY KEY)", "backfill_next_level": "(id BIGINT PRIMARY KEY)",
+              **(temporary_tables or {})}
+    changed = 0
+    with bind.connect() as connection:
+        for name, columns in tables.items():
+            connection.execute(text(f"CREATE TEMPORARY TABLE {name} {columns}"))
+        try:
+            connection.execute(text("INSERT INTO backfill_level (id) SELECT id FROM transactions "
+                                    "WHERE parent_id IS NULL"))
+            connection.commit()
+            queries = root_queries
+            while True:
+                low = connection.execute(text("SELECT MIN(id) FROM backfill_level")).scalar()
+                if low is None:
+                    return changed
+                while low is not None:
+                    high = connection.execute(text("SELECT id FROM backfill_level WHERE id >= :low ORDER BY id "
+                                                   "LIMIT 1 OFFSET :size"), {"low": low, "size": chunk_size}).scalar()
+                    bounds = {"low": low, "high": high if high is not None else MAX_ID}
+                    for query in scratch_queries:
+                        connection.execute(query, bounds)
+                    for query in queries:
+                        changed += connection.execute(query, bounds).rowcount
+                    connection.commit()
+                    low = high
+                for query in level_end_queries:
+                    connection.execute(query)
+                # the children of the level become the next level
+                connection.execute(text("DELETE FROM backfill_next_level"))
+                connection.execute(text("INSERT INTO backfill_next_level (id) SELECT t.id FROM transactions t "
+                                        "INNER JOIN backfill_level l ON t.parent_id = l.id"))
+                connection.execute(text("DELETE FROM backfill_level"))
+                connection.execute(text("INSERT INTO backfill_level (id) SELECT id FROM backfill_next_level"))
+                connection.commit()
+                queries = child_queries
+        finally:
+            connection.rollback()
+            for name in tables:
+                connection.execute(text(f"DROP TABLE {name}"))
+            connection.commit()
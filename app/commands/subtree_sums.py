@@ -0,0 +1,134 @@
+"""
+Offline maintenance for the persisted subtree_sum aggregate.
+
+    python -m app.commands.subtree_sums verify    # report drift, exit code 1 if any
+    python -m app.commands.subtree_sums rebuild   # recompute every total and fix drift
+
+Totals are recomputed from the parent_id links only, so the command can be used to
+check that the incremental updates done by the create path were not lost under concurrent writes.
+Run rebuild while writes are paused, otherwise rows created during the run are not accounted for.
+"""
+import argparse
+import sys
+from collections import deque
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.commands.schema import add_missing_column
+from app.database.db import SessionLocal, get_engine
+
+TOLERANCE = 1e-6
+UPDATE_CHUNK_SIZE = 1000
+
+# the version is bumped as well so cached /sum responses of the fixed rows are revalidated (ETag)
+REBUILD_QUERY = text("UPDATE transactions SET subtree_sum = :subtree_sum, version = version + 1 WHERE id = :id")
+
+
+def ensure_subtree_sum_column(bind):
+    """
+    Adds the subtree_sum column to a transactions table created before the aggregate existed.
+
+    :param bind: engine or connection of the database
+    :return: True if the column had to be added
+    """
+    return add_missing_column(bind, "transactions", "subtree_sum", "DOUBLE PRECISION NOT NULL DEFAULT 0")
+
+
+def ensure_version_column(bind):
+    """
+    Adds the version column bumped with subtree_sum on the ancestor chain (ETag of GET /sum/{id}).
+    """
+    return add_missing_column(bind, "transactions", "version", "BIGINT NOT NULL DEFAULT 0")
+
+
+def compute_subtree_sums(rows) -> dict:
+    """
+    Recomputes the subtree totals bottom-up from (id, parent_id, amount) rows.
+    O(n) - every node is visited once, starting from the leaves.
+
+    :param rows: iterable of (id, parent_id, amount)
+    :return: dict id -> expected subtree sum
+    """
+    parents = {}
+    totals = {}
+    for transaction_id, parent_id, amount in rows:
+        parents[transaction_id] = parent_id
+        totals[transaction_id] = amount
+
+    pending_children = dict.fromkeys(totals, 0)
+    for parent_id in parents.values():
+        if parent_id in pending_children:
+            pending_children[parent_id] += 1
+
+    queue = deque(transaction_id for transaction_id, count in pending_children.items() if count == 0)
+    while queue:
+        transaction_id = queue.popleft()
+        parent_id = parents[transaction_id]
+        if parent_id not in totals:
+            continue
+        totals[parent_id] += totals[transaction_id]
+        pending_children[parent_id] -= 1
+        if pending_children[parent_id] == 0:
+            queue.append(parent_id)
+    return totals
+
+
+def find_drift(db: Session) -> list:
+    """
+    :param db: SQL session object for database operations.
+    :return: list of (id, stored subtree_sum, expected subtree_sum) for every row that drifted
+    """
+    rows = db.execute(
+        text("SELECT id, parent_id, amount, subtree_sum FROM transactions")
+    ).all()
+    expected = compute_subtree_sums((row.id, row.parent_id, row.amount) for row in rows)
+    return [
+        (row.id, row.subtree_sum, expected[row.id])
+        for row in rows
+        if abs((row.subtree_sum or 0.0) - expected[row.id]) > TOLERANCE
+    ]
+
+
+def rebuild(db: Session, drift: list):
+    """
+    Writes the expected totals for the drifted rows in chunks and commits once.
+    """
+    for start in range(0, len(drift), UPDATE_CHUNK_SIZE):
+        chunk = drift[start:start + UPDATE_CHUNK_SIZE]
+        db.execute(
+            REBUILD_QUERY,
+            [{"id": transaction_id, "subtree_sum": expected} for transaction_id, _, expected in chunk]
+        )
+    db.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify or rebuild the subtree_sum aggregate")
+    parser.add_argument("action", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+    engine = get_engine()
+
+    if ensure_subtree_sum_column(engine):
+        print("added missing subtree_sum column")
+    if ensure_version_column(engine):
+        print("added missing version column")
+
+    db = SessionLocal()
+    try:
+        drift = find_drift(db)
+        for transaction_id, stored, expected in drift:
+            print(f"transaction {transaction_id}: stored={stored} expected={expected}")
+        print(f"{len(drift)} transaction(s) with drifted subtree_sum")
+
+        if args.action == "rebuild" and drift:
+            rebuild(db, drift)
+            print(f"rebuilt {len(drift)} transaction(s)")
+            return 0
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Migration/rebuild of the per type aggregate read by GET /types/{type}/stats.
+
+    python -m app.commands.type_stats
+
+Creates the transaction_type_stats table and the (type, id) INCLUDE (amount) index when missing, then recomputes
+every aggregate from the transactions table in one DB transaction. Run it while writes are paused, then enable
+TYPE_STATS_ENABLED: the creates committed between the rebuild and the restart would be missing from the aggregate.
+"""
+import sys
+
+from sqlalchemy import text
+
+from app.commands.schema import create_missing_index, drop_existing_index
+from app.database.db import get_engine
+from app.model.transection import Transaction, TransactionTypeStats
+
+REBUILD_QUERY = text("""
+    INSERT INTO transaction_type_stats (type, count, total, min_amount, max_amount)
+    SELECT type, COUNT(*), SUM(amount), MIN(amount), MAX(amount) FROM transactions GROUP BY type;
+""")
+
+
+def ensure_type_stats_schema(bind):
+    TransactionTypeStats.__table__.create(bind=bind, checkfirst=True)
+    type_index = next(index for index in Transaction.__table__.indexes if index.name == "ix_transactions_type_id")
+    create_missing_index(bind, type_index)
+
+
+def drop_type_index(bind) -> bool:
+    # the single column index on type of the first release, every lookup by type is a prefix of (type, id)
+    return drop_existing_index(bind, "transactions", "ix_transactions_type")
+
+
+def rebuild_type_stats(bind) -> int:
+    """
+    :param bind: engine of the database
+    :return: number of types
+    """
+    with bind.begin() as connection:
+        connection.execute(text("DELETE FROM transaction_type_stats"))
+        return connection.execute(REBUILD_QUERY).rowcount
+
+
+def main(argv=None):
+    engine = get_engine()
+    ensure_type_stats_schema(engine)
+    print(f"rebuilt the aggregate of {rebuild_type_stats(engine)} type(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Service level configuration, every value can be overridden through environment variables.
+"""
+import os
+
+# sync  -> sync engine, routes run on the starlette threadpool
+# async -> AsyncEngine (asyncpg / aiosqlite) and async routes, see app/route/transection_async.py
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# sql    -> SQLAlchemy session per request (app/repository/sql.py)
+# memory -> process wide in memory store (app/repository/memory.py), only used by the sync routes
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sql")
+# append only log of the memory backend, empty keeps the store volatile; the snapshot is written next to it
+MEMORY_LOG_PATH = os.getenv("MEMORY_LOG_PATH", "")
+MEMORY_SNAPSHOT_EVERY = int(os.getenv("MEMORY_SNAPSHOT_EVERY", "10000"))
+MEMORY_FSYNC = os.getenv("MEMORY_FSYNC", "false").lower() == "true"
+
+# Connection pool of the primary engine (DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# seconds after which a pooled connection is replaced, -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# connections opened by every worker at startup (capped to the pool size), 0 connects on the first request
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+# Read replicas (REPLICA_DATABASE_URLS, see app/database/db.py): pool of every replica engine and how reads pick one
+# round_robin | least_connections (fewest connections checked out of the replica pool)
+REPLICA_POLICY = os.getenv("REPLICA_POLICY", "round_robin")
+REPLICA_POOL_SIZE = int(os.getenv("REPLICA_POOL_SIZE", str(DB_POOL_SIZE)))
+REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+REPLICA_POOL_PRE_PING = os.getenv("REPLICA_POOL_PRE_PING", str(DB_POOL_PRE_PING)).lower() == "true"
+REPLICA_POOL_RECYCLE = int(os.getenv("REPLICA_POOL_RECYCLE", str(DB_POOL_RECYCLE)))
+# after a write the client reads from the primary for this long, to hide the replication lag
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# How the parent child relation is stored by PUT /transaction/{id}
+# adjacency -> create (parent_id link only)
+# closure   -> create_v2 (parent_id link + transaction_closure rows)
+# path      -> create_with_path (parent_id link + materialized path, backfill with app.commands.backfill_paths)
+HIERARCHY_MODE = os.getenv("HIERARCHY_MODE", "adjacency")
+
+# PUT /transaction/{id} as one INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, the duplicate id and missing
+# parent checks are part of the statement instead of two reads before the insert (transection.insert_transaction)
+SINGLE_STATEMENT_CREATE = os.getenv("SINGLE_STATEMENT_CREATE", "false").lower() == "true"
+
+# Group commit of PUT /transaction/{id} (app/services/coalescer.py): concurrent creates are collected for up to
+# WRITE_BATCH_WINDOW_MS or WRITE_BATCH_MAX_SIZE items and committed together,
+# takes precedence over SINGLE_STATEMENT_CREATE
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "false").lower() == "true"
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX_SIZE = int(os.getenv("WRITE_BATCH_MAX_SIZE", "100"))
+
+# Strategy used by GET /sum/{id} to compute the total of a transaction tree
+# batched   -> calculate_sum_batched (level by level walk, one query per level)
+# queue     -> calculate_sum (level by level walk, one query per node)
+# recursive -> calculate_sum_v2 (recursive CTE)
+# closure   -> calculate_sum_using_closure (requires create_v2 writes)
+# aggregate -> calculate_sum_from_aggregate (persisted subtree_sum column)
+# path      -> calculate_sum_using_path (prefix scan of the path index, requires path writes)
+# tree      -> calculate_sum_in_tree (root_id/depth index: one aggregate for a root, one range per level otherwise,
+#              requires TREE_COLUMNS_BACKFILLED)
+SUM_STRATEGY = os.getenv("SUM_STRATEGY", "batched")
+
+# Set once `python -m app.commands.backfill_tree_columns` has filled root_id/depth of the existing rows:
+# bfs exports of a root (GET /tree/{id}) then read one (root_id, depth) index range instead of a recursive CTE,
+# and SUM_STRATEGY=tree reads the index instead of falling back to the batched walk
+TREE_COLUMNS_BACKFILLED = os.getenv("TREE_COLUMNS_BACKFILLED", "false").lower() == "true"
+
+# Read path of GET /transaction/{id} and GET /types/{type}
+# orm  -> ORM Transaction instances validated through the Response model
+# core -> Core select of plain row tuples encoded straight to JSON bytes (orjson when installed), no model validation
+READ_PATH = os.getenv("READ_PATH", "orm")
+
+# Max number of values bound into a single IN (...) clause, kept under the sqlite/postgres bind parameter limits
+QUERY_CHUNK_SIZE = int(os.getenv("QUERY_CHUNK_SIZE", "500"))
+
+# Upper bound for the `limit` of keyset paginated listings
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Per type count/sum/min/max table kept up to date by the create paths, read by GET /types/{type}/stats.
+# When disabled the stats are aggregated from the (type, id, amount) index. The migration creates the table empty:
+# fill it with `python -m app.commands.type_stats` while writes are paused, then enable it. Every create upserts
+# the row of its type in its DB transaction, so concurrent creates of the same type queue on that row
+TYPE_STATS_ENABLED = os.getenv("TYPE_STATS_ENABLED", "false").lower() == "true"
+
+# Max number of ids of a POST /sums request
+MAX_SUM_IDS = int(os.getenv("MAX_SUM_IDS", "1000"))
+
+# Rows fetched per round trip through the server side cursor of the NDJSON streaming endpoints
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# In process read-through cache in front of /transaction, /types and /sum (app/services/cache.py).
+# Every worker keeps its own copy, CACHE_TTL_SECONDS bounds how stale a worker can be after a write on another one
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").lower() == "true"
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+# Per request SQL instrumentation and the Prometheus /metrics endpoint (app/metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Requests slower than this are logged with their query count and SQL time, 0 disables the log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Requests issuing at least this many queries are logged as possible N+1 patterns, 0 disables the log
+N_PLUS_ONE_QUERY_THRESHOLD = int(os.getenv("N_PLUS_ONE_QUERY_THRESHOLD", "50"))
+
+# gzip (or brotli when the brotli package is installed) of the responses of at least COMPRESSION_MIN_SIZE bytes,
+# see app/route/compression.py
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "false").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
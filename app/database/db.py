@@ -1,21 +1,242 @@
+import contextlib
 import os
+import threading
+import time
 
-from sqlalchemy import create_engine
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.config import settings
+from app.database.routing import ReplicaSet, RoutingSession
+from app.metrics.instrumentation import instrument_engine
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
+# async driver url, derived from DATABASE_URL when not set (postgresql -> asyncpg, sqlite -> aiosqlite)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+# comma separated urls of read replicas of DATABASE_URL, the sync sessions read from them (app/database/routing.py)
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+
+# set on the responses of writes, the client reads from the primary until the timestamp it holds
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Swaps the sync driver of a database url with its async counterpart.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def engine_options(url: str, pool_size: int, max_overflow: int, pre_ping: bool, recycle: int) -> dict:
+    """
+    Pool options of an engine, the size and overflow are left out when the default pool of the dialect
+    is not a queue pool (in memory sqlite, aiosqlite files) and does not accept them.
+    """
+    options = {"pool_pre_ping": pre_ping, "pool_recycle": recycle}
+    parsed = make_url(url)
+    if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        options.update(pool_size=pool_size, max_overflow=max_overflow)
+    return options
 
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
+# The engines are built on first use (init_engines), by the lifespan of the app or by the commands, so importing
+# the service neither connects nor fails on a bad DATABASE_URL. The session factories are bound by init_engines.
+engine = None
+replica_engines = []
+replicas = ReplicaSet([])
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+# The async engine is only built in async mode so the sync deployment does not need the async drivers
+async_engine = None
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_init_lock = threading.Lock()
+
+
+def init_engines():
+    """
+    Builds the primary, replica and (DB_MODE=async) async engines and binds the session factories.
+    Idempotent, the engines are only built once per process.
+
+    :return: the primary engine
+    """
+    global engine, replica_engines, replicas, async_engine
+    with _init_lock:
+        if engine is not None:
+            return engine
+        # built into locals and published together, a failure disposes what was already built
+        built = []
+        try:
+            primary = create_engine(DATABASE_URL, **engine_options(
+                DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_PRE_PING,
+                settings.DB_POOL_RECYCLE))
+            built.append(primary)
+            new_replica_engines = []
+            for url in REPLICA_DATABASE_URLS:
+                new_replica_engines.append(create_engine(url, **engine_options(
+                    url, settings.REPLICA_POOL_SIZE, settings.REPLICA_MAX_OVERFLOW, settings.REPLICA_POOL_PRE_PING,
+                    settings.REPLICA_POOL_RECYCLE)))
+                built.append(new_replica_engines[-1])
+            new_async_engine = None
+            if settings.DB_MODE == "async":
+                async_url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+                new_async_engine = create_async_engine(async_url, **engine_options(
+                    async_url, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_PRE_PING,
+                    settings.DB_POOL_RECYCLE))
+        except Exception:
+            for sync_engine in built:
+                sync_engine.dispose()
+            raise
+
+        new_replicas = ReplicaSet(new_replica_engines, settings.REPLICA_POLICY)
+        SessionLocal.configure(bind=primary, replicas=new_replicas)
+        if new_async_engine is not None:
+            AsyncSessionLocal.configure(bind=new_async_engine)
+        if settings.METRICS_ENABLED:
+            instrument_engine(primary, "primary")
+            for number, replica_engine in enumerate(new_replica_engines):
+                instrument_engine(replica_engine, f"replica_{number}")
+            if new_async_engine is not None:
+                instrument_engine(new_async_engine.sync_engine, "primary_async")
+        replica_engines, replicas, async_engine = new_replica_engines, new_replicas, new_async_engine
+        engine = primary
+        return engine
+
+
+def get_engine():
+    """
+    Primary engine, built on first use.
+    """
+    return engine if engine is not None else init_engines()
+
+
+async def dispose_engines():
+    """
+    Closes the pooled connections of every engine, the next get_engine() builds them again.
+    The engines are detached under the lock and disposed after releasing it, the async dispose awaits.
+    """
+    global engine, replica_engines, replicas, async_engine
+    with _init_lock:
+        sync_engines = [engine] + replica_engines
+        old_async_engine = async_engine
+        engine, replica_engines, replicas, async_engine = None, [], ReplicaSet([]), None
+    for sync_engine in sync_engines:
+        if sync_engine is not None:
+            sync_engine.dispose()
+    if old_async_engine is not None:
+        await old_async_engine.dispose()
+
+
+def engines() -> dict:
+    """
+    :return: the engines built by init_engines by name, as labelled in the metrics
+    """
+    built = {}
+    if engine is not None:
+        built["primary"] = engine
+    for number, replica_engine in enumerate(replica_engines):
+        built[f"replica_{number}"] = replica_engine
+    if async_engine is not None:
+        built["primary_async"] = async_engine.sync_engine
+    return built
+
+
+def pool_state(sync_engine) -> dict:
+    """
+    :return: checked out / size / overflow of the pool of an engine, the counters its pool class keeps
+    """
+    pool = sync_engine.pool
+    state = {"pool": type(pool).__name__}
+    for metric in ("checkedout", "size", "overflow"):
+        # a method on queue pools, SingletonThreadPool has a plain `size` attribute
+        if callable(getattr(pool, metric, None)):
+            state[metric] = getattr(pool, metric)()
+    return state
+
+
+def warm_up_pool(sync_engine, connections: int) -> int:
+    """
+    Opens up to `connections` connections at once and returns them to the pool, so the first requests of a
+    worker do not pay for the connection setup. Capped to the size of the pool, the overflow is not kept.
+
+    :return: number of connections opened
+    """
+    size = getattr(sync_engine.pool, "size", None)
+    if callable(size):
+        connections = min(connections, size())
+    elif connections > 0:
+        # single connection or NullPool: one round trip checks the database is reachable
+        connections = 1
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = sync_engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+async def warm_up_async_pool(connections: int) -> int:
+    """
+    warm_up_pool of the async engine, the connections are opened concurrently.
+    """
+    size = getattr(async_engine.pool, "size", None)
+    connections = min(connections, size()) if callable(size) else min(connections, 1)
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(connections):
+            connection = await stack.enter_async_context(async_engine.connect())
+            await connection.execute(text("SELECT 1"))
+    return connections
+
+
+def read_primary_until(request: Request) -> float:
+    """
+    :return: timestamp of the write cookie, 0 when missing or not a number (the cookie comes from the client)
+    """
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0) or 0)
+    except ValueError:
+        return 0.0
+
+
+def get_db(request: Request, response: Response):
+    """
+    Request session, reads go to the replicas unless the client wrote within the last READ_YOUR_WRITES_SECONDS.
+    """
+    if engine is None and settings.STORAGE_BACKEND != "memory":
+        init_engines()
     db = SessionLocal()
+    if replicas.engines:
+        if read_primary_until(request) > time.time():
+            db.use_primary()
+        db.on_first_write = lambda: response.set_cookie(
+            READ_PRIMARY_COOKIE, str(time.time() + settings.READ_YOUR_WRITES_SECONDS),
+            max_age=int(settings.READ_YOUR_WRITES_SECONDS) + 1, httponly=True)
     try:
         yield db
     finally:
         db.close()
 
 
+async def get_async_db():
+    if async_engine is None:
+        init_engines()
+    async with AsyncSessionLocal() as db:
+        yield db
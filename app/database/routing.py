@@ -0,0 +1,126 @@
+"""
+Primary/replica routing of the SQL sessions.
+
+RoutingSession sends ORM flushes and INSERT/UPDATE/DELETE statements to the primary engine and every other
+statement to a replica picked by ReplicaSet. Once a session has written, or was asked to with use_primary(),
+all its following statements go to the primary, so a request always reads its own writes.
+"""
+import itertools
+import re
+import threading
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+# raw SQL writes, e.g. the recursive ancestor UPDATE of transection.ANCESTOR_SUMS_QUERY or SELECT ... FOR UPDATE
+WRITE_STATEMENT = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    return isinstance(clause, TextClause) and WRITE_STATEMENT.search(clause.text) is not None
+
+
+def checked_out_connections(engine) -> int:
+    pool = engine.pool
+    return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary, picked round robin or by the least checked out connections of their pools.
+    """
+    POLICIES = ("round_robin", "least_connections")
+
+    def __init__(self, engines: list, policy: str = "round_robin"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown replica policy '{policy}'")
+        self.engines = list(engines)
+        self.policy = policy
+        self._cycle = itertools.cycle(self.engines)
+        self._lock = threading.Lock()
+
+    def choose(self):
+        if self.policy == "least_connections":
+            return min(self.engines, key=checked_out_connections)
+        with self._lock:
+            return next(self._cycle)
+
+
+class RoutingSession(Session):
+
+    def __init__(self, replicas: ReplicaSet = None, **kwargs):
+        super().__init__(**kwargs)
+        self.replicas = replicas if replicas is not None and replicas.engines else None
+        self.primary_only = False
+        self.wrote = False
+        # replica of the current DB transaction, picked by its first read: the reads of a request see one snapshot
+        # and hold a single replica connection
+        self.replica = None
+        # called once, on the first write of the session, see database.db.get_db
+        self.on_first_write = None
+
+    def use_primary(self):
+        """
+        Sends every following statement of the session to the primary, e.g. the existence checks of a write.
+        """
+        self.primary_only = True
+
+    def record_write(self):
+        """
+        Sticks the session to the primary after a write, also called for writes done by another session
+        on behalf of this one (app/services/coalescer.py).
+        """
+        self.primary_only = True
+        if not self.wrote:
+            self.wrote = True
+            if self.on_first_write is not None:
+                self.on_first_write()
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self.replicas is None:
+            return primary
+        if self._flushing or is_write(clause):
+            self.record_write()
+            return primary
+        # without a statement the caller only needs the dialect, e.g. transection.build_insert_statement
+        if self.primary_only or clause is None:
+            return primary
+        if self.replica is None:
+            self.replica = self.replicas.choose()
+        return self.replica
+
+    def commit(self):
+        super().commit()
+        self.replica = None
+
+    def rollback(self):
+        super().rollback()
+        self.replica = None
+
+    def close(self):
+        super().close()
+        self.replica = None
+
+
+def use_primary(db: Session):
+    """
+    RoutingSession.use_primary for any session, plain sessions are already bound to the primary.
+    """
+    if isinstance(db, RoutingSession):
+        db.use_primary()
+
+
+def pinned_to_primary(db: Session) -> bool:
+    """
+    :return: True if the session reads from the primary although replicas are configured (read-your-writes)
+    """
+    return isinstance(db, RoutingSession) and db.replicas is not None and db.primary_only
+
+
+def record_write(db: Session):
+    if isinstance(db, RoutingSession):
+        db.record_write()
@@ -0,0 +1,184 @@
+"""
+Per request SQL instrumentation.
+
+SQLAlchemy engine events add every statement of a request (count, time, rows) and the time spent waiting
+for a pooled connection to a RequestStats object held in a context variable. MetricsMiddleware creates that
+object for each request and, once the response is sent, records it in the histograms served by /metrics
+under the route template (e.g. /transactionservice/sum/{transaction_id}).
+Requests slower than SLOW_REQUEST_MS, or issuing more than N_PLUS_ONE_QUERY_THRESHOLD queries, are logged.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from .prometheus import COUNT_BUCKETS, REGISTRY, Counter, Gauge, Histogram
+from ..config import settings
+
+logger = logging.getLogger("transactionservice.metrics")
+
+NO_ROUTE = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_seconds", "rows", "pool_wait_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+
+
+# mutable stats of the current request, shared with the threadpool workers through the copied context
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Handler latency", ("route", "method")))
+REQUEST_QUERIES = REGISTRY.register(Histogram(
+    "db_queries_per_request", "SQL statements issued per request", ("route",), COUNT_BUCKETS))
+REQUEST_SQL_TIME = REGISTRY.register(Histogram(
+    "db_sql_seconds_per_request", "Total SQL execution time per request", ("route",)))
+REQUEST_ROWS = REGISTRY.register(Histogram(
+    "db_rows_per_request", "Rows fetched or written per request, as reported by the driver", ("route",),
+    COUNT_BUCKETS))
+REQUEST_POOL_WAIT = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds_per_request", "Time spent waiting for pooled connections per request",
+    ("route",)))
+
+_instrumented_engines = {}
+
+
+def _pool_status() -> dict:
+    status = {}
+    for name, engine in _instrumented_engines.items():
+        pool = engine.pool
+        for metric in ("checkedout", "size", "overflow"):
+            # a method on queue pools, SingletonThreadPool has a plain `size` attribute
+            if callable(getattr(pool, metric, None)):
+                status[(name, metric)] = getattr(pool, metric)()
+    return status
+
+
+REGISTRY.register(Gauge("db_pool_connections", "Connection pool state by engine", ("engine", "state"),
+                        _pool_status))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.sql_seconds += time.perf_counter() - started_at
+    # -1 when the driver does not know, e.g. sqlite SELECTs
+    if cursor.rowcount is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+def _handle_error(exception_context):
+    # a failing statement never reaches after_cursor_execute, e.g. the IntegrityError of a duplicate id
+    connection = exception_context.connection
+    if connection is not None and exception_context.statement is not None:
+        started = connection.info.get("query_started_at")
+        if started:
+            started.pop()
+
+
+def _instrument_pool_wait(pool):
+    """
+    Times the checkout of a connection from the pool, including the wait for a free connection.
+    SQLAlchemy has no event before a checkout so the pool instance's _do_get is wrapped.
+    """
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started_at = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_wait_seconds += time.perf_counter() - started_at
+
+    pool._do_get = timed_do_get
+
+
+def instrument_engine(engine, name: str = "primary"):
+    """
+    :param engine: sync Engine, or the sync_engine of an AsyncEngine
+    :param name: label of the engine in the pool gauges
+    """
+    # the engines of a name are built again after db.dispose_engines, only the same engine is skipped
+    if _instrumented_engines.get(name) is engine:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    _instrument_pool_wait(engine.pool)
+    # dispose() swaps the pool for a fresh one
+    event.listen(engine, "engine_disposed", lambda disposed: _instrument_pool_wait(disposed.pool))
+    _instrumented_engines[name] = engine
+
+
+def record_request(route: str, method: str, status: int, seconds: float, stats: RequestStats):
+    REQUESTS.inc(route=route, method=method, status=status)
+    REQUEST_LATENCY.observe(seconds, route=route, method=method)
+    REQUEST_QUERIES.observe(stats.queries, route=route)
+    REQUEST_SQL_TIME.observe(stats.sql_seconds, route=route)
+    REQUEST_ROWS.observe(stats.rows, route=route)
+    REQUEST_POOL_WAIT.observe(stats.pool_wait_seconds, route=route)
+
+    slow = settings.SLOW_REQUEST_MS and seconds * 1000 >= settings.SLOW_REQUEST_MS
+    chatty = settings.N_PLUS_ONE_QUERY_THRESHOLD and stats.queries >= settings.N_PLUS_ONE_QUERY_THRESHOLD
+    if slow or chatty:
+        logger.warning(
+            "%s request %s %s took %.1f ms with %d queries (%.1f ms SQL, %d rows, %.1f ms pool wait)",
+            "possible N+1:" if chatty else "slow", method, route, seconds * 1000, stats.queries,
+            stats.sql_seconds * 1000, stats.rows, stats.pool_wait_seconds * 1000,
+        )
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware, streaming responses are measured until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            record_request(route.path if route is not None else NO_ROUTE, scope["method"], status,
+                           time.perf_counter() - started_at, stats)
+
+
+def render() -> str:
+    return REGISTRY.render()
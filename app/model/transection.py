@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Double, String, Integer, ForeignKey, BigInteger
+from sqlalchemy import Column, Double, String, Integer, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import relationship
 
 from app.database.db import Base
@@ -9,8 +9,31 @@ class Transaction(Base):
 
     id = Column(BigInteger, primary_key=True, index=True)
     amount = Column(Double, nullable=False)
-    type = Column(String, index=True, nullable=False)
+    type = Column(String, nullable=False)
     parent_id = Column(BigInteger, ForeignKey('transactions.id'), nullable=True)
+    # amount of this transaction plus the amount of all its descendants,
+    # maintained by the create path so the sum of a tree is a single primary key read
+    subtree_sum = Column(Double, nullable=False, default=0.0, server_default="0")
+    # bumped with subtree_sum by every create below the transaction, the ETag of GET /sum/{id}
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # materialized path of the transaction, "/<root id>/.../<id>/", written by the path hierarchy mode.
+    # the subtree of a transaction is every row whose path starts with its path: one index range scan
+    path = Column(String, nullable=True)
+    # root of the tree of the transaction and its distance to that root, copied from the parent by the create paths
+    # (NULL for rows written before the columns existed, see app/commands/backfill_tree_columns.py).
+    # a tree is one (root_id) range of the index below and a level of a tree one (root_id, depth) range
+    root_id = Column(BigInteger, nullable=True)
+    depth = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # text_pattern_ops lets postgres answer `path LIKE '/1/5/%'` from the index whatever the collation
+        Index("ix_transactions_path", "path", postgresql_ops={"path": "text_pattern_ops"}),
+        # covering index of the listings and stats of a type: `WHERE type = :type [AND id > :after] ORDER BY id`
+        # and COUNT/SUM/MIN/MAX(amount) are answered by an index only scan on postgres
+        Index("ix_transactions_type_id", "type", "id", postgresql_include=["amount"]),
+        # whole tree sums and level by level walks of one tree are index only scans on postgres
+        Index("ix_transactions_root_depth", "root_id", "depth", postgresql_include=["amount", "parent_id"]),
+    )
 
 
 '''
@@ -37,3 +60,17 @@ class TransactionClosure(Base):
 
     ancestor_id = Column(BigInteger, ForeignKey('transactions.id'), primary_key=True)
     descendant_id = Column(BigInteger, ForeignKey('transactions.id'), primary_key=True)
+
+
+class TransactionTypeStats(Base):
+    """
+    count/sum/min/max of the amounts of every type, updated by the create paths in the DB transaction
+    of the insert (see transection.add_to_type_stats), rebuilt with app.commands.type_stats.
+    """
+    __tablename__ = "transaction_type_stats"
+
+    type = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    total = Column(Double, nullable=False, default=0.0)
+    min_amount = Column(Double, nullable=True)
+    max_amount = Column(Double, nullable=True)
@@ -0,0 +1,18 @@
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from .base import TransactionRepository, TransactionRow
+from .memory import InMemoryTransactionRepository, get_memory_repository
+from .sql import SqlTransactionRepository
+from ..config import settings
+from ..database.db import get_db
+
+
+def get_repository(db: Session = Depends(get_db)) -> TransactionRepository:
+    """
+    Storage backend of the routes, picked through STORAGE_BACKEND (sql | memory).
+    The session is lazy, the memory backend never opens a database connection.
+    """
+    if settings.STORAGE_BACKEND == "memory":
+        return get_memory_repository()
+    return SqlTransactionRepository(db)
@@ -0,0 +1,100 @@
+"""
+Storage interface behind the transaction routes, see sql.py and memory.py for the implementations.
+"""
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from ..schemas.transection.request import Create
+from ..services.transection import DUPLICATE_TRANSACTION, PARENT_NOT_FOUND, TransactionRejected
+
+# plain row returned by the listings, it exposes the same attributes as the Transaction model
+TransactionRow = namedtuple("TransactionRow", ["id", "amount", "type", "parent_id"])
+# row of a subtree export, depth is 0 for the root of the export
+SubtreeRow = namedtuple("SubtreeRow", ["id", "amount", "type", "parent_id", "depth"])
+
+
+class TransactionRepository(ABC):
+
+    @abstractmethod
+    def exists(self, transaction_id: int) -> bool:
+        """
+        Uncached existence check, used to validate writes.
+        """
+
+    @abstractmethod
+    def get(self, transaction_id: int):
+        """
+        :return: the transaction or None
+        """
+
+    @abstractmethod
+    def create(self, transaction: Create, transaction_id: int):
+        """
+        Stores a new transaction, the caller has already validated the id and the parent.
+
+        :return: the created transaction
+        """
+
+    def create_new(self, transaction: Create, transaction_id: int):
+        """
+        Validates the id and the parent, then stores the transaction.
+
+        :return: the created transaction
+        :raises TransactionRejected: when the id is taken or the parent does not exist
+        """
+        if self.exists(transaction_id):
+            raise TransactionRejected(DUPLICATE_TRANSACTION)
+        if transaction.parent_id is not None and not self.exists(transaction.parent_id):
+            raise TransactionRejected(PARENT_NOT_FOUND)
+        return self.create(transaction, transaction_id)
+
+    @abstractmethod
+    def create_batch(self, items: list) -> (list, list):
+        """
+        :param items: list of BatchItem, they may reference each other
+        :return: (ids created in insertion order, list of (id, detail) for the rejected items)
+        """
+
+    @abstractmethod
+    def list_by_type(self, transaction_type: str, after: int = None, limit: int = None) -> list:
+        """
+        :return: transactions of the type, keyset paginated on id when after/limit are given
+        """
+
+    @abstractmethod
+    def stream_by_type(self, transaction_type: str, after: int = None):
+        """
+        :return: iterator of TransactionRow-like rows of the type ordered by id
+        """
+
+    @abstractmethod
+    def subtree_sum(self, transaction_id: int, version: int = None) -> float:
+        """
+        :param version: version of the transaction read for the ETag, a cached sum of another version is not served
+        :return: sum of the amount of the transaction and all its descendants
+        """
+
+    @abstractmethod
+    def version(self, transaction_id: int):
+        """
+        :return: counter bumped by every create in the subtree of the transaction (ETag of its sum),
+                 None if the transaction does not exist
+        """
+
+    @abstractmethod
+    def subtree_sums(self, transaction_ids: list) -> (dict, list):
+        """
+        :return: (dict id -> sum of the subtree, list of the ids that do not exist)
+        """
+
+    @abstractmethod
+    def stream_subtree(self, transaction_id: int, order: str = "bfs", max_depth: int = None):
+        """
+        :return: iterator of SubtreeRow-like rows of the subtree, in bfs or dfs order
+        """
+
+    @abstractmethod
+    def type_stats(self, transaction_type: str) -> dict:
+        """
+        :return: dict with type, count, sum, min and max of the amounts of the type
+        """
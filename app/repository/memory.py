@@ -0,0 +1,276 @@
+"""
+In memory storage engine, for edge caches and test environments.
+
+Transactions live in parallel arrays indexed by an insertion slot (amounts, parent slots, subtree totals,
+versions), with child adjacency lists and a sorted id index per type. Creates add the amount to every ancestor
+total so /sum is a single array read, and /types pages are a bisect on the type index.
+
+Durability is optional: every write is appended to a JSON lines log, and every `snapshot_every` writes the
+whole store is written to a snapshot file and the log is truncated, so a restart loads one snapshot
+and replays a short log.
+"""
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_right, insort
+
+from .base import SubtreeRow, TransactionRepository, TransactionRow
+from ..config import settings
+from ..schemas.transection.request import Create
+from ..services.transection import DUPLICATE_TRANSACTION, PARENT_NOT_FOUND, TransactionRejected, order_items
+
+NO_PARENT = -1
+
+
+class InMemoryTransactionRepository(TransactionRepository):
+
+    def __init__(self, log_path: str = "", snapshot_every: int = 10000, fsync: bool = False):
+        self._lock = threading.RLock()
+        self._slots = {}
+        self._ids = array("q")
+        self._amounts = array("d")
+        self._parents = array("q")
+        self._subtree_sums = array("d")
+        self._versions = array("q")
+        self._types = []
+        self._children = []
+        self._type_index = {}
+        self._type_stats = {}
+
+        self.log_path = log_path
+        self.snapshot_path = f"{log_path}.snapshot" if log_path else ""
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._log = None
+        self._writes_since_snapshot = 0
+        if log_path:
+            self._load()
+            self._log = open(log_path, "a", encoding="utf-8")
+
+    # --- reads -----------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._ids)
+
+    def exists(self, transaction_id: int) -> bool:
+        return transaction_id in self._slots
+
+    def get(self, transaction_id: int):
+        with self._lock:
+            slot = self._slots.get(transaction_id)
+            return self._row(slot) if slot is not None else None
+
+    def list_by_type(self, transaction_type: str, after: int = None, limit: int = None) -> list:
+        with self._lock:
+            ids = self._type_index.get(transaction_type, ())
+            start = bisect_right(ids, after) if after is not None else 0
+            end = len(ids) if limit is None else min(len(ids), start + limit)
+            return [self._row(self._slots[transaction_id]) for transaction_id in ids[start:end]]
+
+    def stream_by_type(self, transaction_type: str, after: int = None):
+        return iter(self.list_by_type(transaction_type, after=after))
+
+    def stream_subtree(self, transaction_id: int, order: str = "bfs", max_depth: int = None):
+        """
+        Same order as the SQL export: by id inside a level for bfs, children by id for dfs.
+        The rows are collected under the lock, the store can be written while the caller iterates.
+        """
+        with self._lock:
+            slot = self._slots.get(transaction_id)
+            if slot is None:
+                return iter(())
+            rows = []
+            if order == "dfs":
+                stack = [(slot, 0)]
+                while stack:
+                    slot, depth = stack.pop()
+                    rows.append(SubtreeRow(*self._row(slot), depth))
+                    if max_depth is None or depth < max_depth:
+                        children = sorted(self._children[slot], key=self._ids.__getitem__, reverse=True)
+                        stack.extend((child, depth + 1) for child in children)
+            else:
+                level, depth = [slot], 0
+                while level:
+                    rows.extend(SubtreeRow(*self._row(slot), depth) for slot in level)
+                    if max_depth is not None and depth >= max_depth:
+                        break
+                    level = sorted((child for slot in level for child in self._children[slot]),
+                                   key=self._ids.__getitem__)
+                    depth += 1
+            return iter(rows)
+
+    def subtree_sum(self, transaction_id: int, version: int = None) -> float:
+        slot = self._slots.get(transaction_id)
+        return self._subtree_sums[slot] if slot is not None else 0.0
+
+    def version(self, transaction_id: int):
+        slot = self._slots.get(transaction_id)
+        return self._versions[slot] if slot is not None else None
+
+    def subtree_sums(self, transaction_ids: list) -> (dict, list):
+        with self._lock:
+            totals = {transaction_id: self._subtree_sums[self._slots[transaction_id]]
+                      for transaction_id in transaction_ids if transaction_id in self._slots}
+        return totals, [transaction_id for transaction_id in dict.fromkeys(transaction_ids)
+                        if transaction_id not in totals]
+
+    def type_stats(self, transaction_type: str) -> dict:
+        with self._lock:
+            count, total, low, high = self._type_stats.get(transaction_type, (0, 0.0, None, None))
+        return {"type": transaction_type, "count": count, "sum": total, "min": low, "max": high}
+
+    def children(self, transaction_id: int) -> list:
+        with self._lock:
+            return [self._ids[child] for child in self._children[self._slots[transaction_id]]]
+
+    # --- writes ----------------------------------------------------------------------------------
+
+    def create(self, transaction: Create, transaction_id: int):
+        with self._lock:
+            self._insert(transaction_id, transaction.amount, transaction.type, transaction.parent_id)
+            self._append_log([(transaction_id, transaction.amount, transaction.type, transaction.parent_id)])
+            return self._row(self._slots[transaction_id])
+
+    def create_new(self, transaction: Create, transaction_id: int):
+        """
+        The checks of TransactionRepository.create_new and the insert under one lock, so two concurrent
+        creates of the same id cannot both pass the duplicate check.
+        """
+        with self._lock:
+            if transaction_id in self._slots:
+                raise TransactionRejected(DUPLICATE_TRANSACTION)
+            if transaction.parent_id is not None and transaction.parent_id not in self._slots:
+                raise TransactionRejected(PARENT_NOT_FOUND)
+            return self.create(transaction, transaction_id)
+
+    def create_batch(self, items: list) -> (list, list):
+        with self._lock:
+            ordered, failed = order_items(items, lambda ids: {i for i in ids if i in self._slots})
+            records = [(item.id, item.amount, item.type, item.parent_id) for item in ordered]
+            for record in records:
+                self._insert(*record)
+            self._append_log(records)
+            return [item.id for item in ordered], failed
+
+    def _insert(self, transaction_id, amount, transaction_type, parent_id):
+        if transaction_id in self._slots:
+            raise TransactionRejected(DUPLICATE_TRANSACTION)
+        slot = len(self._ids)
+        parent_slot = self._slots[parent_id] if parent_id is not None else NO_PARENT
+        self._slots[transaction_id] = slot
+        self._ids.append(transaction_id)
+        self._amounts.append(amount)
+        self._parents.append(parent_slot)
+        self._subtree_sums.append(amount)
+        self._versions.append(0)
+        self._types.append(transaction_type)
+        self._children.append([])
+
+        stats = self._type_stats.get(transaction_type)
+        if stats is None:
+            self._type_stats[transaction_type] = [1, amount, amount, amount]
+        else:
+            stats[0] += 1
+            stats[1] += amount
+            stats[2] = min(stats[2], amount)
+            stats[3] = max(stats[3], amount)
+
+        ids = self._type_index.setdefault(transaction_type, array("q"))
+        if not ids or ids[-1] < transaction_id:
+            ids.append(transaction_id)
+        else:
+            insort(ids, transaction_id)
+
+        # O(depth) walk up the parent slots to keep every ancestor total current
+        while parent_slot != NO_PARENT:
+            self._subtree_sums[parent_slot] += amount
+            self._versions[parent_slot] += 1
+            parent_slot = self._parents[parent_slot]
+        if parent_id is not None:
+            self._children[self._slots[parent_id]].append(slot)
+
+    def _row(self, slot) -> TransactionRow:
+        parent_slot = self._parents[slot]
+        return TransactionRow(
+            id=self._ids[slot],
+            amount=self._amounts[slot],
+            type=self._types[slot],
+            parent_id=self._ids[parent_slot] if parent_slot != NO_PARENT else None,
+        )
+
+    # --- persistence -----------------------------------------------------------------------------
+
+    def _append_log(self, records: list):
+        if self._log is None or not records:
+            return
+        self._log.writelines(_encode(record) for record in records)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._writes_since_snapshot += len(records)
+        if self._writes_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Writes every transaction, parents before children, to the snapshot file and truncates the log.
+        The snapshot is written to a temporary file first so a crash never leaves a partial snapshot behind.
+        """
+        with self._lock:
+            temporary_path = f"{self.snapshot_path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as snapshot:
+                snapshot.writelines(_encode(self._record(slot)) for slot in range(len(self._ids)))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary_path, self.snapshot_path)
+            if self._log is not None:
+                self._log.truncate(0)
+                self._log.seek(0)
+            self._writes_since_snapshot = 0
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _record(self, slot) -> tuple:
+        row = self._row(slot)
+        return row.id, row.amount, row.type, row.parent_id
+
+    def _load(self):
+        for path in (self.snapshot_path, self.log_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as records:
+                for line in records:
+                    try:
+                        transaction_id, amount, transaction_type, parent_id = json.loads(line)
+                    except ValueError:
+                        # torn last line of a crashed write, everything before it is intact
+                        break
+                    if transaction_id not in self._slots:
+                        self._insert(transaction_id, amount, transaction_type, parent_id)
+
+
+def _encode(record) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_memory_repository() -> InMemoryTransactionRepository:
+    """
+    Process wide in memory store, created on first use.
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = InMemoryTransactionRepository(
+                log_path=settings.MEMORY_LOG_PATH,
+                snapshot_every=settings.MEMORY_SNAPSHOT_EVERY,
+                fsync=settings.MEMORY_FSYNC,
+            )
+        return _repository
@@ -0,0 +1,75 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .base import TransactionRepository
+from ..config import settings
+from ..database.routing import record_write, use_primary
+from ..schemas.transection.request import Create
+from ..services import cache, coalescer, transection
+
+
+class SqlTransactionRepository(TransactionRepository):
+    """
+    SQLAlchemy backed repository, the hierarchy mode and the sum strategy come from the settings
+    and the reads go through the read-through cache.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def exists(self, transaction_id: int) -> bool:
+        # validation of a write, a lagging replica could miss a transaction committed just before
+        use_primary(self.db)
+        return transection.get_transaction(self.db, transaction_id) is not None
+
+    def get(self, transaction_id: int):
+        return cache.get_transaction(self.db, transaction_id)
+
+    def create(self, transaction: Create, transaction_id: int):
+        db_transaction = transection.create_transaction(self.db, transaction, transaction_id, settings.HIERARCHY_MODE)
+        cache.invalidate_created(self.db, [(transaction.type, transaction.parent_id)], settings.HIERARCHY_MODE)
+        return db_transaction
+
+    def create_new(self, transaction: Create, transaction_id: int):
+        if settings.WRITE_COALESCING:
+            row = coalescer.get_coalescer().create(coalescer.to_batch_item(transaction, transaction_id))
+            record_write(self.db)
+        elif settings.SINGLE_STATEMENT_CREATE:
+            row = transection.insert_transaction(self.db, transaction, transaction_id, settings.HIERARCHY_MODE)
+        else:
+            return super().create_new(transaction, transaction_id)
+        cache.invalidate_created(self.db, [(transaction.type, transaction.parent_id)], settings.HIERARCHY_MODE)
+        return row
+
+    def create_batch(self, items: list) -> (list, list):
+        use_primary(self.db)
+        try:
+            created, failed = transection.create_batch(self.db, items, settings.HIERARCHY_MODE)
+        except IntegrityError:
+            self.db.rollback()
+            raise
+        created_ids = set(created)
+        cache.invalidate_created(self.db, [(item.type, item.parent_id) for item in items if item.id in created_ids],
+                                 settings.HIERARCHY_MODE)
+        return created, failed
+
+    def list_by_type(self, transaction_type: str, after: int = None, limit: int = None) -> list:
+        return cache.get_transactions_by_type(self.db, transaction_type, after=after, limit=limit)
+
+    def stream_by_type(self, transaction_type: str, after: int = None):
+        return transection.stream_transactions_by_type(self.db, transaction_type, after=after)
+
+    def stream_subtree(self, transaction_id: int, order: str = "bfs", max_depth: int = None):
+        return transection.stream_subtree(self.db, transaction_id, order=order, max_depth=max_depth)
+
+    def subtree_sum(self, transaction_id: int, version: int = None) -> float:
+        return cache.calculate_transaction_sum(self.db, transaction_id, settings.SUM_STRATEGY, version)
+
+    def version(self, transaction_id: int):
+        return transection.get_version(self.db, transaction_id)
+
+    def subtree_sums(self, transaction_ids: list) -> (dict, list):
+        return transection.calculate_sums(self.db, transaction_ids, settings.SUM_STRATEGY)
+
+    def type_stats(self, transaction_type: str) -> dict:
+        return transection.get_type_stats(self.db, transaction_type)
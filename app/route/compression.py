@@ -0,0 +1,147 @@
+"""
+Response compression for the large JSON payloads (/types pages, NDJSON exports), COMPRESSION_ENABLED.
+
+Brotli is used when the optional `brotli` package is installed and the client accepts it, gzip otherwise.
+Bodies smaller than COMPRESSION_MIN_SIZE, 304s and responses that are already encoded are sent as is.
+Streaming responses are compressed chunk by chunk and flushed, a NDJSON line is not held back by the encoder.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits 31: gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, level: int):
+        # brotli qualities go up to 11, gzip levels to 9
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """
+    :return: codings of an Accept-Encoding header whose q-value is not 0
+    """
+    accepted = set()
+    for coding in accept_encoding.lower().split(","):
+        name, _, parameters = coding.partition(";")
+        quality = parameters.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name.strip():
+            accepted.add(name.strip())
+    return accepted
+
+
+def choose_compressor(accept_encoding: str, level: int):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return _Brotli(level)
+    if "gzip" in accepted or "*" in accepted:
+        return _Gzip(level)
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware, like MetricsMiddleware.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        compressor = choose_compressor(Headers(scope=scope).get("accept-encoding", ""), self.level)
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, compressor, self.minimum_size))
+
+
+class _CompressingSend:
+    """
+    Holds the response start until the first body chunk tells whether the body is worth compressing.
+    """
+
+    def __init__(self, send, compressor, minimum_size: int):
+        self.send = send
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressing = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            self.compressing = self._should_compress(body, more_body)
+            if not self.compressing:
+                await self.send(self.start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.compressor.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self._compress(body, more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+        elif not self.compressing:
+            await self.send(message)
+            return
+        else:
+            body = self._compress(body, more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        return self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+
+    def _should_compress(self, body: bytes, more_body: bool) -> bool:
+        headers = Headers(raw=self.start["headers"])
+        if self.start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        # a streaming response is compressed whatever the size of its first chunk
+        return more_body or len(body) >= self.minimum_size
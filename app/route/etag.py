@@ -0,0 +1,48 @@
+"""
+Conditional GETs (ETag / If-None-Match) of /transaction and /sum.
+
+A transaction never changes once created, its ETag is a hash of its fields. Its sum changes whenever a
+descendant is created: every create bumps the `version` of the whole ancestor chain in the same UPDATE as
+subtree_sum, so the ETag of /sum is the version of the row and a client holding the sum of an unchanged tree
+gets a 304 after a primary key read, without the sum being computed.
+ETags are weak, the body may be compressed on the way out (app/route/compression.py).
+"""
+import zlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def transaction_etag(row) -> str:
+    """
+    :param row: Core row, ORM object or TransactionRow, anything with the Response attributes
+    """
+    fields = f"{row.id}:{row.amount!r}:{row.type}:{row.parent_id}".encode("utf-8")
+    return f'W/"{row.id}-{zlib.crc32(fields):08x}"'
+
+
+def sum_etag(transaction_id: int, version: int) -> str:
+    return f'W/"{transaction_id}.{version}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    # weak comparison, W/"x" and "x" match
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    :return: True if the If-None-Match header of the request lists the ETag (or is *)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == tag for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,44 @@
+"""
+JSON responses of the lean read path (READ_PATH=core).
+
+Rows read with Core are trusted, they are encoded straight to bytes instead of being validated through the
+Response model and encoded by FastAPI. The routes keep their response_model, so the OpenAPI schema is unchanged;
+FastAPI skips validation and serialization when a handler returns a Response object.
+"""
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder produces the same documents, slower
+    orjson = None
+
+
+def transaction_dict(row) -> dict:
+    """
+    :param row: Core row, cached Response or TransactionRow, anything with the Response attributes
+    """
+    return {"id": row.id, "amount": row.amount, "type": row.type, "parent_id": row.parent_id}
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    # same output as the JSONResponse of starlette
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawJSONResponse(Response):
+    """
+    Response whose content is already encoded JSON.
+    """
+    media_type = "application/json"
+
+
+def transaction_response(row, headers: dict = None) -> RawJSONResponse:
+    return RawJSONResponse(dumps(transaction_dict(row)), headers=headers)
+
+
+def transactions_response(rows, headers: dict = None) -> RawJSONResponse:
+    return RawJSONResponse(dumps([transaction_dict(row) for row in rows]), headers=headers)
@@ -0,0 +1,13 @@
+"""
+Helpers for the newline delimited JSON streaming endpoints
+"""
+import json
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_line(row) -> str:
+    """
+    :param row: SQLAlchemy row
+    :return: the row as one JSON document terminated by a new line
+    """
+    return json.dumps(row._asdict()) + "\n"
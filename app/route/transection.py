@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException,  Path
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from .. services import transection
-from ..database.db import get_db
-from ..schemas.transection.request import Create
-from ..schemas.transection.response import Response, SumResponse
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response as HTTPResponse
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+
+from .. services import cache, transection
+from ..config import settings
+from ..repository import TransactionRepository, get_repository
+from ..schemas.transection.request import BatchCreate, Create, SumsRequest
+from . import etag, fast_json
+from .ndjson import NDJSON_MEDIA_TYPE, ndjson_line
+from ..schemas.transection.response import (BatchFailure, BatchResponse, Response, SumItem, SumResponse,
+                                            SumsResponse, TypeStatsResponse)
 
 router = APIRouter(
     prefix='/transactionservice',
@@ -13,50 +20,111 @@ router = APIRouter(
 
 
 @router.put("/transaction/{transaction_id}", response_model=Response)
-def create_transaction(transaction_id: int, data: Create, db: Session = Depends(get_db)):
-    db_transaction = transection.get_transaction(db, transaction_id)
-
-    # Validate that the transaction ID exists if provided
-    if db_transaction:
-        raise HTTPException(status_code=400, detail="Transaction ID already exists")
+def create_transaction(transaction_id: int, data: Create, repository: TransactionRepository = Depends(get_repository)):
+    # duplicate id and missing parent are rejected by the repository, in the INSERT itself with SINGLE_STATEMENT_CREATE
+    # storage backend and hierarchy mode are picked through the settings, see app/config/settings.py
+    try:
+        return repository.create_new(data, transaction_id)
+    except transection.TransactionRejected as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
-    # Validate that the parent_id exists if provided
-    if data.parent_id is not None:
-        print("parent data id ", data.parent_id)
-        parent_transaction = transection.get_transaction(db, data.parent_id)
-        if parent_transaction is None:
-            raise HTTPException(status_code=400, detail="Parent transaction not found")
 
-    # Approach 2 using extra table to maintain ..  ancestor_id , descendant_id relation
-    # just uncomment blow code for testing
-    # return transection.create_v2(db, data, transaction_id)
-
-    # Approach 1 using parent child relation into single table
-    return transection.create(db, data, transaction_id)
+@router.post("/transactions", response_model=BatchResponse)
+def create_transactions(data: BatchCreate, repository: TransactionRepository = Depends(get_repository)):
+    # items of the batch may reference each other, invalid items are reported without aborting the batch
+    try:
+        created, failed = repository.create_batch(data.transactions)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Batch conflicts with a concurrent write, retry the batch")
+    return BatchResponse(
+        created=created,
+        failed=[BatchFailure(id=transaction_id, detail=detail) for transaction_id, detail in failed]
+    )
 
 
 @router.get("/transaction/{transaction_id}", response_model=Response)
-def get_transaction_by_id(transaction_id: int, db: Session = Depends(get_db)):
-    transaction = transection.get_transaction(db, transaction_id)
+def get_transaction_by_id(transaction_id: int, request: Request, response: HTTPResponse,
+                          repository: TransactionRepository = Depends(get_repository)):
+    transaction = repository.get(transaction_id)
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    tag = etag.transaction_etag(transaction)
+    if etag.if_none_match(request, tag):
+        return etag.not_modified(tag)
+    if settings.READ_PATH == "core":
+        # trusted row encoded straight to JSON, response_model only documents the schema
+        return fast_json.transaction_response(transaction, headers={"ETag": tag})
+    response.headers["ETag"] = tag
     return transaction
 
 
 @router.get("/types/{transaction_type}", response_model=list[Response])
-def get_transactions_by_type(transaction_type: str, db: Session = Depends(get_db)):
-    transactions = transection.get_transactions_by_type(db, transaction_type)
+def get_transactions_by_type(transaction_type: str, response: HTTPResponse,
+                             limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+                             after: Optional[int] = None,
+                             repository: TransactionRepository = Depends(get_repository)):
+    # keyset pagination, the id of the last row is returned in X-Next-Cursor while more pages may exist
+    transactions = repository.list_by_type(transaction_type, after=after, limit=limit)
+    if limit is not None and len(transactions) == limit:
+        response.headers["X-Next-Cursor"] = str(transactions[-1].id)
+    if settings.READ_PATH == "core":
+        return fast_json.transactions_response(transactions, headers=dict(response.headers))
     return transactions
 
 
+@router.get("/types/{transaction_type}/stats", response_model=TypeStatsResponse)
+def get_type_stats(transaction_type: str, repository: TransactionRepository = Depends(get_repository)):
+    # count/sum/min/max of the type without listing its transactions, see TYPE_STATS_ENABLED
+    return repository.type_stats(transaction_type)
+
+
+@router.get("/types/{transaction_type}/stream", response_class=StreamingResponse)
+def stream_transactions_by_type(transaction_type: str, after: Optional[int] = None,
+                                repository: TransactionRepository = Depends(get_repository)):
+    # one JSON document per line, rows are written as the server side cursor returns them
+    rows = repository.stream_by_type(transaction_type, after=after)
+    return StreamingResponse((ndjson_line(row) for row in rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/tree/{transaction_id}", response_class=StreamingResponse)
+def stream_transaction_tree(transaction_id: int, order: str = Query("bfs", pattern="^(bfs|dfs)$"),
+                            max_depth: Optional[int] = Query(None, ge=0),
+                            repository: TransactionRepository = Depends(get_repository)):
+    # every node of the subtree as one JSON document per line, with its depth below the requested transaction
+    # get() reads through the replicas, exists() is the pre-create check pinned to the primary
+    if repository.get(transaction_id) is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    rows = repository.stream_subtree(transaction_id, order=order, max_depth=max_depth)
+    return StreamingResponse((ndjson_line(row) for row in rows), media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.get("/sum/{transaction_id}", response_model=SumResponse)
-def get_transaction_sum(transaction_id: int, db: Session = Depends(get_db)):
-    transaction = transection.get_transaction(db, transaction_id)
-    if transaction is None:
+def get_transaction_sum(transaction_id: int, request: Request, response: HTTPResponse,
+                        repository: TransactionRepository = Depends(get_repository)):
+    # every create below the transaction bumps its version, an unchanged tree is answered 304 without the sum.
+    # the version is read first, a create racing the sum can only make the ETag older than the body;
+    # the cached sum is only served for the version it was computed with
+    version = repository.version(transaction_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    # Approach 1 using parent child relation into single table ... using rec/queue to compute result
-    total_sum = transection.calculate_sum(db, transaction_id)
-    # Approach 2 using extra table to maintain ..  ancestor_id , descendant_id relation
-    # just uncomment blow code for testing
-    # total_sum = transaction.calculate_sum_using_closure(db, transaction_id)
+    tag = etag.sum_etag(transaction_id, version)
+    if etag.if_none_match(request, tag):
+        return etag.not_modified(tag)
+    # strategy is picked through SUM_STRATEGY, see app/config/settings.py
+    total_sum = repository.subtree_sum(transaction_id, version)
+    response.headers["ETag"] = tag
     return SumResponse(sum=total_sum)
+
+
+@router.post("/sums", response_model=SumsResponse)
+def get_transaction_sums(data: SumsRequest, repository: TransactionRepository = Depends(get_repository)):
+    # the subtrees of all the ids are walked once, shared descendants are not summed again for every ancestor
+    totals, missing = repository.subtree_sums(data.ids)
+    return SumsResponse(sums=[SumItem(id=transaction_id, sum=total) for transaction_id, total in totals.items()],
+                        missing=missing)
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    # hit/miss/eviction counters of the read-through cache, see app/services/cache.py
+    return cache.stats()
@@ -0,0 +1,169 @@
+"""
+Same API as app/route/transection.py, served from the event loop on the async engine (DB_MODE=async)
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response as HTTPResponse
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..services import cache, coalescer, transection, transection_async
+from ..config import settings
+from ..database.db import get_async_db
+from ..schemas.transection.request import BatchCreate, Create, SumsRequest
+from . import etag, fast_json
+from .ndjson import NDJSON_MEDIA_TYPE, ndjson_line
+from ..schemas.transection.response import (BatchFailure, BatchResponse, Response, SumItem, SumResponse,
+                                            SumsResponse, TypeStatsResponse)
+router = APIRouter(
+    prefix='/transactionservice',
+    tags=['Transactions API']
+)
+
+
+async def get_cached_transaction(db: AsyncSession, transaction_id: int):
+    # the cache layer is sync, it runs on the async connection through run_sync
+    if settings.CACHE_ENABLED:
+        return await db.run_sync(cache.get_transaction, transaction_id)
+    if settings.READ_PATH == "core":
+        return await transection_async.get_transaction_row(db, transaction_id)
+    return await transection_async.get_transaction(db, transaction_id)
+
+
+@router.put("/transaction/{transaction_id}", response_model=Response)
+async def create_transaction(transaction_id: int, data: Create, db: AsyncSession = Depends(get_async_db)):
+    if settings.WRITE_COALESCING:
+        # group commit on the coalescer thread, the event loop only waits for this create's result
+        future = coalescer.get_coalescer().enqueue(coalescer.to_batch_item(data, transaction_id))
+        try:
+            db_transaction = await asyncio.wrap_future(future)
+        except transection.TransactionRejected as error:
+            raise HTTPException(status_code=400, detail=str(error))
+    elif settings.SINGLE_STATEMENT_CREATE:
+        # duplicate and parent checks folded into the INSERT, see transection.insert_transaction
+        try:
+            db_transaction = await transection_async.insert_transaction(
+                db, data, transaction_id, settings.HIERARCHY_MODE)
+        except transection.TransactionRejected as error:
+            raise HTTPException(status_code=400, detail=str(error))
+    else:
+        # Validate that the transaction ID exists if provided
+        if await transection_async.get_transaction(db, transaction_id):
+            raise HTTPException(status_code=400, detail=transection.DUPLICATE_TRANSACTION)
+
+        # Validate that the parent_id exists if provided
+        if data.parent_id is not None and await transection_async.get_transaction(db, data.parent_id) is None:
+            raise HTTPException(status_code=400, detail=transection.PARENT_NOT_FOUND)
+
+        db_transaction = await transection_async.create_transaction(db, data, transaction_id, settings.HIERARCHY_MODE)
+    if settings.CACHE_ENABLED:
+        await db.run_sync(cache.invalidate_created, [(data.type, data.parent_id)], settings.HIERARCHY_MODE)
+    return db_transaction
+
+
+@router.post("/transactions", response_model=BatchResponse)
+async def create_transactions(data: BatchCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        created, failed = await transection_async.create_batch(db, data.transactions, settings.HIERARCHY_MODE)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Batch conflicts with a concurrent write, retry the batch")
+    if settings.CACHE_ENABLED:
+        created_ids = set(created)
+        await db.run_sync(cache.invalidate_created,
+                          [(item.type, item.parent_id) for item in data.transactions if item.id in created_ids],
+                          settings.HIERARCHY_MODE)
+    return BatchResponse(
+        created=created,
+        failed=[BatchFailure(id=transaction_id, detail=detail) for transaction_id, detail in failed]
+    )
+
+
+@router.get("/transaction/{transaction_id}", response_model=Response)
+async def get_transaction_by_id(transaction_id: int, request: Request, response: HTTPResponse,
+                                db: AsyncSession = Depends(get_async_db)):
+    transaction = await get_cached_transaction(db, transaction_id)
+    if transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    tag = etag.transaction_etag(transaction)
+    if etag.if_none_match(request, tag):
+        return etag.not_modified(tag)
+    if settings.READ_PATH == "core":
+        return fast_json.transaction_response(transaction, headers={"ETag": tag})
+    response.headers["ETag"] = tag
+    return transaction
+
+
+@router.get("/types/{transaction_type}", response_model=list[Response])
+async def get_transactions_by_type(transaction_type: str, response: HTTPResponse,
+                                   limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+                                   after: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    # keyset pagination, the id of the last row is returned in X-Next-Cursor while more pages may exist
+    if settings.CACHE_ENABLED:
+        transactions = await db.run_sync(cache.get_transactions_by_type, transaction_type, after, limit)
+    elif settings.READ_PATH == "core":
+        transactions = await transection_async.get_transaction_rows_by_type(db, transaction_type, after=after,
+                                                                            limit=limit)
+    else:
+        transactions = await transection_async.get_transactions_by_type(db, transaction_type, after=after, limit=limit)
+    if limit is not None and len(transactions) == limit:
+        response.headers["X-Next-Cursor"] = str(transactions[-1].id)
+    if settings.READ_PATH == "core":
+        return fast_json.transactions_response(transactions, headers=dict(response.headers))
+    return transactions
+
+
+@router.get("/types/{transaction_type}/stats", response_model=TypeStatsResponse)
+async def get_type_stats(transaction_type: str, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(transection.get_type_stats, transaction_type)
+
+
+@router.get("/types/{transaction_type}/stream", response_class=StreamingResponse)
+async def stream_transactions_by_type(transaction_type: str, after: Optional[int] = None,
+                                      db: AsyncSession = Depends(get_async_db)):
+    # one JSON document per line, rows are written as the server side cursor returns them
+    rows = transection_async.stream_transactions_by_type(db, transaction_type, after=after)
+    return StreamingResponse((ndjson_line(row) async for row in rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/tree/{transaction_id}", response_class=StreamingResponse)
+async def stream_transaction_tree(transaction_id: int, order: str = Query("bfs", pattern="^(bfs|dfs)$"),
+                                  max_depth: Optional[int] = Query(None, ge=0),
+                                  db: AsyncSession = Depends(get_async_db)):
+    if await transection_async.get_transaction(db, transaction_id) is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    rows = transection_async.stream_subtree(db, transaction_id, order=order, max_depth=max_depth)
+    return StreamingResponse((ndjson_line(row) async for row in rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/sum/{transaction_id}", response_model=SumResponse)
+async def get_transaction_sum(transaction_id: int, request: Request, response: HTTPResponse,
+                              db: AsyncSession = Depends(get_async_db)):
+    # see the sync route, the version of the row is the ETag of the sum
+    version = await transection_async.get_version(db, transaction_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    tag = etag.sum_etag(transaction_id, version)
+    if etag.if_none_match(request, tag):
+        return etag.not_modified(tag)
+    if settings.CACHE_ENABLED:
+        total_sum = await db.run_sync(cache.calculate_transaction_sum, transaction_id, settings.SUM_STRATEGY,
+                                      version)
+    else:
+        total_sum = await transection_async.calculate_transaction_sum(db, transaction_id, settings.SUM_STRATEGY)
+    response.headers["ETag"] = tag
+    return SumResponse(sum=total_sum)
+
+
+@router.post("/sums", response_model=SumsResponse)
+async def get_transaction_sums(data: SumsRequest, db: AsyncSession = Depends(get_async_db)):
+    totals, missing = await db.run_sync(transection.calculate_sums, data.ids, settings.SUM_STRATEGY)
+    return SumsResponse(sums=[SumItem(id=transaction_id, sum=total) for transaction_id, total in totals.items()],
+                        missing=missing)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return cache.stats()
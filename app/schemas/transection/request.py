@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from pydantic import validator
 
+from ...config import settings
+
 
 class Create(BaseModel):
     amount: float
@@ -25,3 +27,21 @@ class Create(BaseModel):
         if value is not None and value <= 0:
             raise ValueError('Parent ID must be greater than zero.')
         return value
+
+
+class BatchItem(Create):
+    id: int
+
+    @validator('id')
+    def validate_id(cls, value):
+        if value <= 0:
+            raise ValueError('ID must be greater than zero.')
+        return value
+
+
+class BatchCreate(BaseModel):
+    transactions: List[BatchItem]
+
+
+class SumsRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.MAX_SUM_IDS)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class Response(BaseModel):
@@ -15,3 +15,30 @@ class Response(BaseModel):
 class SumResponse(BaseModel):
     sum: float
 
+
+class TypeStatsResponse(BaseModel):
+    type: str
+    count: int
+    sum: float
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class BatchFailure(BaseModel):
+    id: int
+    detail: str
+
+
+class BatchResponse(BaseModel):
+    created: List[int]
+    failed: List[BatchFailure]
+
+
+class SumItem(BaseModel):
+    id: int
+    sum: float
+
+
+class SumsResponse(BaseModel):
+    sums: List[SumItem]
+    missing: List[int]
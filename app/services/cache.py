@@ -0,0 +1,177 @@
+"""
+Read-through in process cache in front of get_transaction, get_transactions_by_type and the sum strategies.
+
+Transactions never change once created, but adding a child changes the sum of every ancestor and the listing
+of its type, so writes invalidate the sums of the whole ancestor chain (parent_id links or closure rows)
+and the cached pages of the type instead of only the new id.
+
+With read replicas an entry can be filled from a replica that has not seen a write yet. Sessions pinned to the
+primary after a write (read-your-writes) skip the cached entries and replace them with what the primary returns.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from . import transection
+from ..config import settings
+from ..database.routing import pinned_to_primary
+from ..schemas.transection.response import Response
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire `ttl_seconds` after they were written.
+    get/set are O(1), invalidate_where is O(size). Safe to share between the threadpool workers.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+transaction_cache = TTLCache("transaction", settings.CACHE_MAX_SIZE, settings.CACHE_TTL_SECONDS)
+type_cache = TTLCache("types", settings.CACHE_MAX_SIZE, settings.CACHE_TTL_SECONDS)
+sum_cache = TTLCache("sum", settings.CACHE_MAX_SIZE, settings.CACHE_TTL_SECONDS)
+CACHES = (transaction_cache, type_cache, sum_cache)
+
+
+def get_or_load(cache: TTLCache, key, loader, refresh: bool = False):
+    """
+    :param cache: cache to read through
+    :param key: cache key
+    :param loader: called on a miss, None results are not cached so a later create is visible right away
+    :param refresh: skip the cached value and replace it with the loaded one
+    :return: the cached or freshly loaded value
+    """
+    if not settings.CACHE_ENABLED:
+        return loader()
+    value = _MISSING if refresh else cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = loader()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+def get_transaction(db: Session, transaction_id: int):
+    """
+    Cached transection.get_transaction (get_transaction_row with READ_PATH=core),
+    returns a detached Response so entries outlive the session.
+    """
+    read = transection.get_transaction_row if settings.READ_PATH == "core" else transection.get_transaction
+    if not settings.CACHE_ENABLED:
+        return read(db, transaction_id)
+
+    def load():
+        transaction = read(db, transaction_id)
+        return Response.model_validate(transaction) if transaction is not None else None
+
+    return get_or_load(transaction_cache, transaction_id, load, refresh=pinned_to_primary(db))
+
+
+def get_transactions_by_type(db: Session, transaction_type: str, after: int = None, limit: int = None):
+    """
+    Cached transection.get_transactions_by_type (get_transaction_rows_by_type with READ_PATH=core),
+    every page of a type is cached under its own key.
+    """
+    read = transection.get_transaction_rows_by_type if settings.READ_PATH == "core" \
+        else transection.get_transactions_by_type
+    if not settings.CACHE_ENABLED:
+        return read(db, transaction_type, after=after, limit=limit)
+
+    def load():
+        transactions = read(db, transaction_type, after=after, limit=limit)
+        return [Response.model_validate(transaction) for transaction in transactions]
+
+    return get_or_load(type_cache, (transaction_type, after, limit), load, refresh=pinned_to_primary(db))
+
+
+def calculate_transaction_sum(db: Session, transaction_id: int, strategy: str, version: int = None) -> float:
+    """
+    Cached transection.calculate_transaction_sum, entries are stored as (version, sum).
+    Given the version of the row (ETag of GET /sum), an entry cached for another version is recomputed:
+    a write on another worker does not invalidate this cache, the sum must not be served under the new ETag.
+    """
+    if not settings.CACHE_ENABLED:
+        return transection.calculate_transaction_sum(db, transaction_id, strategy)
+    key = (transaction_id, strategy)
+    entry = None if pinned_to_primary(db) else sum_cache.get(key)
+    if entry is not None and (version is None or entry[0] == version):
+        return entry[1]
+    total = transection.calculate_transaction_sum(db, transaction_id, strategy)
+    sum_cache.set(key, (version, total))
+    return total
+
+
+def invalidate_created(db: Session, created: list, mode: str):
+    """
+    Drops the cache entries made stale by new transactions: the sums of every ancestor and the pages of their type.
+    Called after the write is committed.
+
+    :param db: SQL session object for database operations.
+    :param created: list of (type, parent_id) of the new transactions
+    :param mode: hierarchy mode the transactions were written with
+    """
+    if not settings.CACHE_ENABLED or not created:
+        return
+    types = {transaction_type for transaction_type, _ in created}
+    type_cache.invalidate_where(lambda key: key[0] in types)
+
+    parent_ids = {parent_id for _, parent_id in created if parent_id is not None}
+    if parent_ids:
+        ancestor_ids = transection.get_ancestor_ids(db, parent_ids, use_closure=mode == "closure")
+        sum_cache.invalidate_where(lambda key: key[0] in ancestor_ids)
+
+
+def stats() -> dict:
+    return {"enabled": settings.CACHE_ENABLED, **{cache.name: cache.stats() for cache in CACHES}}
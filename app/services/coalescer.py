@@ -0,0 +1,209 @@
+"""
+Group commit for PUT /transaction/{id} (WRITE_COALESCING=true).
+
+Concurrent creates are queued to a single writer thread, which collects them for up to WRITE_BATCH_WINDOW_MS
+or WRITE_BATCH_MAX_SIZE items and writes the whole group with create_batch: one DB transaction and one commit
+(one fsync on Postgres) for the group instead of one per request. Every caller waits on its own future and gets
+its own row or rejection, the rejected items of a group do not prevent the others from being committed.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.exc import IntegrityError
+
+from .transection import (DUPLICATE_TRANSACTION, TransactionRejected, create_batch, get_transaction,
+                          rejection_reason)
+from ..config import settings
+from ..database.db import SessionLocal
+from ..database.routing import use_primary
+from ..metrics.prometheus import COUNT_BUCKETS, REGISTRY, Histogram
+from ..model.transection import Transaction
+from ..schemas.transection.request import BatchItem
+
+BATCH_SIZES = REGISTRY.register(Histogram(
+    "write_coalescer_batch_size", "Creates written per group commit", buckets=COUNT_BUCKETS))
+BATCH_WRITE_SECONDS = REGISTRY.register(Histogram(
+    "write_coalescer_write_seconds", "Time spent writing and committing a group"))
+
+_STOP = object()
+
+
+class WriteCoalescer:
+
+    def __init__(self, session_factory, mode: str, window_seconds: float, max_size: int):
+        self.session_factory = session_factory
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, item: BatchItem) -> Future:
+        """
+        :return: future resolved with the created Transaction, or failed with TransactionRejected
+        """
+        future = Future()
+        self._start()
+        self._queue.put((item, future))
+        return future
+
+    def create(self, item: BatchItem):
+        return self.enqueue(item).result()
+
+    def close(self):
+        """
+        Writes the queued creates and stops the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        group = self._collect()
+        while group is not None:
+            self._flush(group)
+            group = self._collect()
+
+    def _collect(self):
+        """
+        Blocks for the first create, then gathers the creates arriving within the window.
+        :return: list of (item, future), None once close() was called
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        group = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(group) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                # write what was collected, the next _collect stops the thread
+                self._queue.put(_STOP)
+                break
+            group.append(entry)
+        return group
+
+    def _flush(self, group: list):
+        BATCH_SIZES.observe(len(group))
+        started_at = time.perf_counter()
+        try:
+            while group:
+                group = self._flush_round(group)
+        finally:
+            BATCH_WRITE_SECONDS.observe(time.perf_counter() - started_at)
+
+    def _flush_round(self, group: list) -> list:
+        """
+        Writes the first create of every id of the group and resolves its future. A repeated id waits for the
+        outcome of the previous create of the id, as if the requests had not been grouped: it is a duplicate when
+        that create went through, otherwise it is written by the next round.
+
+        :return: the (item, future) left for the next round
+        """
+        current, repeated, ids = [], [], set()
+        for entry in group:
+            (repeated if entry[0].id in ids else current).append(entry)
+            ids.add(entry[0].id)
+        try:
+            created, failed = self._write([item for item, _ in current])
+        except Exception as error:
+            for _, future in group:
+                future.set_exception(error)
+            return []
+
+        created = set(created)
+        # a single item per id in the round, so a single reason per id
+        failures = dict(failed)
+        for item, future in current:
+            if item.id in created:
+                future.set_result(Transaction(id=item.id, amount=item.amount, type=item.type,
+                                              parent_id=item.parent_id))
+            else:
+                future.set_exception(TransactionRejected(failures.get(item.id, DUPLICATE_TRANSACTION)))
+
+        left = []
+        for item, future in repeated:
+            if item.id in created:
+                future.set_exception(TransactionRejected(DUPLICATE_TRANSACTION))
+            else:
+                left.append((item, future))
+        return left
+
+    def _write(self, items: list) -> (list, list):
+        db = self.session_factory()
+        use_primary(db)
+        try:
+            try:
+                return create_batch(db, items, self.mode)
+            except IntegrityError:
+                # a writer outside the group took one of the ids or parents changed under the group,
+                # retry the items one by one so only the conflicting ones are rejected
+                db.rollback()
+            created, failed = [], []
+            for item in items:
+                try:
+                    item_created, item_failed = create_batch(db, [item], self.mode)
+                except IntegrityError:
+                    db.rollback()
+                    item_created = []
+                    item_failed = [(item.id, rejection_reason(get_transaction(db, item.id) is not None))]
+                created.extend(item_created)
+                failed.extend(item_failed)
+            return created, failed
+        finally:
+            db.close()
+
+
+def to_batch_item(transaction, transaction_id: int) -> BatchItem:
+    # the PUT body is already validated, the id of the path is not bound by the batch id validator
+    return BatchItem.model_construct(id=transaction_id, amount=transaction.amount, type=transaction.type,
+                                     parent_id=transaction.parent_id)
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> WriteCoalescer:
+    """
+    Process wide coalescer, created on first use.
+    """
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = WriteCoalescer(
+                SessionLocal,
+                mode=settings.HIERARCHY_MODE,
+                window_seconds=settings.WRITE_BATCH_WINDOW_MS / 1000,
+                max_size=settings.WRITE_BATCH_MAX_SIZE,
+            )
+        return _coalescer
+
+
+def close_coalescer():
+    """
+    Writes the queued creates and stops the writer thread of the process wide coalescer, if one was started.
+    The next get_coalescer() builds a new one.
+    """
+    global _coalescer
+    with _coalescer_lock:
+        writer, _coalescer = _coalescer, None
+    if writer is not None:
+        writer.close()
@@ -1,14 +1,96 @@
+from collections import defaultdict, deque
+
 from sqlalchemy.orm import Session
-from ..model.transection import Transaction, TransactionClosure
+from ..model.transection import Transaction, TransactionClosure, TransactionTypeStats
+from ..config import settings
 from ..schemas.transection.request import Create
-from sqlalchemy import text
+from sqlalchemy import (BigInteger, Double, Integer, String, bindparam, case, exists, func, insert, literal, select,
+                        text, true, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+DUPLICATE_TRANSACTION = "Transaction ID already exists"
+PARENT_NOT_FOUND = "Parent transaction not found"
+
+# columns of the Response schema, selected by the Core (ORM-free) read paths
+TRANSACTION_COLUMNS = (Transaction.id, Transaction.amount, Transaction.type, Transaction.parent_id)
+
+
+class TransactionRejected(ValueError):
+    """
+    A create was refused, the message is DUPLICATE_TRANSACTION or PARENT_NOT_FOUND.
+    """
+
+# raw SQL shared by the sync and the async (transection_async) service functions
+ANCESTOR_SUMS_QUERY = text("""
+    WITH RECURSIVE ancestors AS (
+        SELECT id, parent_id FROM transactions WHERE id = :parent_id
+        UNION ALL
+        SELECT t.id, t.parent_id
+        FROM transactions t
+        INNER JOIN ancestors a ON t.id = a.parent_id
+    )
+    UPDATE transactions SET subtree_sum = subtree_sum + :amount, version = version + 1
+    WHERE id IN (SELECT id FROM ancestors);
+""")
+
+ANCESTOR_IDS_QUERY = text("""
+    WITH RECURSIVE ancestors AS (
+        SELECT id, parent_id FROM transactions WHERE id IN :transaction_ids
+        UNION
+        SELECT t.id, t.parent_id
+        FROM transactions t
+        INNER JOIN ancestors a ON t.id = a.parent_id
+    )
+    SELECT id FROM ancestors;
+""").bindparams(bindparam("transaction_ids", expanding=True))
+
+CLOSURE_INSERT_QUERY = text("""
+    INSERT INTO transaction_closure (ancestor_id, descendant_id)
+    SELECT ancestor_id, CAST(:transaction_id AS BIGINT) FROM transaction_closure WHERE descendant_id = :parent_id
+    UNION ALL
+    SELECT CAST(:transaction_id AS BIGINT), CAST(:transaction_id AS BIGINT);
+""")
+
+CLOSURE_ANCESTOR_SUMS_QUERY = text("""
+    UPDATE transactions SET subtree_sum = subtree_sum + :amount, version = version + 1
+    WHERE id IN (SELECT ancestor_id FROM transaction_closure WHERE descendant_id = :parent_id);
+""")
+
+LINKED_SUM_QUERY = text("""
+    WITH RECURSIVE linked_transactions AS (
+        SELECT id, amount, parent_id FROM transactions WHERE id = :transaction_id
+        UNION ALL
+        SELECT t.id, t.amount, t.parent_id
+        FROM transactions t
+        INNER JOIN linked_transactions lt ON lt.id = t.parent_id
+    )
+    SELECT SUM(amount) FROM linked_transactions;
+""")
+
+PATH_SUM_QUERY = text("""
+    SELECT SUM(amount) FROM transactions WHERE path LIKE :prefix;
+""")
+
+TREE_SUM_QUERY = text("""
+    SELECT SUM(amount) FROM transactions WHERE root_id = :root_id;
+""")
+
+CLOSURE_SUM_QUERY = text("""
+    SELECT SUM(t.amount)
+    FROM transactions t
+    INNER JOIN transaction_closure tc ON t.id = tc.descendant_id
+    WHERE tc.ancestor_id = :transaction_id;
+""")
 
 
 def create(db: Session, transaction: Create, transaction_id: int):
     """
     First Approach
-    This function handles the creation of a new transaction in O(1) time as it only involves inserting a new record into the `transactions` table.
-    Advantage: Insertion is done in O(1) time. This approach works better if the system has more insertions compared to querying the SUM of transactions, especially when there is a deeper parent-child hierarchy.
+    This function handles the creation of a new transaction by inserting a new record into the `transactions` table
+    and adding its amount to the subtree_sum of its ancestors.
+    Insertion is O(d) where 'd' is the depth of the new transaction: add_to_ancestor_sums updates, and row-locks
+    until the commit, every ancestor, so concurrent writes into the same tree serialize on its root row.
 
     :param transaction_id: transaction id
     :param db : SQL session object for database operations.
@@ -20,18 +102,180 @@ def create(db: Session, transaction: Create, transaction_id: int):
 
     """
 
+    root_id, depth = tree_position_expressions(transaction.parent_id, transaction_id)
     db_transaction = Transaction(
         id=transaction_id,
         amount=transaction.amount,
         type=transaction.type,
-        parent_id=transaction.parent_id
+        parent_id=transaction.parent_id,
+        subtree_sum=transaction.amount,
+        root_id=root_id,
+        depth=depth
     )
     db.add(db_transaction)
+    add_to_ancestor_sums(db, transaction.parent_id, transaction.amount)
+    add_to_type_stats(db, [(transaction.type, transaction.amount)])
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
 
 
+def add_to_ancestor_sums(db: Session, parent_id: int, amount: float, use_closure: bool = False):
+    """
+    Adds the amount of a newly created transaction to the subtree_sum of every ancestor,
+    and bumps their version so the ETag of their /sum changes.
+    The update runs in the caller's DB transaction so the new row and the aggregates are committed together.
+    O(d) - where 'd' is the depth of the new transaction, each ancestor row is updated in place and stays
+    row-locked until the commit, so concurrent creates in the same tree wait on each other at the root.
+
+    :param db: SQL session object for database operations.
+    :param parent_id: parent of the new transaction, nothing is updated for a root transaction
+    :param amount: amount of the new transaction
+    :param use_closure: walk the ancestors through the transaction_closure table instead of parent_id links
+    """
+    if parent_id is None:
+        return
+
+    query = CLOSURE_ANCESTOR_SUMS_QUERY if use_closure else ANCESTOR_SUMS_QUERY
+    db.execute(query, {"parent_id": parent_id, "amount": amount})
+
+
+def tree_position_expressions(parent_id: int, transaction_id: int):
+    """
+    root_id and depth of a new transaction, copied from the stored values of its parent inside the INSERT
+    (like parent_path_expression), so the insert does not need a separate read of the parent row.
+
+    :return: (root_id, depth) as values for a root, as scalar subqueries on the parent row otherwise
+    """
+    if parent_id is None:
+        return transaction_id, 0
+    parent = Transaction.id == parent_id
+    return (select(Transaction.root_id).where(parent).scalar_subquery(),
+            select(Transaction.depth + 1).where(parent).scalar_subquery())
+
+
+def child_tree_position(transaction_id: int, parent_id: int, positions: dict) -> tuple:
+    """
+    :param positions: dict id -> (root_id, depth) of the known transactions
+    :return: (root_id, depth) of a new transaction, (None, None) under a parent that was not backfilled yet
+    """
+    if parent_id is None:
+        return transaction_id, 0
+    root_id, depth = positions.get(parent_id, (None, None))
+    return (root_id, depth + 1) if root_id is not None else (None, None)
+
+
+def summarize_types(rows) -> dict:
+    """
+    :param rows: iterable of (type, amount)
+    :return: dict type -> [count, total, min amount, max amount]
+    """
+    stats = {}
+    for transaction_type, amount in rows:
+        entry = stats.get(transaction_type)
+        if entry is None:
+            stats[transaction_type] = [1, amount, amount, amount]
+        else:
+            entry[0] += 1
+            entry[1] += amount
+            entry[2] = min(entry[2], amount)
+            entry[3] = max(entry[3], amount)
+    return stats
+
+
+def add_to_type_stats(db: Session, rows: list):
+    """
+    Adds new transactions to the per type aggregate in the caller's DB transaction,
+    one upsert for all the types of a batch where the database supports INSERT ... ON CONFLICT DO UPDATE.
+    Concurrent creates of the same type wait on its aggregate row until the first one commits,
+    the rows are locked in type order so two batches with the same types cannot deadlock.
+
+    :param db: SQL session object for database operations.
+    :param rows: list of (type, amount) of the new transactions
+    """
+    if not settings.TYPE_STATS_ENABLED or not rows:
+        return
+    stats = sorted(summarize_types(rows).items())
+    dialect_name = db.get_bind().dialect.name
+    columns = TransactionTypeStats.__table__.c
+
+    if dialect_name in ON_CONFLICT_INSERTS:
+        statement = ON_CONFLICT_INSERTS[dialect_name](TransactionTypeStats).values([
+            {"type": transaction_type, "count": count, "total": total, "min_amount": low, "max_amount": high}
+            for transaction_type, (count, total, low, high) in stats
+        ])
+        excluded = statement.excluded
+        # multi-argument min/max are scalar functions on sqlite
+        smallest, largest = (func.least, func.greatest) if dialect_name == "postgresql" else (func.min, func.max)
+        db.execute(statement.on_conflict_do_update(index_elements=["type"], set_={
+            "count": columns.count + excluded.count,
+            "total": columns.total + excluded.total,
+            "min_amount": smallest(func.coalesce(columns.min_amount, excluded.min_amount), excluded.min_amount),
+            "max_amount": largest(func.coalesce(columns.max_amount, excluded.max_amount), excluded.max_amount),
+        }))
+        return
+
+    for transaction_type, (count, total, low, high) in stats:
+        result = db.execute(update(TransactionTypeStats).where(columns.type == transaction_type).values(
+            count=columns.count + count,
+            total=columns.total + total,
+            min_amount=case((columns.min_amount <= low, columns.min_amount), else_=low),
+            max_amount=case((columns.max_amount >= high, columns.max_amount), else_=high),
+        ))
+        if result.rowcount == 0:
+            db.execute(insert(TransactionTypeStats).values(type=transaction_type, count=count, total=total,
+                                                           min_amount=low, max_amount=high))
+
+
+def get_type_stats(db: Session, transaction_type: str) -> dict:
+    """
+    count, sum, min and max of the amounts of a type.
+    O(1) - a primary key read of the aggregate table when TYPE_STATS_ENABLED,
+    otherwise O(n) aggregate over the (type, id) INCLUDE (amount) index, without touching the table on postgres.
+
+    :param db: SQL session object for database operations.
+    :param transaction_type: type of the transactions
+    :return: dict with type, count, sum, min and max (None when there is no transaction of the type)
+    """
+    if settings.TYPE_STATS_ENABLED:
+        stats = db.get(TransactionTypeStats, transaction_type)
+        row = (stats.count, stats.total, stats.min_amount, stats.max_amount) if stats is not None \
+            else (0, 0.0, None, None)
+    else:
+        row = db.execute(
+            select(func.count(), func.coalesce(func.sum(Transaction.amount), 0.0),
+                   func.min(Transaction.amount), func.max(Transaction.amount))
+            .where(Transaction.type == transaction_type)
+        ).one()
+    count, total, low, high = row
+    return {"type": transaction_type, "count": count, "sum": total, "min": low, "max": high}
+
+
+def get_ancestor_ids(db: Session, transaction_ids, use_closure: bool = False,
+                     chunk_size: int = settings.QUERY_CHUNK_SIZE) -> set:
+    """
+    Collects the given transactions and all their ancestors, the set of trees whose sums change
+    when a child is added under one of the given transactions.
+    O(d) - where 'd' is the depth of the transactions, shared ancestors are only visited once.
+
+    :param db: SQL session object for database operations.
+    :param transaction_ids: ids to start from
+    :param use_closure: read the ancestors from the transaction_closure table instead of walking parent_id links
+    :param chunk_size: max number of ids bound into a single query
+    :return: set of ids, the given ids included
+    """
+    transaction_ids = [transaction_id for transaction_id in transaction_ids if transaction_id is not None]
+    ancestor_ids = set()
+    for start in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[start:start + chunk_size]
+        if use_closure:
+            query = select(TransactionClosure.ancestor_id).where(TransactionClosure.descendant_id.in_(chunk))
+            ancestor_ids.update(db.execute(query).scalars())
+        else:
+            ancestor_ids.update(db.execute(ANCESTOR_IDS_QUERY, {"transaction_ids": chunk}).scalars())
+    return ancestor_ids
+
+
 def get_transaction(db: Session, transaction_id: int):
     """
     This function checking is transaction exit in our system or not.
@@ -45,6 +289,19 @@ def get_transaction(db: Session, transaction_id: int):
     return db.query(Transaction).filter(Transaction.id == transaction_id).first()
 
 
+def get_version(db: Session, transaction_id: int):
+    """
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return: version of the subtree of the transaction, bumped by every create below it, None if it does not exist
+    """
+    row = db.query(Transaction.version).filter(Transaction.id == transaction_id).first()
+    if row is None:
+        return None
+    # the column default is only applied on flush, a pending object has no version yet
+    return row.version or 0
+
+
 def get_transaction_by_parent(db: Session, parent_id: int) -> [Transaction]:
     """
     :param db : SQL session object for database operations.
@@ -54,19 +311,162 @@ def get_transaction_by_parent(db: Session, parent_id: int) -> [Transaction]:
     return db.query(Transaction).filter(Transaction.parent_id == parent_id).all()
 
 
-def get_transactions_by_type(db: Session, transaction_type: str):
+def get_transactions_by_type(db: Session, transaction_type: str, after: int = None, limit: int = None):
     """
     Fetches all transactions from the database that match the given type.
     O(n) - where 'n' is the number of transactions in the database.
     This is because the function must scan all transactions to filter out those that match the given type.
 
+    With `after`/`limit` the listing is keyset paginated on id: a page costs O(limit) through the type index
+    whatever its position, unlike OFFSET pagination which rescans the skipped rows.
+
     :param: db : The database session used to perform the query.
     :param : transaction_type (str): The type of transactions to filter by.
+    :param : after: only return transactions with an id greater than this cursor
+    :param : limit: max number of transactions to return
 
     :returns: List[Transaction]: A list of transactions that match the specified type.
     """
+    query = db.query(Transaction).filter(Transaction.type == transaction_type)
+    if after is None and limit is None:
+        return query.all()
+
+    if after is not None:
+        query = query.filter(Transaction.id > after)
+    query = query.order_by(Transaction.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
-    return db.query(Transaction).filter(Transaction.type == transaction_type).all()
+
+def get_transaction_row(db: Session, transaction_id: int):
+    """
+    Core counterpart of get_transaction for the lean read path (READ_PATH=core):
+    a plain (id, amount, type, parent_id) row, without ORM instance or identity map bookkeeping.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return: row or None
+    """
+    return db.execute(select(*TRANSACTION_COLUMNS).where(Transaction.id == transaction_id)).first()
+
+
+def get_transaction_rows_by_type(db: Session, transaction_type: str, after: int = None, limit: int = None) -> list:
+    """
+    Core counterpart of get_transactions_by_type, same filtering and keyset pagination,
+    rows are plain (id, amount, type, parent_id) tuples.
+    """
+    query = select(*TRANSACTION_COLUMNS).where(Transaction.type == transaction_type)
+    if after is None and limit is None:
+        return db.execute(query).all()
+
+    if after is not None:
+        query = query.where(Transaction.id > after)
+    query = query.order_by(Transaction.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return db.execute(query).all()
+
+
+def stream_transactions_by_type(db: Session, transaction_type: str, after: int = None,
+                                batch_size: int = settings.STREAM_BATCH_SIZE):
+    """
+    Streams the transactions of a type ordered by id through a server side cursor.
+    Rows are plain (id, amount, type, parent_id) tuples fetched `batch_size` at a time,
+    so memory stays constant whatever the number of matching transactions.
+
+    :param db: SQL session object for database operations.
+    :param transaction_type: (str): The type of transactions to filter by.
+    :param after: only return transactions with an id greater than this cursor
+    :param batch_size: rows fetched per round trip
+    :return: iterator of rows
+    """
+    query = select(*TRANSACTION_COLUMNS).where(Transaction.type == transaction_type)
+    if after is not None:
+        query = query.where(Transaction.id > after)
+    query = query.order_by(Transaction.id).execution_options(yield_per=batch_size)
+    for row in db.execute(query):
+        yield row
+
+
+# zero padded ids, so the text sort key of a node orders its subtree depth first by id
+PADDED_ID_EXPRESSIONS = {
+    "sqlite": "printf('%020d', {column})",
+    "postgresql": "LPAD(CAST({column} AS VARCHAR), 20, '0')",
+}
+SUBTREE_ORDERS = {
+    "bfs": "depth, id",
+    "dfs": "sort_key",
+}
+# max_depth of an unbounded export
+UNBOUNDED_DEPTH = 2 ** 31 - 1
+
+# bfs export of a whole tree without recursion, one (root_id, depth) index range (TREE_COLUMNS_BACKFILLED)
+ROOT_SUBTREE_QUERY = text("""
+    SELECT id, amount, type, parent_id, depth FROM transactions
+    WHERE root_id = :transaction_id AND depth <= :max_depth
+    ORDER BY depth, id;
+""")
+
+
+def subtree_query(dialect_name: str, order: str):
+    """
+    Recursive CTE of a subtree with the depth of every node below the root, and for dfs a sort key of the padded
+    ids of the path from the root. bfs only sorts by (depth, id) and does not build the key.
+    """
+    if order not in SUBTREE_ORDERS:
+        raise ValueError(f"Unknown subtree order '{order}'")
+    root_key, child_key = "", ""
+    if order == "dfs":
+        padded_id = PADDED_ID_EXPRESSIONS.get(dialect_name, PADDED_ID_EXPRESSIONS["postgresql"])
+        root_key = f", {padded_id.format(column='id')} AS sort_key"
+        child_key = f",\n                   s.sort_key || '/' || {padded_id.format(column='t.id')}"
+    return text(f"""
+        WITH RECURSIVE subtree AS (
+            SELECT id, amount, type, parent_id, 0 AS depth{root_key}
+            FROM transactions WHERE id = :transaction_id
+            UNION ALL
+            SELECT t.id, t.amount, t.type, t.parent_id, s.depth + 1{child_key}
+            FROM transactions t
+            INNER JOIN subtree s ON t.parent_id = s.id
+            WHERE s.depth < :max_depth
+        )
+        SELECT id, amount, type, parent_id, depth FROM subtree ORDER BY {SUBTREE_ORDERS[order]};
+    """)
+
+
+def is_root(db: Session, transaction_id: int) -> bool:
+    """
+    :return: True if the transaction is the root of a tree whose root_id/depth are filled
+    """
+    return db.execute(select(Transaction.root_id).where(Transaction.id == transaction_id)).scalar() == transaction_id
+
+
+def stream_subtree(db: Session, transaction_id: int, order: str = "bfs", max_depth: int = None,
+                   batch_size: int = settings.STREAM_BATCH_SIZE):
+    """
+    Streams every node of the tree rooted at a transaction, the root included at depth 0,
+    through a server side cursor so memory stays constant whatever the size of the tree.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: root of the export
+    :param order: bfs (level by level, by id inside a level) or dfs (pre-order, children by id)
+    :param max_depth: deepest level exported, unbounded when None
+    :param batch_size: rows fetched per round trip
+    :return: iterator of (id, amount, type, parent_id, depth) rows
+
+    Time Complexity:
+        O(n log n) - where 'n' is the size of the exported subtree, sorted by the database.
+    """
+    if settings.TREE_COLUMNS_BACKFILLED and order == "bfs" and is_root(db, transaction_id):
+        # the depth below a root is the stored depth
+        query = ROOT_SUBTREE_QUERY
+    else:
+        query = subtree_query(db.get_bind().dialect.name, order)
+    params = {"transaction_id": transaction_id,
+              "max_depth": UNBOUNDED_DEPTH if max_depth is None else max_depth}
+    for row in db.execute(query.execution_options(yield_per=batch_size), params):
+        yield row
 
 
 def calculate_sum(db: Session, transaction_id: int) -> float:
@@ -94,15 +494,14 @@ def calculate_sum(db: Session, transaction_id: int) -> float:
         return 0.0
 
     # Creating a queue and pushing the root parent transaction
-    queue = [transaction]
+    queue = deque([transaction])
     sum = 0.0
 
     while len(queue) != 0:
         number_of_child = len(queue)
         # If this node has children
         while number_of_child > 0:
-            transaction = queue[0]
-            queue.pop(0)
+            transaction = queue.popleft()
             sum += transaction.amount
             childrens = get_transaction_by_parent(db, transaction.id)
             # push all children of the queue item
@@ -112,6 +511,56 @@ def calculate_sum(db: Session, transaction_id: int) -> float:
     return sum
 
 
+def get_children_amounts(db: Session, parent_ids: list, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> list:
+    """
+    Fetches (id, amount) of every child of the given parents, `chunk_size` parents per query
+    so the IN list stays under the bind parameter limit of the database.
+
+    :param db: SQL session object for database operations.
+    :param parent_ids: ids of the current frontier
+    :param chunk_size: max number of parent ids bound into a single query
+    :return: list of (id, amount) rows
+    """
+    children = []
+    for start in range(0, len(parent_ids), chunk_size):
+        chunk = parent_ids[start:start + chunk_size]
+        query = select(Transaction.id, Transaction.amount).where(Transaction.parent_id.in_(chunk))
+        children.extend(db.execute(query).all())
+    return children
+
+
+def calculate_sum_batched(db: Session, transaction_id: int) -> float:
+    """
+    Level-batched Approach:
+    Same breadth first walk as calculate_sum, but a whole level of the tree is fetched at once
+    with `parent_id IN (...)` and only the (id, amount) columns are loaded.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return : sum of all transaction . part of current tree -parent- chile tree
+
+    Time Complexity:
+        O(n) - where 'n' is the number of linked transactions.
+    Space Complexity:
+        O(w) - where 'w' is the width of the widest level of the tree.
+
+    Advantage over Queue-based Approach:
+        - O(depth + n / chunk_size) queries instead of one query per node.
+        - no ORM objects are built for the descendants.
+    """
+    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    if not transaction:
+        return 0.0
+
+    total_sum = transaction.amount
+    frontier = [transaction.id]
+    while frontier:
+        children = get_children_amounts(db, frontier)
+        frontier = [child_id for child_id, _ in children]
+        total_sum += sum(amount for _, amount in children)
+    return total_sum
+
+
 def calculate_sum_v2(db: Session, transaction_id: int) -> float:
     """
     Recursive Approach using SQL:
@@ -135,17 +584,7 @@ def calculate_sum_v2(db: Session, transaction_id: int) -> float:
         - This approach might hit performance limits if the hierarchy is too deep or if the dataset is very large.
     """
 
-    query = text("""
-        WITH RECURSIVE linked_transactions AS (
-            SELECT id, amount, parent_id FROM transactions WHERE id = :transaction_id
-            UNION ALL
-            SELECT t.id, t.amount, t.parent_id
-            FROM transactions t
-            INNER JOIN linked_transactions lt ON lt.id = t.parent_id
-        )
-        SELECT SUM(amount) FROM linked_transactions;
-    """)
-    result = db.execute(query, {"transaction_id": transaction_id}).scalar()
+    result = db.execute(LINKED_SUM_QUERY, {"transaction_id": transaction_id}).scalar()
     total_sum = result if result else 0.0
     return total_sum
 
@@ -157,6 +596,8 @@ def create_v2(db: Session, transaction: Create, transaction_id: int):
     Second Approach
     This function handles the creation of a new transaction and updates the transaction closure table
     to maintain the ancestor-descendant relationships.
+    The closure rows are derived from the rows of the parent with a single INSERT ... SELECT,
+    so a deep chain costs one statement instead of one ORM object per ancestor.
 
     :param transaction_id: transaction id
     :param db: SQL session object for database operations
@@ -166,23 +607,22 @@ def create_v2(db: Session, transaction: Create, transaction_id: int):
 
     :raises:    HTTPException: If any database operation fails, the transaction is rolled back, and an error is raised.
     """
-    # Step 1: Insert into the transactions table
-    db_transaction = Transaction(id=transaction_id,  amount=transaction.amount, type=transaction.type, parent_id=transaction.parent_id)
+    # Step 1: Insert into the transactions table, flushed so the closure rows can reference it
+    root_id, depth = tree_position_expressions(transaction.parent_id, transaction_id)
+    db_transaction = Transaction(id=transaction_id,  amount=transaction.amount, type=transaction.type,
+                                 parent_id=transaction.parent_id, subtree_sum=transaction.amount,
+                                 root_id=root_id, depth=depth)
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    db.flush()
 
-    # Step 2: Insert into the transaction_closure table
-    # Insert self-relation
-    db.add(TransactionClosure(ancestor_id=db_transaction.id, descendant_id=db_transaction.id))
-
-    # Insert ancestor relationships if parent_id is not None
-    if transaction.parent_id is not None:
-        ancestors = db.query(TransactionClosure).filter(TransactionClosure.descendant_id == transaction.parent_id).all()
-        for ancestor in ancestors:
-            db.add(TransactionClosure(ancestor_id=ancestor.ancestor_id, descendant_id=db_transaction.id))
+    # Step 2: Insert the self-relation and a copy of every ancestor row of the parent in one statement
+    db.execute(CLOSURE_INSERT_QUERY, {"transaction_id": transaction_id, "parent_id": transaction.parent_id})
 
+    add_to_ancestor_sums(db, transaction.parent_id, transaction.amount, use_closure=True)
+    add_to_type_stats(db, [(transaction.type, transaction.amount)])
+    # single commit, the transaction and its closure rows are written atomically
     db.commit()
+    db.refresh(db_transaction)
     return db_transaction
 
 
@@ -202,13 +642,563 @@ def calculate_sum_using_closure(db: Session, transaction_id: int) -> float:
         O(n) - where 'n' is the number of descendants (including the root transaction).
     """
 
-    query =  text("""
-        SELECT SUM(t.amount)
-        FROM transactions t
-        INNER JOIN transaction_closure tc ON t.id = tc.descendant_id
-        WHERE tc.ancestor_id = :transaction_id;
-    """)
-
-    result = db.execute(query, {"transaction_id": transaction_id}).scalar()
+    result = db.execute(CLOSURE_SUM_QUERY, {"transaction_id": transaction_id}).scalar()
     total_sum = result if result else 0.0  # Return 0 if the sum is None (no transactions found)
     return total_sum
+
+
+def build_path(transaction_id: int, parent_path: str = None) -> str:
+    """
+    :return: materialized path of a transaction, "/<root id>/.../<id>/"
+    """
+    return f"{parent_path or '/'}{transaction_id}/"
+
+
+def parent_path_expression(parent_id: int, transaction_id: int):
+    """
+    SQL expression computing the path of a new transaction from the stored path of its parent,
+    so the insert does not need a separate read of the parent row.
+    """
+    if parent_id is None:
+        return build_path(transaction_id)
+    parent_path = select(Transaction.path).where(Transaction.id == parent_id).scalar_subquery()
+    return parent_path + f"{transaction_id}/"
+
+
+def create_with_path(db: Session, transaction: Create, transaction_id: int):
+    """
+    Third Approach
+    Stores the materialized path of the transaction ("/<root id>/.../<id>/") next to the parent_id link.
+    The path is derived from the parent path inside the INSERT, so the hierarchy itself costs a single row
+    instead of the depth+1 rows of the closure table. Like every create path, the subtree_sum and version
+    of the ancestors are still updated (add_to_ancestor_sums: one UPDATE of the O(depth) ancestor rows),
+    the ETag of GET /sum depends on them whatever the SUM_STRATEGY.
+
+    :param transaction_id: transaction id
+    :param db: SQL session object for database operations
+    :param transaction: transaction (TransactionCreate): Pydantic model containing the transaction data.
+
+    :returns: Transaction: The created Transaction object.
+
+    Potential Drawbacks:
+        - the key grows with the depth of the tree, very deep chains make long index keys.
+        - the ancestor aggregate update locks every ancestor row up to the root until the commit.
+    """
+    root_id, depth = tree_position_expressions(transaction.parent_id, transaction_id)
+    db_transaction = Transaction(
+        id=transaction_id,
+        amount=transaction.amount,
+        type=transaction.type,
+        parent_id=transaction.parent_id,
+        subtree_sum=transaction.amount,
+        path=parent_path_expression(transaction.parent_id, transaction_id),
+        root_id=root_id,
+        depth=depth
+    )
+    db.add(db_transaction)
+    add_to_ancestor_sums(db, transaction.parent_id, transaction.amount)
+    add_to_type_stats(db, [(transaction.type, transaction.amount)])
+    db.commit()
+    db.refresh(db_transaction)
+    return db_transaction
+
+
+def get_path(db: Session, transaction_id: int):
+    """
+    :return: materialized path of the transaction, None if missing or not backfilled yet
+    """
+    return db.query(Transaction.path).filter(Transaction.id == transaction_id).scalar()
+
+
+def calculate_sum_using_path(db: Session, transaction_id: int) -> float:
+    """
+    Materialized path Approach:
+    The subtree of a transaction is every row whose path starts with its path,
+    read with one range scan of the path index.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return : sum of all transaction . part of current tree -parent- chile tree
+
+    Time Complexity:
+        O(log N + n) - index seek then a scan of the 'n' rows of the subtree.
+    """
+    path = get_path(db, transaction_id)
+    if path is None:
+        # rows written before the path mode existed and not backfilled yet
+        return calculate_sum_batched(db, transaction_id)
+    result = db.execute(PATH_SUM_QUERY, {"prefix": f"{path}%"}).scalar()
+    total_sum = result if result else 0.0
+    return total_sum
+
+
+def calculate_sum_from_aggregate(db: Session, transaction_id: int) -> float:
+    """
+    Reads the persisted subtree_sum of a transaction, which the create path keeps up to date
+    for every ancestor of a new transaction.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return : sum of all transaction . part of current tree -parent- chile tree
+
+    Time Complexity:
+        O(1) - single primary key lookup, independent of the size of the tree.
+
+    Potential Drawbacks:
+        - every insert pays O(depth) row updates on the ancestor chain.
+        - the aggregate can only be trusted if every write goes through the create path,
+          use `python -m app.commands.subtree_sums verify` to detect drift.
+    """
+    result = db.query(Transaction.subtree_sum).filter(Transaction.id == transaction_id).scalar()
+    total_sum = result if result else 0.0
+    return total_sum
+
+
+def get_tree_level(db: Session, root_id: int, depth: int, parent_ids: list,
+                   chunk_size: int = settings.QUERY_CHUNK_SIZE) -> list:
+    """
+    Fetches (id, amount) of the children of the given parents, which all are at `depth` in the tree of `root_id`,
+    from the (root_id, depth) index range of that level, `chunk_size` parents per query.
+    """
+    children = []
+    for start in range(0, len(parent_ids), chunk_size):
+        chunk = parent_ids[start:start + chunk_size]
+        query = select(Transaction.id, Transaction.amount).where(
+            Transaction.root_id == root_id, Transaction.depth == depth, Transaction.parent_id.in_(chunk))
+        children.extend(db.execute(query).all())
+    return children
+
+
+def calculate_sum_in_tree(db: Session, transaction_id: int) -> float:
+    """
+    Root and Depth Approach:
+    Every transaction stores the root of its tree and its depth, so the search never leaves the tree of the
+    transaction. The sum of a root is one aggregate over the root_id range of the (root_id, depth) index,
+    other transactions are walked level by level, each level being one (root_id, depth) range, without recursion.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return : sum of all transaction . part of current tree -parent- chile tree
+
+    Time Complexity:
+        O(log N + t) for a root - where 't' is the size of the tree, an index only scan on postgres.
+        O(n) otherwise - where 'n' is the number of linked transactions, O(depth + n / chunk_size) queries.
+
+    Potential Drawbacks:
+        - rows written before the columns existed need `python -m app.commands.backfill_tree_columns`,
+          until TREE_COLUMNS_BACKFILLED is set the sum is computed by calculate_sum_batched: a backfilled root
+          would otherwise miss the descendants whose root_id is still NULL.
+    """
+    if not settings.TREE_COLUMNS_BACKFILLED:
+        return calculate_sum_batched(db, transaction_id)
+    transaction = db.execute(select(Transaction.root_id, Transaction.depth, Transaction.amount)
+                             .where(Transaction.id == transaction_id)).first()
+    if transaction is None:
+        return 0.0
+    if transaction.root_id is None:
+        # rows written before the root_id/depth columns existed and not backfilled yet
+        return calculate_sum_batched(db, transaction_id)
+    if transaction.depth == 0:
+        result = db.execute(TREE_SUM_QUERY, {"root_id": transaction.root_id}).scalar()
+        return result if result else 0.0
+
+    total_sum = transaction.amount
+    frontier, depth = [transaction_id], transaction.depth
+    while frontier:
+        depth += 1
+        children = get_tree_level(db, transaction.root_id, depth, frontier)
+        frontier = [child_id for child_id, _ in children]
+        total_sum += sum(amount for _, amount in children)
+    return total_sum
+
+
+SUM_STRATEGIES = {
+    "batched": calculate_sum_batched,
+    "queue": calculate_sum,
+    "recursive": calculate_sum_v2,
+    "closure": calculate_sum_using_closure,
+    "aggregate": calculate_sum_from_aggregate,
+    "path": calculate_sum_using_path,
+    "tree": calculate_sum_in_tree,
+}
+
+
+def calculate_transaction_sum(db: Session, transaction_id: int, strategy: str) -> float:
+    """
+    Computes the sum of a transaction tree with the configured strategy.
+
+    :param db: SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :param strategy: one of SUM_STRATEGIES
+    :return : sum of all transaction . part of current tree -parent- chile tree
+    """
+    if strategy not in SUM_STRATEGIES:
+        raise ValueError(f"Unknown sum strategy '{strategy}'")
+    return SUM_STRATEGIES[strategy](db, transaction_id)
+
+
+def get_rows_by_column(db: Session, column, values, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> list:
+    """
+    :return: (id, parent_id, amount, subtree_sum) of the transactions whose `column` is in `values`
+    """
+    values = list(values)
+    rows = []
+    for start in range(0, len(values), chunk_size):
+        query = select(Transaction.id, Transaction.parent_id, Transaction.amount, Transaction.subtree_sum) \
+            .where(column.in_(values[start:start + chunk_size]))
+        rows.extend(db.execute(query).all())
+    return rows
+
+
+def calculate_sums(db: Session, transaction_ids: list, strategy: str = "batched") -> (dict, list):
+    """
+    Shared Subtree Approach
+    Totals of many transactions in one pass. The union of their subtrees is walked once, level by level,
+    then totals are accumulated bottom-up so the total of a requested descendant is reused by its ancestors
+    instead of walking its subtree again.
+
+    :param db: SQL session object for database operations.
+    :param transaction_ids: ids to compute the totals of, duplicates are allowed
+    :param strategy: the aggregate strategy reads the persisted subtree_sum, any other strategy walks the trees
+    :return: (dict id -> total, list of the ids that do not exist)
+
+    Time Complexity:
+        O(u) - where 'u' is the size of the union of the subtrees, against the sum of their sizes for
+        one calculate_sum call per id. O(depth + u / chunk_size) queries.
+    """
+    requested = list(dict.fromkeys(transaction_ids))
+    found = get_rows_by_column(db, Transaction.id, requested)
+    if strategy == "aggregate":
+        stored = {row.id: row.subtree_sum for row in found}
+        return ({transaction_id: stored[transaction_id] for transaction_id in requested if transaction_id in stored},
+                [transaction_id for transaction_id in requested if transaction_id not in stored])
+
+    amounts = {row.id: row.amount for row in found}
+    parents = {row.id: row.parent_id for row in found}
+    children = defaultdict(list)
+    # requested ids inside the subtree of another requested id are reached twice, the second walk is skipped
+    frontier = list(amounts)
+    while frontier:
+        next_frontier = []
+        for child in get_rows_by_column(db, Transaction.parent_id, frontier):
+            children[child.parent_id].append(child.id)
+            if child.id not in amounts:
+                amounts[child.id] = child.amount
+                next_frontier.append(child.id)
+        frontier = next_frontier
+
+    # iterative post order from the tops of the union, every node is added once to its parent
+    totals = {}
+    tops = [transaction_id for transaction_id in amounts if transaction_id in parents
+            and parents[transaction_id] not in amounts]
+    for top in tops:
+        stack = [(top, False)]
+        while stack:
+            transaction_id, expanded = stack.pop()
+            if expanded:
+                totals[transaction_id] = amounts[transaction_id] + sum(
+                    totals[child_id] for child_id in children.get(transaction_id, ()))
+            else:
+                stack.append((transaction_id, True))
+                stack.extend((child_id, False) for child_id in children.get(transaction_id, ()))
+
+    return ({transaction_id: totals[transaction_id] for transaction_id in requested if transaction_id in parents},
+            [transaction_id for transaction_id in requested if transaction_id not in parents])
+
+
+CREATE_STRATEGIES = {
+    "adjacency": create,
+    "closure": create_v2,
+    "path": create_with_path,
+}
+
+
+def create_transaction(db: Session, transaction: Create, transaction_id: int, mode: str):
+    """
+    Creates a transaction with the configured hierarchy mode.
+
+    :param db: SQL session object for database operations.
+    :param transaction: transaction (TransactionCreate): Pydantic model containing the transaction data.
+    :param transaction_id: transaction id
+    :param mode: one of CREATE_STRATEGIES
+    :returns: Transaction: The created Transaction object.
+    """
+    if mode not in CREATE_STRATEGIES:
+        raise ValueError(f"Unknown hierarchy mode '{mode}'")
+    return CREATE_STRATEGIES[mode](db, transaction, transaction_id)
+
+
+# dialects with INSERT ... ON CONFLICT DO NOTHING, other databases get a NOT EXISTS guard instead
+ON_CONFLICT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def build_insert_statement(dialect, transaction: Create, transaction_id: int, mode: str):
+    """
+    INSERT ... SELECT of the new row that only yields a row when the parent exists
+    and does nothing when the id is taken, RETURNING the row where the database supports it.
+    The root_id and depth, and the path of the path mode, are derived from the parent row in the same SELECT.
+    """
+    columns = ["id", "amount", "type", "parent_id", "subtree_sum", "root_id", "depth"]
+    root_id, depth = tree_position_expressions(transaction.parent_id, transaction_id)
+    values = [literal(transaction_id, BigInteger), literal(transaction.amount, Double),
+              literal(transaction.type, String), literal(transaction.parent_id, BigInteger),
+              literal(transaction.amount, Double),
+              literal(root_id, BigInteger) if isinstance(root_id, int) else root_id,
+              literal(depth, Integer) if isinstance(depth, int) else depth]
+    if mode == "path":
+        columns.append("path")
+        path = parent_path_expression(transaction.parent_id, transaction_id)
+        values.append(literal(path, String) if isinstance(path, str) else path)
+
+    if transaction.parent_id is not None:
+        row = select(*values).where(exists().where(Transaction.id == transaction.parent_id))
+    else:
+        # sqlite only parses INSERT ... SELECT ... ON CONFLICT when the SELECT has a WHERE clause
+        row = select(*values).where(true())
+
+    if dialect.name in ON_CONFLICT_INSERTS:
+        statement = ON_CONFLICT_INSERTS[dialect.name](Transaction).from_select(columns, row)
+        statement = statement.on_conflict_do_nothing(index_elements=["id"])
+    else:
+        row = row.where(~exists().where(Transaction.id == transaction_id))
+        statement = insert(Transaction).from_select(columns, row)
+    if dialect.insert_returning:
+        statement = statement.returning(*TRANSACTION_COLUMNS)
+    return statement
+
+
+def rejection_reason(transaction_exists: bool) -> str:
+    """
+    Nothing was inserted: either the id is taken (primary key conflict) or the parent is missing
+    (empty SELECT or foreign key violation).
+    """
+    return DUPLICATE_TRANSACTION if transaction_exists else PARENT_NOT_FOUND
+
+
+def insert_transaction(db: Session, transaction: Create, transaction_id: int, mode: str):
+    """
+    Single statement create, an alternative to the check-then-create of the routes.
+    The duplicate and parent checks are part of the INSERT, so a root transaction costs the INSERT and the commit
+    instead of two existence reads, the insert, the commit and the refresh, and concurrent creates of the same id
+    cannot both pass the check. Children add the ancestor subtree_sum update (and the closure rows in closure mode),
+    so a child costs O(d) for its 'd' ancestors, which stay row-locked until the commit: creates into one tree
+    serialize on its root. The failure reason is only read back when nothing was inserted.
+
+    :param db: SQL session object for database operations.
+    :param transaction: transaction (TransactionCreate): Pydantic model containing the transaction data.
+    :param transaction_id: transaction id
+    :param mode: one of CREATE_STRATEGIES
+    :returns: row with the id, amount, type and parent_id of the created transaction
+    :raises TransactionRejected: when the id is taken or the parent does not exist
+    """
+    if mode not in CREATE_STRATEGIES:
+        raise ValueError(f"Unknown hierarchy mode '{mode}'")
+
+    dialect = db.get_bind().dialect
+    try:
+        result = db.execute(build_insert_statement(dialect, transaction, transaction_id, mode))
+        if dialect.insert_returning:
+            row = result.first()
+        elif result.rowcount == 1:
+            row = db.execute(select(*TRANSACTION_COLUMNS).where(Transaction.id == transaction_id)).one()
+        else:
+            row = None
+    except IntegrityError:
+        # the parent was deleted, or the id inserted, by a concurrent DB transaction
+        row = None
+    if row is None:
+        db.rollback()
+        raise TransactionRejected(rejection_reason(get_transaction(db, transaction_id) is not None))
+
+    if mode == "closure":
+        db.execute(CLOSURE_INSERT_QUERY, {"transaction_id": transaction_id, "parent_id": transaction.parent_id})
+    add_to_ancestor_sums(db, transaction.parent_id, transaction.amount, use_closure=mode == "closure")
+    add_to_type_stats(db, [(transaction.type, transaction.amount)])
+    db.commit()
+    return row
+
+
+def get_existing_ids(db: Session, transaction_ids, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> set:
+    """
+    Set based existence check, `chunk_size` ids per query.
+
+    :param db: SQL session object for database operations.
+    :param transaction_ids: ids to look up
+    :param chunk_size: max number of ids bound into a single query
+    :return: the subset of ids that exist in the transactions table
+    """
+    transaction_ids = list(transaction_ids)
+    existing = set()
+    for start in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[start:start + chunk_size]
+        existing.update(db.execute(select(Transaction.id).where(Transaction.id.in_(chunk))).scalars())
+    return existing
+
+
+def get_ancestor_rows(db: Session, descendant_ids, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> dict:
+    """
+    :param db: SQL session object for database operations.
+    :param descendant_ids: ids whose closure rows are needed
+    :param chunk_size: max number of ids bound into a single query
+    :return: dict descendant id -> list of ancestor ids (self included) from the transaction_closure table
+    """
+    descendant_ids = list(descendant_ids)
+    ancestors = defaultdict(list)
+    for start in range(0, len(descendant_ids), chunk_size):
+        chunk = descendant_ids[start:start + chunk_size]
+        query = select(TransactionClosure.ancestor_id, TransactionClosure.descendant_id) \
+            .where(TransactionClosure.descendant_id.in_(chunk))
+        for ancestor_id, descendant_id in db.execute(query):
+            ancestors[descendant_id].append(ancestor_id)
+    return ancestors
+
+
+def get_paths(db: Session, transaction_ids, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> dict:
+    """
+    :return: dict id -> materialized path for the given transactions
+    """
+    transaction_ids = list(transaction_ids)
+    paths = {}
+    for start in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[start:start + chunk_size]
+        paths.update(db.execute(select(Transaction.id, Transaction.path).where(Transaction.id.in_(chunk))).all())
+    return paths
+
+
+def get_tree_positions(db: Session, transaction_ids, chunk_size: int = settings.QUERY_CHUNK_SIZE) -> dict:
+    """
+    :return: dict id -> (root_id, depth) for the given transactions
+    """
+    transaction_ids = list(transaction_ids)
+    positions = {}
+    for start in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[start:start + chunk_size]
+        query = select(Transaction.id, Transaction.root_id, Transaction.depth).where(Transaction.id.in_(chunk))
+        positions.update((row.id, (row.root_id, row.depth)) for row in db.execute(query))
+    return positions
+
+
+def order_batch(db: Session, items: list) -> (list, list):
+    """
+    Validates a batch of new transactions and orders it so every parent is inserted before its children.
+    Duplicates and missing parents are checked with set based queries instead of one lookup per item.
+
+    :param db: SQL session object for database operations.
+    :param items: list of BatchItem
+    :return: (items in topological order, list of (id, detail) for the rejected items)
+    """
+    return order_items(items, lambda transaction_ids: get_existing_ids(db, transaction_ids))
+
+
+def order_items(items: list, find_existing) -> (list, list):
+    """
+    Storage independent part of order_batch.
+
+    :param items: list of BatchItem
+    :param find_existing: callable returning the subset of the given ids that are already stored
+    :return: (items in topological order, list of (id, detail) for the rejected items)
+    """
+    failed = []
+    by_id = {}
+    for item in items:
+        if item.id in by_id:
+            failed.append((item.id, DUPLICATE_TRANSACTION))
+        else:
+            by_id[item.id] = item
+
+    for transaction_id in find_existing(by_id):
+        failed.append((transaction_id, DUPLICATE_TRANSACTION))
+        del by_id[transaction_id]
+
+    external_parents = {item.parent_id for item in by_id.values()
+                        if item.parent_id is not None and item.parent_id not in by_id}
+    found_parents = find_existing(external_parents)
+
+    # Kahn's algorithm, items hanging from a root or an existing transaction are ready first
+    children = defaultdict(list)
+    ready = deque()
+    for item in by_id.values():
+        if item.parent_id is None or item.parent_id in found_parents:
+            ready.append(item)
+        elif item.parent_id in by_id:
+            children[item.parent_id].append(item)
+        else:
+            failed.append((item.id, PARENT_NOT_FOUND))
+
+    ordered = []
+    while ready:
+        item = ready.popleft()
+        ordered.append(item)
+        ready.extend(children.pop(item.id, []))
+
+    # whatever is left is part of a parent cycle inside the batch
+    for pending in children.values():
+        failed.extend((item.id, PARENT_NOT_FOUND) for item in pending)
+    return ordered, failed
+
+
+def create_batch(db: Session, items: list, mode: str) -> (list, list):
+    """
+    Bulk Approach
+    Inserts a batch of transactions, which may reference each other, with multi-row INSERTs and a single commit.
+    The subtree_sum of external ancestors and, in closure mode, the transaction_closure rows are maintained in bulk.
+
+    :param db: SQL session object for database operations.
+    :param items: list of BatchItem
+    :param mode: one of CREATE_STRATEGIES
+    :return: (ids created in insertion order, list of (id, detail) for the rejected items)
+
+    Time Complexity:
+        O(n + p * d) - one ancestor update of depth 'd' per external parent 'p', whose ancestors stay row-locked
+        until the commit so batches into the same tree serialize on its root, plus O(n * depth) closure rows in
+        closure mode, with O(n / chunk_size) validation queries.
+    """
+    if mode not in CREATE_STRATEGIES:
+        raise ValueError(f"Unknown hierarchy mode '{mode}'")
+
+    ordered, failed = order_batch(db, items)
+    if not ordered:
+        return [], failed
+    use_closure = mode == "closure"
+
+    # subtree totals inside the batch, children are always after their parent in `ordered`
+    totals = {item.id: item.amount for item in ordered}
+    external_totals = defaultdict(float)
+    for item in reversed(ordered):
+        if item.parent_id in totals:
+            totals[item.parent_id] += totals[item.id]
+        elif item.parent_id is not None:
+            external_totals[item.parent_id] += totals[item.id]
+
+    positions = get_tree_positions(db, external_totals)
+    rows = []
+    for item in ordered:
+        positions[item.id] = root_id, depth = child_tree_position(item.id, item.parent_id, positions)
+        rows.append({"id": item.id, "amount": item.amount, "type": item.type, "parent_id": item.parent_id,
+                     "subtree_sum": totals[item.id], "root_id": root_id, "depth": depth})
+    if mode == "path":
+        paths = get_paths(db, external_totals)
+        for item, row in zip(ordered, rows):
+            parent_path = paths.get(item.parent_id)
+            paths[item.id] = row["path"] = build_path(item.id, parent_path) \
+                if item.parent_id is None or parent_path is not None else None
+    db.execute(insert(Transaction), rows)
+
+    if use_closure:
+        ancestors = get_ancestor_rows(db, external_totals)
+        closure_rows = []
+        for item in ordered:
+            ancestors[item.id] = [item.id] + (ancestors[item.parent_id] if item.parent_id is not None else [])
+            closure_rows.extend({"ancestor_id": ancestor_id, "descendant_id": item.id}
+                                for ancestor_id in ancestors[item.id])
+        db.execute(insert(TransactionClosure), closure_rows)
+
+    for parent_id, amount in external_totals.items():
+        add_to_ancestor_sums(db, parent_id, amount, use_closure=use_closure)
+    add_to_type_stats(db, [(item.type, item.amount) for item in ordered])
+
+    db.commit()
+    return [item.id for item in ordered], failed
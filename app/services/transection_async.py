@@ -0,0 +1,391 @@
+"""
+Async counterparts of app/services/transection.py, used when DB_MODE=async.
+The functions share their SQL with the sync module so both modes always run the same queries,
+see the sync versions for the complexity notes of every approach.
+"""
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import transection
+from ..config import settings
+from ..model.transection import Transaction
+from ..schemas.transection.request import Create
+
+
+async def create(db: AsyncSession, transaction: Create, transaction_id: int):
+    """
+    First Approach, see transection.create
+
+    :param transaction_id: transaction id
+    :param db : async SQL session object for database operations.
+    :param transaction: transaction (TransactionCreate): Pydantic model containing the transaction data.
+
+    :returns: Transaction: The created Transaction object.
+    """
+    root_id, depth = transection.tree_position_expressions(transaction.parent_id, transaction_id)
+    db_transaction = Transaction(
+        id=transaction_id,
+        amount=transaction.amount,
+        type=transaction.type,
+        parent_id=transaction.parent_id,
+        subtree_sum=transaction.amount,
+        root_id=root_id,
+        depth=depth
+    )
+    db.add(db_transaction)
+    await add_to_ancestor_sums(db, transaction.parent_id, transaction.amount)
+    await db.run_sync(transection.add_to_type_stats, [(transaction.type, transaction.amount)])
+    await db.commit()
+    await db.refresh(db_transaction)
+    return db_transaction
+
+
+async def create_v2(db: AsyncSession, transaction: Create, transaction_id: int):
+    """
+    Second Approach, see transection.create_v2
+
+    :param transaction_id: transaction id
+    :param db: async SQL session object for database operations
+    :param transaction: transaction (TransactionCreate): Pydantic model containing the transaction data.
+
+    :returns: Transaction: The created Transaction object.
+    """
+    root_id, depth = transection.tree_position_expressions(transaction.parent_id, transaction_id)
+    db_transaction = Transaction(id=transaction_id, amount=transaction.amount, type=transaction.type,
+                                 parent_id=transaction.parent_id, subtree_sum=transaction.amount,
+                                 root_id=root_id, depth=depth)
+    db.add(db_transaction)
+    await db.flush()
+    await db.execute(transection.CLOSURE_INSERT_QUERY,
+                     {"transaction_id": transaction_id, "parent_id": transaction.parent_id})
+    await add_to_ancestor_sums(db, transaction.parent_id, transaction.amount, use_closure=True)
+    await db.run_sync(transection.add_to_type_stats, [(transaction.type, transaction.amount)])
+    await db.commit()
+    await db.refresh(db_transaction)
+    return db_transaction
+
+
+async def create_with_path(db: AsyncSession, transaction: Create, transaction_id: int):
+    """
+    Third Approach, see transection.create_with_path
+    """
+    root_id, depth = transection.tree_position_expressions(transaction.parent_id, transaction_id)
+    db_transaction = Transaction(
+        id=transaction_id,
+        amount=transaction.amount,
+        type=transaction.type,
+        parent_id=transaction.parent_id,
+        subtree_sum=transaction.amount,
+        path=transection.parent_path_expression(transaction.parent_id, transaction_id),
+        root_id=root_id,
+        depth=depth
+    )
+    db.add(db_transaction)
+    await add_to_ancestor_sums(db, transaction.parent_id, transaction.amount)
+    await db.run_sync(transection.add_to_type_stats, [(transaction.type, transaction.amount)])
+    await db.commit()
+    await db.refresh(db_transaction)
+    return db_transaction
+
+
+async def add_to_ancestor_sums(db: AsyncSession, parent_id: int, amount: float, use_closure: bool = False):
+    """
+    see transection.add_to_ancestor_sums
+    """
+    if parent_id is None:
+        return
+    query = transection.CLOSURE_ANCESTOR_SUMS_QUERY if use_closure else transection.ANCESTOR_SUMS_QUERY
+    await db.execute(query, {"parent_id": parent_id, "amount": amount})
+
+
+async def get_transaction(db: AsyncSession, transaction_id: int):
+    """
+    :param db : async SQL session object for database operations.
+    :param transaction_id: transaction ID
+    :return:  Transaction object that match the transaction id
+    """
+    result = await db.execute(select(Transaction).where(Transaction.id == transaction_id))
+    return result.scalars().first()
+
+
+async def get_version(db: AsyncSession, transaction_id: int):
+    """
+    see transection.get_version
+    """
+    result = await db.execute(select(Transaction.version).where(Transaction.id == transaction_id))
+    return result.scalar_one_or_none()
+
+
+async def get_transaction_by_parent(db: AsyncSession, parent_id: int) -> [Transaction]:
+    """
+    :param db : async SQL session object for database operations.
+    :param parent_id: transaction ID
+    :return:  children of the transaction
+    """
+    result = await db.execute(select(Transaction).where(Transaction.parent_id == parent_id))
+    return result.scalars().all()
+
+
+async def get_transactions_by_type(db: AsyncSession, transaction_type: str, after: int = None, limit: int = None):
+    """
+    see transection.get_transactions_by_type
+
+    :param db: async SQL session object for database operations.
+    :param transaction_type: (str): The type of transactions to filter by.
+    :param after: only return transactions with an id greater than this cursor
+    :param limit: max number of transactions to return
+    :returns: List[Transaction]: A list of transactions that match the specified type.
+    """
+    query = select(Transaction).where(Transaction.type == transaction_type)
+    if after is not None or limit is not None:
+        if after is not None:
+            query = query.where(Transaction.id > after)
+        query = query.order_by(Transaction.id).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_transaction_row(db: AsyncSession, transaction_id: int):
+    """
+    see transection.get_transaction_row
+    """
+    result = await db.execute(select(*transection.TRANSACTION_COLUMNS).where(Transaction.id == transaction_id))
+    return result.first()
+
+
+async def get_transaction_rows_by_type(db: AsyncSession, transaction_type: str, after: int = None,
+                                       limit: int = None) -> list:
+    """
+    see transection.get_transaction_rows_by_type
+    """
+    query = select(*transection.TRANSACTION_COLUMNS).where(Transaction.type == transaction_type)
+    if after is not None or limit is not None:
+        if after is not None:
+            query = query.where(Transaction.id > after)
+        query = query.order_by(Transaction.id).limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def stream_transactions_by_type(db: AsyncSession, transaction_type: str, after: int = None,
+                                      batch_size: int = settings.STREAM_BATCH_SIZE):
+    """
+    see transection.stream_transactions_by_type
+    """
+    query = select(Transaction.id, Transaction.amount, Transaction.type, Transaction.parent_id) \
+        .where(Transaction.type == transaction_type)
+    if after is not None:
+        query = query.where(Transaction.id > after)
+    query = query.order_by(Transaction.id).execution_options(yield_per=batch_size)
+    async for row in await db.stream(query):
+        yield row
+
+
+async def is_root(db: AsyncSession, transaction_id: int) -> bool:
+    """
+    see transection.is_root
+    """
+    result = await db.execute(select(Transaction.root_id).where(Transaction.id == transaction_id))
+    return result.scalar() == transaction_id
+
+
+async def stream_subtree(db: AsyncSession, transaction_id: int, order: str = "bfs", max_depth: int = None,
+                         batch_size: int = settings.STREAM_BATCH_SIZE):
+    """
+    see transection.stream_subtree
+    """
+    if settings.TREE_COLUMNS_BACKFILLED and order == "bfs" and await is_root(db, transaction_id):
+        query = transection.ROOT_SUBTREE_QUERY
+    else:
+        query = transection.subtree_query(db.get_bind().dialect.name, order)
+    params = {"transaction_id": transaction_id,
+              "max_depth": transection.UNBOUNDED_DEPTH if max_depth is None else max_depth}
+    async for row in await db.stream(query.execution_options(yield_per=batch_size), params):
+        yield row
+
+
+async def calculate_sum(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Queue-based Approach, see transection.calculate_sum
+    """
+    transaction = await get_transaction(db, transaction_id)
+    if not transaction:
+        return 0.0
+
+    queue = deque([transaction])
+    total_sum = 0.0
+    while queue:
+        transaction = queue.popleft()
+        total_sum += transaction.amount
+        queue.extend(await get_transaction_by_parent(db, transaction.id))
+    return total_sum
+
+
+async def calculate_sum_batched(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Level-batched Approach, see transection.calculate_sum_batched
+    """
+    transaction = await get_transaction(db, transaction_id)
+    if not transaction:
+        return 0.0
+
+    total_sum = transaction.amount
+    frontier = [transaction.id]
+    while frontier:
+        children = []
+        for start in range(0, len(frontier), settings.QUERY_CHUNK_SIZE):
+            chunk = frontier[start:start + settings.QUERY_CHUNK_SIZE]
+            query = select(Transaction.id, Transaction.amount).where(Transaction.parent_id.in_(chunk))
+            children.extend((await db.execute(query)).all())
+        frontier = [child_id for child_id, _ in children]
+        total_sum += sum(amount for _, amount in children)
+    return total_sum
+
+
+async def calculate_sum_v2(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Recursive Approach using SQL, see transection.calculate_sum_v2
+    """
+    result = (await db.execute(transection.LINKED_SUM_QUERY, {"transaction_id": transaction_id})).scalar()
+    return result if result else 0.0
+
+
+async def calculate_sum_using_closure(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Closure table Approach, see transection.calculate_sum_using_closure
+    """
+    result = (await db.execute(transection.CLOSURE_SUM_QUERY, {"transaction_id": transaction_id})).scalar()
+    return result if result else 0.0
+
+
+async def calculate_sum_from_aggregate(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Persisted subtree_sum Approach, see transection.calculate_sum_from_aggregate
+    """
+    query = select(Transaction.subtree_sum).where(Transaction.id == transaction_id)
+    result = (await db.execute(query)).scalar()
+    return result if result else 0.0
+
+
+async def calculate_sum_using_path(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Materialized path Approach, see transection.calculate_sum_using_path
+    """
+    path = (await db.execute(select(Transaction.path).where(Transaction.id == transaction_id))).scalar()
+    if path is None:
+        return await calculate_sum_batched(db, transaction_id)
+    result = (await db.execute(transection.PATH_SUM_QUERY, {"prefix": f"{path}%"})).scalar()
+    return result if result else 0.0
+
+
+async def calculate_sum_in_tree(db: AsyncSession, transaction_id: int) -> float:
+    """
+    Root and Depth Approach, see transection.calculate_sum_in_tree
+    """
+    if not settings.TREE_COLUMNS_BACKFILLED:
+        return await calculate_sum_batched(db, transaction_id)
+    query = select(Transaction.root_id, Transaction.depth, Transaction.amount).where(Transaction.id == transaction_id)
+    transaction = (await db.execute(query)).first()
+    if transaction is None:
+        return 0.0
+    if transaction.root_id is None:
+        return await calculate_sum_batched(db, transaction_id)
+    if transaction.depth == 0:
+        result = (await db.execute(transection.TREE_SUM_QUERY, {"root_id": transaction.root_id})).scalar()
+        return result if result else 0.0
+
+    total_sum = transaction.amount
+    frontier, depth = [transaction_id], transaction.depth
+    while frontier:
+        depth += 1
+        children = []
+        for start in range(0, len(frontier), settings.QUERY_CHUNK_SIZE):
+            chunk = frontier[start:start + settings.QUERY_CHUNK_SIZE]
+            query = select(Transaction.id, Transaction.amount).where(
+                Transaction.root_id == transaction.root_id, Transaction.depth == depth,
+                Transaction.parent_id.in_(chunk))
+            children.extend((await db.execute(query)).all())
+        frontier = [child_id for child_id, _ in children]
+        total_sum += sum(amount for _, amount in children)
+    return total_sum
+
+
+async def create_batch(db: AsyncSession, items: list, mode: str) -> (list, list):
+    """
+    Bulk Approach, see transection.create_batch.
+    The batch runs as a single unit of work so the sync implementation is reused through run_sync.
+    """
+    return await db.run_sync(lambda session: transection.create_batch(session, items, mode))
+
+
+SUM_STRATEGIES = {
+    "batched": calculate_sum_batched,
+    "queue": calculate_sum,
+    "recursive": calculate_sum_v2,
+    "closure": calculate_sum_using_closure,
+    "aggregate": calculate_sum_from_aggregate,
+    "path": calculate_sum_using_path,
+    "tree": calculate_sum_in_tree,
+}
+
+CREATE_STRATEGIES = {
+    "adjacency": create,
+    "closure": create_v2,
+    "path": create_with_path,
+}
+
+
+async def calculate_transaction_sum(db: AsyncSession, transaction_id: int, strategy: str) -> float:
+    """
+    Computes the sum of a transaction tree with the configured strategy.
+    """
+    if strategy not in SUM_STRATEGIES:
+        raise ValueError(f"Unknown sum strategy '{strategy}'")
+    return await SUM_STRATEGIES[strategy](db, transaction_id)
+
+
+async def create_transaction(db: AsyncSession, transaction: Create, transaction_id: int, mode: str):
+    """
+    Creates a transaction with the configured hierarchy mode.
+    """
+    if mode not in CREATE_STRATEGIES:
+        raise ValueError(f"Unknown hierarchy mode '{mode}'")
+    return await CREATE_STRATEGIES[mode](db, transaction, transaction_id)
+
+
+async def insert_transaction(db: AsyncSession, transaction: Create, transaction_id: int, mode: str):
+    """
+    Single statement create, see transection.insert_transaction
+
+    :raises TransactionRejected: when the id is taken or the parent does not exist
+    """
+    if mode not in CREATE_STRATEGIES:
+        raise ValueError(f"Unknown hierarchy mode '{mode}'")
+
+    dialect = db.get_bind().dialect
+    try:
+        result = await db.execute(transection.build_insert_statement(dialect, transaction, transaction_id, mode))
+        if dialect.insert_returning:
+            row = result.first()
+        elif result.rowcount == 1:
+            row = (await db.execute(
+                select(*transection.TRANSACTION_COLUMNS).where(Transaction.id == transaction_id))).one()
+        else:
+            row = None
+    except IntegrityError:
+        row = None
+    if row is None:
+        await db.rollback()
+        raise transection.TransactionRejected(
+            transection.rejection_reason(await get_transaction(db, transaction_id) is not None))
+
+    if mode == "closure":
+        await db.execute(transection.CLOSURE_INSERT_QUERY,
+                         {"transaction_id": transaction_id, "parent_id": transaction.parent_id})
+    await add_to_ancestor_sums(db, transaction.parent_id, transaction.amount, use_closure=mode == "closure")
+    await db.run_sync(transection.add_to_type_stats, [(transaction.type, transaction.amount)])
+    await db.commit()
+    return row
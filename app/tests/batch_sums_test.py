@@ -0,0 +1,66 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.database.db import get_db
+from app.schemas.transection.request import BatchItem
+from app.services import transection
+from benchmarks import generators
+
+# 1 -> 2 -> 3 -> 4, 2 -> 5, and an unrelated root 6
+ROWS = [(1, None, 1.0), (2, 1, 2.0), (3, 2, 3.0), (4, 3, 4.0), (5, 2, 5.0), (6, None, 6.0)]
+
+
+@pytest.fixture(scope="function")
+def tree_db(sqlite_db):
+    items = [BatchItem(id=transaction_id, amount=amount, type="expense", parent_id=parent_id)
+             for transaction_id, parent_id, amount in ROWS]
+    transection.create_batch(sqlite_db, items, "adjacency")
+    return sqlite_db
+
+
+@pytest.mark.parametrize("strategy", ["batched", "aggregate"])
+def test_calculate_sums_of_nested_ids(tree_db, strategy):
+    totals, missing = transection.calculate_sums(tree_db, [3, 1, 6, 3, 42, 5], strategy)
+
+    assert totals == {3: 7.0, 1: 15.0, 6: 6.0, 5: 5.0}
+    assert list(totals) == [3, 1, 6, 5]
+    assert missing == [42]
+
+
+def test_calculate_sums_walks_the_union_of_the_subtrees_once(tree_db, monkeypatch):
+    fetched = []
+    get_rows_by_column = transection.get_rows_by_column
+
+    def counting_get_rows_by_column(db, column, values, **kwargs):
+        rows = get_rows_by_column(db, column, values, **kwargs)
+        fetched.extend(row.id for row in rows)
+        return rows
+
+    monkeypatch.setattr(transection, "get_rows_by_column", counting_get_rows_by_column)
+    transection.calculate_sums(tree_db, [1, 2, 3, 4])
+
+    # the 4 requested rows, then every descendant of 1 once although 2, 3 and 4 were requested too
+    assert sorted(fetched) == [1, 2, 2, 3, 3, 4, 4, 5]
+
+
+@pytest.mark.parametrize("shape", generators.SHAPES)
+def test_calculate_sums_matches_the_reference(sqlite_db, shape):
+    rows = generators.generate(shape, 60, seed=7)
+    transection.create_batch(sqlite_db, [BatchItem(id=transaction_id, amount=amount, type="t", parent_id=parent_id)
+                                         for transaction_id, parent_id, amount in rows], "adjacency")
+    expected = generators.subtree_sums(rows)
+
+    totals, _ = transection.calculate_sums(sqlite_db, list(expected))
+    assert totals == pytest.approx(expected)
+
+
+def test_sums_endpoint(tree_db):
+    app.dependency_overrides[get_db] = lambda: tree_db
+    try:
+        client = TestClient(app)
+        response = client.post("/transactionservice/sums", json={"ids": [2, 9]})
+        assert response.json() == {"sums": [{"id": 2, "sum": 14.0}], "missing": [9]}
+        assert client.post("/transactionservice/sums", json={"ids": []}).status_code == 422
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.database.db import get_db
+from app.model.transection import TransactionClosure
+from app.schemas.transection.request import BatchItem, Create
+from app.services import transection
+
+
+def item(transaction_id, amount, parent_id=None):
+    return BatchItem(id=transaction_id, amount=amount, type="expense", parent_id=parent_id)
+
+
+@pytest.mark.parametrize("mode", ["adjacency", "closure"])
+def test_create_batch_orders_parents_before_children(sqlite_db, mode):
+    transection.create_transaction(sqlite_db, Create(amount=1.0, type="expense"), 1, mode)
+
+    # children listed before their parents, 4 hangs from the existing transaction 1
+    created, failed = transection.create_batch(sqlite_db, [
+        item(6, 6.0, parent_id=5),
+        item(5, 5.0, parent_id=4),
+        item(4, 4.0, parent_id=1),
+    ], mode)
+
+    assert created == [4, 5, 6]
+    assert failed == []
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 1) == 16.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 5) == 11.0
+    assert transection.calculate_sum_batched(sqlite_db, 1) == 16.0
+    if mode == "closure":
+        assert sqlite_db.query(TransactionClosure).count() == 1 + 2 + 3 + 4
+        assert transection.calculate_sum_using_closure(sqlite_db, 4) == 15.0
+
+
+def test_create_batch_reports_failures_without_aborting(sqlite_db):
+    transection.create(sqlite_db, Create(amount=1.0, type="expense"), 1)
+
+    created, failed = transection.create_batch(sqlite_db, [
+        item(1, 1.0),
+        item(2, 2.0),
+        item(2, 2.0),
+        item(3, 3.0, parent_id=99),
+        item(7, 7.0, parent_id=8),
+        item(8, 8.0, parent_id=7),
+    ], "adjacency")
+
+    assert created == [2]
+    assert sorted(failed) == [
+        (1, transection.DUPLICATE_TRANSACTION),
+        (2, transection.DUPLICATE_TRANSACTION),
+        (3, transection.PARENT_NOT_FOUND),
+        (7, transection.PARENT_NOT_FOUND),
+        (8, transection.PARENT_NOT_FOUND),
+    ]
+
+
+def test_create_transactions_endpoint(sqlite_db):
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    client = TestClient(app)
+
+    response = client.post("/transactionservice/transactions", json={"transactions": [
+        {"id": 2, "amount": 20.0, "type": "expense", "parent_id": 1},
+        {"id": 1, "amount": 10.0, "type": "expense"},
+        {"id": 3, "amount": 30.0, "type": "expense", "parent_id": 42},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "created": [1, 2],
+        "failed": [{"id": 3, "detail": "Parent transaction not found"}]
+    }
+    app.dependency_overrides = {}
@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+import pytest
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from benchmarks import generators, load_benchmark, tree_benchmark
+
+
+@pytest.mark.parametrize("shape", generators.SHAPES)
+def test_generators_list_parents_first(shape):
+    rows = generators.generate(shape, 50)
+    seen = set()
+    for transaction_id, parent_id, _ in rows:
+        assert parent_id is None or parent_id in seen
+        seen.add(transaction_id)
+    assert len(seen) == 50
+
+
+def test_reference_subtree_sums():
+    assert generators.subtree_sums([(1, None, 1.0), (2, 1, 2.0), (3, 2, 3.0), (4, 1, 4.0)]) == \
+        {1: 10.0, 2: 5.0, 3: 3.0, 4: 4.0}
+
+
+def test_benchmark_report(tmp_path):
+    output = tmp_path / "report.json"
+    tree_benchmark.main(["--sizes", "30", "--shapes", "forest", "--sample-size", "3", "--repeat", "1",
+                         "--output", str(output)])
+
+    report = tree_benchmark.json.loads(output.read_text())
+    assert [result["mode"] for result in report["results"]] == list(tree_benchmark.MODES)
+    closure_case = report["results"][1]
+    assert closure_case["closure_table"]["rows"] > 30
+    assert set(closure_case["sum_latency"]) == set(tree_benchmark.strategies_for("closure"))
+    assert "path" not in closure_case["sum_latency"]
+    # the tree strategy was timed on its index, the setting of the process is left as it was
+    assert "tree" in closure_case["sum_latency"]
+    assert settings.TREE_COLUMNS_BACKFILLED is False
+
+
+def test_load_benchmark_pool_metrics():
+    metrics = "\n".join([
+        'db_pool_connections{engine="primary",state="checkedout"} 3',
+        'db_pool_connections{engine="primary",state="size"} 5',
+        'db_pool_checkout_wait_seconds_per_request_sum{route="/a"} 0.5',
+        'db_pool_checkout_wait_seconds_per_request_sum{route="/b"} 0.25',
+        'db_pool_checkout_wait_seconds_per_request_count{route="/a"} 2',
+        'db_pool_checkout_wait_seconds_per_request_count{route="/b"} 1',
+    ])
+    assert load_benchmark.parse_pool_metrics(metrics) == {
+        "pools": {("primary", "checkedout"): 3.0, ("primary", "size"): 5.0},
+        "wait_seconds": 0.75,
+        "wait_requests": 3.0,
+    }
+
+
+def test_load_benchmark_workload(sqlite_db):
+    rows, deep_ids = load_benchmark.seed_rows(50, 20, seed=1)
+    assert deep_ids == [51, 52]
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await load_benchmark.seed_service(client, rows, batch_size=30)
+            state = load_benchmark.LoadState([row[0] for row in rows], deep_ids)
+            return await load_benchmark.run_workload(client, "read_heavy", state, concurrency=1, duration=0.3,
+                                                     seed=1, sample_interval=0.1)
+
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    try:
+        result = asyncio.run(drive())
+    finally:
+        app.dependency_overrides = {}
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert result["p50_ms"] <= result["p99_ms"]
+
+    table = load_benchmark.format_table([dict(result, mode="sync", workload="read_heavy", pool_capacity=15)])
+    assert table.splitlines()[1].startswith("read_heavy  sync")
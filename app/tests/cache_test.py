@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from app.schemas.transection.request import Create
+from app.services import cache, transection
+from app.services.cache import TTLCache
+
+
+@pytest.fixture(scope="function")
+def client(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    for entries in cache.CACHES:
+        entries.clear()
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides = {}
+    for entries in cache.CACHES:
+        entries.clear()
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    entries = TTLCache("test", max_size=2, ttl_seconds=60)
+    entries.set(1, "a")
+    entries.set(2, "b")
+    assert entries.get(1) == "a"
+    entries.set(3, "c")
+
+    assert entries.get(2) is None
+    assert entries.get(3) == "c"
+    assert entries.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_ttl_cache_expires_entries():
+    entries = TTLCache("test", max_size=2, ttl_seconds=0)
+    entries.set(1, "a")
+    assert entries.get(1) is None
+
+
+def test_sum_cache_is_invalidated_along_the_ancestor_chain(client):
+    client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    client.put("/transactionservice/transaction/2", json={"amount": 20.0, "type": "expense", "parent_id": 1})
+    client.put("/transactionservice/transaction/3", json={"amount": 30.0, "type": "other"})
+    assert client.get("/transactionservice/sum/1").json() == {"sum": 30.0}
+    assert client.get("/transactionservice/sum/3").json() == {"sum": 30.0}
+    assert len(client.get("/transactionservice/types/expense").json()) == 2
+
+    # a grandchild of 1 must be visible in the sum of 1 and 2, the unrelated tree stays cached
+    client.put("/transactionservice/transaction/4", json={"amount": 40.0, "type": "expense", "parent_id": 2})
+
+    assert (1, settings.SUM_STRATEGY) not in cache.sum_cache._entries
+    assert (3, settings.SUM_STRATEGY) in cache.sum_cache._entries
+    assert client.get("/transactionservice/sum/1").json() == {"sum": 70.0}
+    assert len(client.get("/transactionservice/types/expense").json()) == 3
+
+
+def test_cache_stats_endpoint(client):
+    client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    before = client.get("/transactionservice/cache/stats").json()["transaction"]
+    client.get("/transactionservice/transaction/1")
+    client.get("/transactionservice/transaction/1")
+
+    stats = client.get("/transactionservice/cache/stats").json()
+    assert stats["enabled"] is True
+    assert stats["transaction"]["size"] == 1
+    assert stats["transaction"]["hits"] - before["hits"] == 1
+    assert stats["transaction"]["misses"] - before["misses"] == 1
+
+
+def test_cached_sum_is_not_served_for_a_newer_version(client, sqlite_db):
+    client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    assert client.get("/transactionservice/sum/1").json() == {"sum": 10.0}
+
+    # a create on another worker: committed without the invalidation of this process
+    transection.create(sqlite_db, Create(amount=5.0, type="expense", parent_id=1), 2)
+    response = client.get("/transactionservice/sum/1")
+    assert response.json() == {"sum": 15.0}
+    assert response.headers["ETag"] == 'W/"1.1"'
@@ -0,0 +1,59 @@
+from sqlalchemy import event
+
+from app.commands import backfill_closure
+from app.model.transection import TransactionClosure
+from app.schemas.transection.request import Create
+from app.services import transection
+
+
+def closure_rows(db):
+    return sorted(db.query(TransactionClosure.ancestor_id, TransactionClosure.descendant_id).all())
+
+
+def test_create_v2_writes_closure_rows_with_one_commit(sqlite_db, monkeypatch):
+    commits = []
+    original_commit = sqlite_db.commit
+    monkeypatch.setattr(sqlite_db, "commit", lambda: commits.append(1) or original_commit())
+
+    transection.create_v2(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create_v2(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    transection.create_v2(sqlite_db, Create(amount=30.0, type="expense", parent_id=2), 3)
+
+    assert len(commits) == 3
+    assert closure_rows(sqlite_db) == [(1, 1), (1, 2), (1, 3), (2, 2), (2, 3), (3, 3)]
+    assert transection.calculate_sum_using_closure(sqlite_db, 2) == 50.0
+
+
+def test_backfill_closure_matches_create_v2(sqlite_engine, sqlite_db):
+    # 4 -> 2 -> 3 and 1 -> 5, children get smaller ids than their parent
+    transection.create(sqlite_db, Create(amount=4.0, type="expense"), 4)
+    transection.create(sqlite_db, Create(amount=2.0, type="expense", parent_id=4), 2)
+    transection.create(sqlite_db, Create(amount=3.0, type="expense", parent_id=2), 3)
+    transection.create(sqlite_db, Create(amount=1.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=5.0, type="expense", parent_id=1), 5)
+
+    assert backfill_closure.backfill_closure(sqlite_engine, chunk_size=2) == 5 + 4
+    assert closure_rows(sqlite_db) == [(1, 1), (1, 5), (2, 2), (2, 3), (3, 3), (4, 2), (4, 3), (4, 4), (5, 5)]
+    # already complete, running it again is a no-op
+    assert backfill_closure.backfill_closure(sqlite_engine, chunk_size=2) == 0
+    assert transection.calculate_sum_using_closure(sqlite_db, 4) == 9.0
+
+
+def test_backfill_closure_writes_a_chain_once_per_level(sqlite_engine, sqlite_db):
+    for transaction_id in range(1, 51):
+        parent_id = transaction_id - 1 if transaction_id > 1 else None
+        transection.create(sqlite_db, Create(amount=1.0, type="expense", parent_id=parent_id), transaction_id)
+    inserts = []
+
+    def count_closure_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("INSERT INTO transaction_closure"):
+            inserts.append(statement)
+
+    event.listen(sqlite_engine, "before_cursor_execute", count_closure_inserts)
+    try:
+        assert backfill_closure.backfill_closure(sqlite_engine, chunk_size=100) == 50 * 51 // 2
+    finally:
+        event.remove(sqlite_engine, "before_cursor_execute", count_closure_inserts)
+    # one statement per level, not one pass over every row per level
+    assert len(inserts) == 50
+    assert transection.calculate_sum_using_closure(sqlite_db, 1) == 50.0
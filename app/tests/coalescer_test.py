@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from app.model.transection import Transaction
+from app.schemas.transection.request import BatchItem
+from app.services import coalescer, transection
+
+
+@pytest.fixture(scope="function")
+def session_factory(sqlite_engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
+
+
+def make_coalescer(session_factory, **options):
+    options = {"mode": "adjacency", "window_seconds": 0.05, "max_size": 100, **options}
+    return coalescer.WriteCoalescer(session_factory, **options)
+
+
+def item(transaction_id, amount, parent_id=None):
+    return BatchItem(id=transaction_id, amount=amount, type="expense", parent_id=parent_id)
+
+
+def test_concurrent_creates_are_committed_in_one_group(session_factory):
+    writer = make_coalescer(session_factory)
+    batches_before = coalescer.BATCH_SIZES.count()
+    try:
+        futures = [writer.enqueue(item(1, 10.0)), writer.enqueue(item(2, 20.0, parent_id=1)),
+                   writer.enqueue(item(3, 30.0, parent_id=2))]
+        rows = [future.result(timeout=5) for future in futures]
+    finally:
+        writer.close()
+
+    assert [(row.id, row.parent_id) for row in rows] == [(1, None), (2, 1), (3, 2)]
+    assert coalescer.BATCH_SIZES.count() == batches_before + 1
+    db = session_factory()
+    assert transection.calculate_sum_from_aggregate(db, 1) == 60.0
+    db.close()
+
+
+def test_rejected_items_do_not_fail_the_group(session_factory):
+    writer = make_coalescer(session_factory)
+    try:
+        writer.create(item(1, 10.0))
+        futures = {
+            "duplicate": writer.enqueue(item(1, 99.0)),
+            "orphan": writer.enqueue(item(2, 20.0, parent_id=42)),
+            "valid": writer.enqueue(item(3, 30.0, parent_id=1)),
+            "repeated": writer.enqueue(item(3, 40.0)),
+        }
+        assert futures["valid"].result(timeout=5).id == 3
+        for name, detail in (("duplicate", transection.DUPLICATE_TRANSACTION),
+                             ("orphan", transection.PARENT_NOT_FOUND),
+                             ("repeated", transection.DUPLICATE_TRANSACTION)):
+            with pytest.raises(transection.TransactionRejected, match=detail):
+                futures[name].result(timeout=5)
+    finally:
+        writer.close()
+
+    db = session_factory()
+    assert db.get(Transaction, 3).amount == 30.0
+    assert transection.calculate_sum_from_aggregate(db, 1) == 40.0
+    db.close()
+
+
+def test_group_is_retried_item_by_item_on_integrity_errors(session_factory, monkeypatch):
+    create_batch = transection.create_batch
+    group_sizes = []
+
+    def conflicting_create_batch(db, items, mode):
+        group_sizes.append(len(items))
+        if len(items) > 1:
+            # what a row committed by another writer between the validation and the insert looks like
+            raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+        return create_batch(db, items, mode)
+
+    monkeypatch.setattr(coalescer, "create_batch", conflicting_create_batch)
+    writer = make_coalescer(session_factory)
+    try:
+        futures = [writer.enqueue(item(1, 10.0)), writer.enqueue(item(2, 20.0))]
+        assert [future.result(timeout=5).id for future in futures] == [1, 2]
+    finally:
+        writer.close()
+    assert group_sizes == [2, 1, 1]
+
+
+def test_groups_are_bounded_by_max_size(session_factory):
+    writer = make_coalescer(session_factory, max_size=2, window_seconds=0.2)
+    batches_before = coalescer.BATCH_SIZES.count()
+    try:
+        futures = [writer.enqueue(item(transaction_id, 1.0)) for transaction_id in range(1, 6)]
+        assert [future.result(timeout=5).id for future in futures] == [1, 2, 3, 4, 5]
+    finally:
+        writer.close()
+    assert coalescer.BATCH_SIZES.count() == batches_before + 3
+
+
+def test_put_transaction_through_the_coalescer(session_factory, sqlite_db, monkeypatch):
+    writer = make_coalescer(session_factory)
+    monkeypatch.setattr(settings, "WRITE_COALESCING", True)
+    monkeypatch.setattr(coalescer, "_coalescer", writer)
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    client = TestClient(app)
+    try:
+        responses = [None] * 4
+
+        def put(index):
+            responses[index] = client.put(f"/transactionservice/transaction/{index + 1}",
+                                          json={"amount": 10.0, "type": "expense"})
+
+        threads = [threading.Thread(target=put, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [response.json()["id"] for response in responses] == [1, 2, 3, 4]
+
+        response = client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+        assert (response.status_code, response.json()["detail"]) == (400, transection.DUPLICATE_TRANSACTION)
+    finally:
+        app.dependency_overrides = {}
+        writer.close()
+
+
+def test_repeated_ids_of_a_group_get_their_own_outcome(session_factory):
+    writer = make_coalescer(session_factory)
+    try:
+        orphan = writer.enqueue(item(2, 20.0, parent_id=42))
+        root = writer.enqueue(item(2, 25.0))
+        repeated = writer.enqueue(item(2, 30.0))
+        with pytest.raises(transection.TransactionRejected, match=transection.PARENT_NOT_FOUND):
+            orphan.result(timeout=5)
+        assert root.result(timeout=5).amount == 25.0
+        with pytest.raises(transection.TransactionRejected, match=transection.DUPLICATE_TRANSACTION):
+            repeated.result(timeout=5)
+    finally:
+        writer.close()
+
+    db = session_factory()
+    assert db.get(Transaction, 2).amount == 25.0
+    db.close()
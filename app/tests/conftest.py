@@ -0,0 +1,28 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# The app builds its engine from DATABASE_URL, fall back to sqlite when running the tests outside docker
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database.db import Base  # noqa: E402
+from app.model import transection  # noqa: E402,F401  (registers the tables on Base)
+
+
+# Fixture to create a real, in memory, sqlite database for service level tests
+@pytest.fixture(scope="function")
+def sqlite_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def sqlite_db(sqlite_engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)()
+    yield db
+    db.close()
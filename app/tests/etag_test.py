@@ -0,0 +1,110 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.commands import subtree_sums
+from app.database.db import get_db
+from app.repository.memory import InMemoryTransactionRepository
+from app.route import compression
+from app.route.compression import CompressionMiddleware
+from app.schemas.transection.request import BatchItem, Create
+from app.services import transection
+
+
+@pytest.fixture
+def client(sqlite_db):
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_creates_bump_the_version_of_the_ancestor_chain(sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=5.0, type="expense", parent_id=1), 2)
+    transection.create(sqlite_db, Create(amount=1.0, type="expense"), 9)
+    transection.create_batch(sqlite_db, [BatchItem(id=3, amount=2.0, type="expense", parent_id=2),
+                                         BatchItem(id=4, amount=3.0, type="expense", parent_id=3)], "adjacency")
+
+    # a batch bumps its external ancestors once
+    assert [transection.get_version(sqlite_db, i) for i in (1, 2, 3, 4, 9)] == [2, 1, 0, 0, 0]
+    assert transection.get_version(sqlite_db, 404) is None
+
+
+def test_sum_not_modified_until_the_tree_changes(client, sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=1.0, type="expense"), 9)
+
+    response = client.get("/transactionservice/sum/1")
+    tag = response.headers["ETag"]
+    assert response.json() == {"sum": 10.0}
+
+    cached = client.get("/transactionservice/sum/1", headers={"If-None-Match": tag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == tag
+    assert cached.content == b""
+
+    # a create in another tree does not invalidate the sum
+    transection.create(sqlite_db, Create(amount=2.0, type="expense", parent_id=9), 10)
+    assert client.get("/transactionservice/sum/1", headers={"If-None-Match": tag}).status_code == 304
+
+    transection.create(sqlite_db, Create(amount=5.0, type="expense", parent_id=1), 2)
+    changed = client.get("/transactionservice/sum/1", headers={"If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.json() == {"sum": 15.0}
+    assert changed.headers["ETag"] != tag
+    assert client.get("/transactionservice/sum/404", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_transaction_not_modified(client, sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+
+    response = client.get("/transactionservice/transaction/1")
+    tag = response.headers["ETag"]
+    assert client.get("/transactionservice/transaction/1",
+                      headers={"If-None-Match": f'"other", {tag.removeprefix("W/")}'}).status_code == 304
+    assert client.get("/transactionservice/transaction/1", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_rebuild_bumps_the_version(sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    drift = [(1, 10.0, 12.0)]
+    subtree_sums.rebuild(sqlite_db, drift)
+    assert transection.get_version(sqlite_db, 1) == 1
+
+
+def test_memory_repository_versions():
+    repository = InMemoryTransactionRepository()
+    repository.create(Create(amount=10.0, type="expense"), 1)
+    repository.create_batch([BatchItem(id=2, amount=4.0, type="expense", parent_id=1),
+                             BatchItem(id=3, amount=4.0, type="expense", parent_id=2)])
+    assert [repository.version(i) for i in (1, 2, 3, 404)] == [2, 1, 0, None]
+
+
+def test_accepted_encodings():
+    assert compression.accepted_encodings("gzip;q=0, br;q=0.5, deflate") == {"br", "deflate"}
+    assert compression.choose_compressor("identity", 6) is None
+
+
+def test_large_types_page_is_compressed(sqlite_db, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    transection.create_batch(sqlite_db, [BatchItem(id=i, amount=float(i), type="expense") for i in range(1, 201)],
+                             "adjacency")
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    try:
+        client = TestClient(CompressionMiddleware(app, minimum_size=1024))
+        response = client.get("/transactionservice/types/expense", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert int(response.headers["Content-Length"]) < len(response.content)
+        assert len(response.json()) == 200
+
+        tree = client.get("/transactionservice/tree/1", headers={"Accept-Encoding": "gzip"})
+        assert tree.headers["Content-Encoding"] == "gzip"
+        assert tree.text == '{"id": 1, "amount": 1.0, "type": "expense", "parent_id": null, "depth": 0}\n'
+
+        small = client.get("/transactionservice/sum/1", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in small.headers
+        assert client.get("/transactionservice/types/expense",
+                          headers={"Accept-Encoding": "identity"}).headers.get("Content-Encoding") is None
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.repository import InMemoryTransactionRepository, get_repository
+from app.schemas.transection.request import BatchItem, Create
+from app.services.transection import DUPLICATE_TRANSACTION, TransactionRejected
+
+
+def build_tree(repository):
+    repository.create(Create(amount=10.0, type="expense"), 1)
+    repository.create(Create(amount=20.0, type="income", parent_id=1), 2)
+    repository.create_batch([
+        BatchItem(id=4, amount=40.0, type="expense", parent_id=3),
+        BatchItem(id=3, amount=30.0, type="expense", parent_id=2),
+    ])
+
+
+def test_memory_repository_maintains_subtree_sums_and_type_index():
+    repository = InMemoryTransactionRepository()
+    build_tree(repository)
+
+    assert repository.subtree_sum(1) == 100.0
+    assert repository.subtree_sum(3) == 70.0
+    assert repository.subtree_sum(99) == 0.0
+    assert repository.children(1) == [2]
+    assert [row.id for row in repository.list_by_type("expense")] == [1, 3, 4]
+    assert [row.id for row in repository.list_by_type("expense", after=1, limit=1)] == [3]
+    assert repository.get(4)._asdict() == {"id": 4, "amount": 40.0, "type": "expense", "parent_id": 3}
+
+
+def test_memory_repository_recovers_from_snapshot_and_log(tmp_path):
+    log_path = str(tmp_path / "transactions.log")
+    repository = InMemoryTransactionRepository(log_path=log_path, snapshot_every=3)
+    build_tree(repository)
+    repository.create(Create(amount=5.0, type="expense", parent_id=4), 5)
+    repository.close()
+
+    restored = InMemoryTransactionRepository(log_path=log_path, snapshot_every=3)
+    assert len(restored) == 5
+    assert restored.subtree_sum(1) == 105.0
+    assert [row.id for row in restored.list_by_type("expense")] == [1, 3, 4, 5]
+    restored.close()
+
+
+@pytest.fixture(scope="function")
+def client():
+    repository = InMemoryTransactionRepository()
+    app.dependency_overrides[get_repository] = lambda: repository
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_routes_on_memory_backend(client):
+    assert client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"}).status_code == 200
+    assert client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"}).status_code == 400
+    assert client.put("/transactionservice/transaction/2",
+                      json={"amount": 10.0, "type": "expense", "parent_id": 7}).status_code == 400
+    client.post("/transactionservice/transactions", json={"transactions": [
+        {"id": 2, "amount": 20.0, "type": "expense", "parent_id": 1},
+    ]})
+
+    assert client.get("/transactionservice/transaction/2").json() == \
+        {"id": 2, "amount": 20.0, "type": "expense", "parent_id": 1}
+    assert client.get("/transactionservice/sum/1").json() == {"sum": 30.0}
+    assert client.get("/transactionservice/types/expense/stream").text.count("\n") == 2
+
+
+def test_concurrent_creates_of_the_same_id():
+    repository = InMemoryTransactionRepository()
+    repository.create(Create(amount=10.0, type="expense"), 1)
+    start = threading.Barrier(8)
+
+    def create():
+        start.wait()
+        try:
+            repository.create_new(Create(amount=5.0, type="expense", parent_id=1), 2)
+            return "created"
+        except TransactionRejected as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: create(), range(8)))
+
+    assert results.count("created") == 1
+    assert results.count(DUPLICATE_TRANSACTION) == 7
+    assert repository.subtree_sum(1) == 15.0
+    assert repository.list_by_type("expense") == [repository.get(1), repository.get(2)]
+    assert repository.type_stats("expense")["count"] == 2
+    with pytest.raises(TransactionRejected):
+        repository.create_new(Create(amount=1.0, type="expense", parent_id=404), 3)
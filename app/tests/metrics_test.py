@@ -0,0 +1,116 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from app.metrics import instrumentation
+from app.metrics.prometheus import Counter, Histogram, Registry
+
+SUM_ROUTE = "/transactionservice/sum/{transaction_id}"
+
+
+@pytest.fixture(scope="function")
+def client(sqlite_engine, sqlite_db, monkeypatch):
+    # the test engine replaces the app engine, it is only registered for the duration of the test
+    monkeypatch.setattr(instrumentation, "_instrumented_engines", {})
+    instrumentation.instrument_engine(sqlite_engine, "test")
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("requests_total", "Requests", ("route",))
+    counter.inc(route='say "hi"\n')
+    assert counter.render()[-1] == 'requests_total{route="say \\"hi\\"\\n"} 1'
+
+
+def test_queries_are_recorded_per_route_template(client, monkeypatch):
+    monkeypatch.setattr(settings, "SUM_STRATEGY", "queue")
+    client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    client.put("/transactionservice/transaction/2", json={"amount": 20.0, "type": "expense", "parent_id": 1})
+    client.put("/transactionservice/transaction/3", json={"amount": 30.0, "type": "expense", "parent_id": 1})
+
+    requests_before = instrumentation.REQUESTS.value(route=SUM_ROUTE, method="GET", status=200)
+    queries_before = instrumentation.REQUEST_QUERIES.count(route=SUM_ROUTE)
+    captured = []
+    monkeypatch.setattr(instrumentation, "record_request", lambda *args: captured.append(args))
+    assert client.get("/transactionservice/sum/1").json() == {"sum": 60.0}
+    monkeypatch.undo()
+
+    route, method, status, _, stats = captured[0]
+    assert (route, method, status) == (SUM_ROUTE, "GET", 200)
+    # the existence check of the route, the root lookup, then one children query per node of the tree
+    assert stats.queries == 5
+    assert stats.sql_seconds > 0
+
+    instrumentation.record_request(*captured[0])
+    assert instrumentation.REQUESTS.value(route=SUM_ROUTE, method="GET", status=200) == requests_before + 1
+    assert instrumentation.REQUEST_QUERIES.count(route=SUM_ROUTE) == queries_before + 1
+
+
+def test_metrics_endpoint_exposes_request_and_pool_metrics(client):
+    client.get("/transactionservice/transaction/404")
+    body = client.get("/metrics").text
+
+    assert 'http_requests_total{route="/transactionservice/transaction/{transaction_id}",method="GET",status="404"}' \
+        in body
+    assert "# TYPE db_queries_per_request histogram" in body
+    assert "# TYPE db_pool_connections gauge" in body
+
+
+def test_pool_gauges_report_checked_out_connections(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    monkeypatch.setattr(instrumentation, "_instrumented_engines", {})
+    instrumentation.instrument_engine(engine, "pooled")
+    try:
+        with engine.connect():
+            status = instrumentation._pool_status()
+        assert status[("pooled", "checkedout")] == 1
+        assert instrumentation._pool_status()[("pooled", "checkedout")] == 0
+    finally:
+        engine.dispose()
+
+
+def test_chatty_requests_are_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_QUERY_THRESHOLD", 1)
+    with caplog.at_level(logging.WARNING, logger="transactionservice.metrics"):
+        client.get("/transactionservice/transaction/404")
+    assert "possible N+1" in caplog.text
+    assert "1 queries" in caplog.text
+
+
+def test_failed_statements_do_not_leak_query_timers(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'errors.db'}", pool_size=1)
+    monkeypatch.setattr(instrumentation, "_instrumented_engines", {})
+    instrumentation.instrument_engine(engine, "errors")
+    try:
+        for _ in range(3):
+            with engine.connect() as connection:
+                with pytest.raises(exc.OperationalError):
+                    connection.execute(text("SELECT * FROM missing"))
+                assert connection.info.get("query_started_at") == []
+    finally:
+        engine.dispose()
@@ -0,0 +1,99 @@
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import ArgumentError
+from sqlalchemy.pool import StaticPool
+
+from main import app
+from app.commands import migrate
+from app.config import settings
+from app.database import db
+from app.database.db import Base
+from app.metrics import instrumentation
+from app.services import coalescer
+
+
+def schema(engine) -> dict:
+    inspector = inspect(engine)
+    return {table: ({column["name"] for column in inspector.get_columns(table)},
+                    {index["name"] for index in inspector.get_indexes(table)})
+            for table in inspector.get_table_names() if table != "schema_migrations"}
+
+
+def memory_engine():
+    return create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+
+def test_migrations_build_the_schema_of_the_models():
+    migrated = memory_engine()
+    assert [version for version, _ in migrate.migrate(migrated, target=2)] == [1, 2]
+    assert [version for version, _, _ in migrate.pending_migrations(migrated)] == [3, 4, 5, 6, 7]
+    assert [version for version, _ in migrate.migrate(migrated)] == [3, 4, 5, 6, 7]
+    assert migrate.migrate(migrated) == []
+
+    created = memory_engine()
+    Base.metadata.create_all(bind=created)
+    assert schema(migrated) == schema(created)
+
+
+def test_migrations_adopt_a_database_created_by_create_all(sqlite_engine):
+    before = schema(sqlite_engine)
+    assert len(migrate.migrate(sqlite_engine)) == len(migrate.MIGRATIONS)
+    assert schema(sqlite_engine) == before
+
+
+def test_bad_database_url_does_not_break_the_import():
+    result = subprocess.run([sys.executable, "-c", "import main"], env={"DATABASE_URL": "not a url"},
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_lifespan_opens_the_engine_and_readiness_reports_the_pool(monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_URL", "sqlite://")
+    with TestClient(app) as client:
+        assert db.engine is not None
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["pools"]["primary"]["pool"] == "SingletonThreadPool"
+        coalescer.get_coalescer()
+    assert db.engine is None
+    assert coalescer._coalescer is None
+    with TestClient(app):
+        assert instrumentation._instrumented_engines["primary"] is db.engine
+
+    monkeypatch.setattr(db, "DATABASE_URL", "not a url")
+    with TestClient(app) as client:
+        assert client.get("/").status_code == 200
+        assert client.get("/ready").json() == {"status": "unavailable", "error": "ArgumentError"}
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 200
+
+
+def test_failed_init_disposes_the_engines_already_built(monkeypatch):
+    built = []
+
+    def create_recorded_engine(url, **options):
+        built.append(create_engine(url))
+        monkeypatch.setattr(built[-1], "dispose", lambda: disposed.append(url))
+        return built[-1]
+
+    disposed = []
+    monkeypatch.setattr(db, "create_engine", create_recorded_engine)
+    monkeypatch.setattr(db, "DATABASE_URL", "sqlite://")
+    monkeypatch.setattr(db, "REPLICA_DATABASE_URLS", ["sqlite://", "not a url"])
+    with pytest.raises(ArgumentError):
+        db.init_engines()
+    assert len(built) == 2 and disposed == ["sqlite://", "sqlite://"]
+    assert db.engine is None and db.replica_engines == []
+
+
+def test_warm_up_is_capped_to_the_pool_size(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}", pool_size=2, max_overflow=5)
+    assert db.warm_up_pool(engine, 10) == 2
+    assert engine.pool.checkedin() == 2
+    assert db.warm_up_pool(memory_engine(), 10) == 1
@@ -0,0 +1,45 @@
+from sqlalchemy import update
+
+from app.commands import backfill_paths
+from app.model.transection import Transaction
+from app.schemas.transection.request import BatchItem, Create
+from app.services import transection
+
+
+def test_create_with_path_writes_materialized_path(sqlite_db):
+    transection.create_with_path(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create_with_path(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    transection.create_with_path(sqlite_db, Create(amount=30.0, type="expense", parent_id=2), 12)
+    transection.create_batch(sqlite_db, [
+        BatchItem(id=13, amount=3.0, type="expense", parent_id=12),
+        BatchItem(id=11, amount=1.0, type="expense", parent_id=1),
+    ], "path")
+
+    assert transection.get_path(sqlite_db, 12) == "/1/2/12/"
+    assert transection.get_path(sqlite_db, 13) == "/1/2/12/13/"
+    assert transection.calculate_sum_using_path(sqlite_db, 1) == 64.0
+    # "/1/" must not match the subtree of 11 or 12 through a shared digit prefix
+    assert transection.calculate_sum_using_path(sqlite_db, 11) == 1.0
+    assert transection.calculate_sum_using_path(sqlite_db, 2) == 53.0
+
+
+def test_backfill_paths_from_parent_links(sqlite_engine, sqlite_db):
+    # children are created with smaller ids than their parents to force several passes
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 5)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=5), 3)
+    transection.create(sqlite_db, Create(amount=30.0, type="expense", parent_id=3), 1)
+    transection.create(sqlite_db, Create(amount=40.0, type="expense"), 2)
+
+    assert backfill_paths.backfill_paths(sqlite_engine, chunk_size=2) == 4
+    assert backfill_paths.count_missing_paths(sqlite_engine) == 0
+    sqlite_db.expire_all()
+    assert transection.get_path(sqlite_db, 1) == "/5/3/1/"
+    assert transection.calculate_sum_using_path(sqlite_db, 5) == 60.0
+
+
+def test_sum_using_path_falls_back_without_path(sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    sqlite_db.execute(update(Transaction).values(path=None))
+
+    assert transection.calculate_sum_using_path(sqlite_db, 1) == 30.0
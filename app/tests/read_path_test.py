@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from app.route import fast_json
+from app.schemas.transection.response import Response
+from benchmarks import read_path_benchmark
+
+
+@pytest.fixture(scope="function")
+def client(sqlite_db):
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_core_read_path_returns_the_same_documents(client, monkeypatch):
+    client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    client.put("/transactionservice/transaction/2", json={"amount": 20.5, "type": "expense", "parent_id": 1})
+    client.put("/transactionservice/transaction/3", json={"amount": 30.0, "type": "expense", "parent_id": 1})
+    urls = ["/transactionservice/transaction/2", "/transactionservice/transaction/9",
+            "/transactionservice/types/expense", "/transactionservice/types/expense?limit=2",
+            "/transactionservice/types/none"]
+    orm = [client.get(url) for url in urls]
+
+    monkeypatch.setattr(settings, "READ_PATH", "core")
+    core = [client.get(url) for url in urls]
+
+    for orm_response, core_response in zip(orm, core):
+        assert core_response.status_code == orm_response.status_code
+        assert core_response.json() == orm_response.json()
+        assert core_response.headers.get("X-Next-Cursor") == orm_response.headers.get("X-Next-Cursor")
+    assert core[3].headers["X-Next-Cursor"] == "2"
+    assert core[0].headers["content-type"] == "application/json"
+
+
+def test_core_read_path_keeps_the_openapi_schema(monkeypatch):
+    orm_schema = app.openapi()
+    app.openapi_schema = None
+    monkeypatch.setattr(settings, "READ_PATH", "core")
+    try:
+        assert app.openapi() == orm_schema
+    finally:
+        app.openapi_schema = None
+
+
+def test_stdlib_encoder_fallback(monkeypatch):
+    rows = [Response(id=1, amount=1.5, type="é", parent_id=None)]
+    encoded = fast_json.transactions_response(rows).body
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.transactions_response(rows).body == encoded
+
+
+def test_read_path_benchmark_report(tmp_path):
+    output = tmp_path / "report.json"
+    read_path_benchmark.main(["--rows", "50", "--repeat", "1", "--output", str(output)])
+
+    result = read_path_benchmark.json.loads(output.read_text())["results"][0]
+    assert result["rows"] == 50
+    assert set(result["core"]) == {"fetch_us_per_row", "encode_us_per_row", "total_us_per_row"}
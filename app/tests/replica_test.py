@@ -0,0 +1,125 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from app.config import settings
+from app.database import db as database
+from app.database.db import Base
+from app.database.routing import ReplicaSet, RoutingSession, is_write
+from app.schemas.transection.request import Create
+from app.services import cache, transection
+
+
+@pytest.fixture(scope="function")
+def engines(tmp_path):
+    # two independent sqlite files, the "replica" never receives the writes: a replica with infinite lag
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    for engine in (primary, replica):
+        Base.metadata.create_all(bind=engine)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture(scope="function")
+def session_factory(engines):
+    primary, replica = engines
+    return sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=primary,
+                        replicas=ReplicaSet([replica]))
+
+
+def test_is_write():
+    assert is_write(transection.ANCESTOR_SUMS_QUERY)
+    assert is_write(transection.CLOSURE_INSERT_QUERY)
+    assert not is_write(transection.LINKED_SUM_QUERY)
+    assert not is_write(None)
+
+
+def test_reads_go_to_the_replica_until_the_session_writes(session_factory):
+    db = session_factory()
+    assert transection.get_transaction(db, 1) is None
+    transection.create(db, Create(amount=10.0, type="expense"), 1)
+    # same session: read-your-writes
+    assert transection.get_transaction(db, 1).amount == 10.0
+    assert db.wrote
+    db.close()
+
+    db = session_factory()
+    assert transection.get_transaction(db, 1) is None
+    db.use_primary()
+    assert transection.get_transaction(db, 1) is not None
+    db.close()
+
+
+def test_a_session_reads_from_a_single_replica(engines, tmp_path):
+    primary, first = engines
+    second = create_engine(f"sqlite:///{tmp_path / 'second.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=second)
+    db = sessionmaker(class_=RoutingSession, bind=primary, replicas=ReplicaSet([first, second]))()
+
+    transection.get_version(db, 1)
+    transection.calculate_sum_batched(db, 1)
+    assert sorted(replica.pool.checkedout() for replica in (first, second)) == [0, 1]
+    chosen = db.replica
+
+    db.commit()
+    assert db.replica is None
+    transection.get_version(db, 1)
+    assert db.replica is not chosen
+    db.close()
+    second.dispose()
+
+
+def test_replica_policies(engines):
+    primary, replica = engines
+    round_robin = ReplicaSet([primary, replica])
+    assert [round_robin.choose() for _ in range(4)] == [primary, replica, primary, replica]
+
+    least_connections = ReplicaSet([primary, replica], "least_connections")
+    with primary.connect():
+        assert least_connections.choose() is replica
+    with pytest.raises(ValueError):
+        ReplicaSet([primary], "random")
+
+
+def test_engine_options():
+    assert database.engine_options("sqlite://", 5, 10, True, 300) == {"pool_pre_ping": True, "pool_recycle": 300}
+    assert database.engine_options("postgresql://user@host/db", 20, 5, False, -1) == \
+        {"pool_pre_ping": False, "pool_recycle": -1, "pool_size": 20, "max_overflow": 5}
+
+
+def test_clients_read_their_writes_across_requests(engines, session_factory, monkeypatch):
+    monkeypatch.setattr(database, "engine", engines[0])
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setattr(database, "replicas", session_factory.kw["replicas"])
+    writer, reader = TestClient(app), TestClient(app)
+
+    response = writer.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    assert response.status_code == 200
+    assert database.READ_PRIMARY_COOKIE in response.cookies
+
+    assert writer.get("/transactionservice/transaction/1").status_code == 200
+    # no write cookie: served by the replica, which has not seen the transaction
+    assert reader.get("/transactionservice/transaction/1").status_code == 404
+
+    # the cookie comes from the client, a value that is not a timestamp is ignored
+    reader.cookies.set(database.READ_PRIMARY_COOKIE, "x")
+    assert reader.get("/transactionservice/transaction/1").status_code == 404
+
+
+def test_cache_filled_from_a_replica_does_not_hide_the_writes(engines, session_factory, monkeypatch):
+    monkeypatch.setattr(database, "engine", engines[0])
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setattr(database, "replicas", session_factory.kw["replicas"])
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    cache.type_cache.clear()
+    writer, reader = TestClient(app), TestClient(app)
+
+    writer.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+    # the replica has not seen the write yet, the reader fills the cache with the stale page
+    assert reader.get("/transactionservice/types/expense").json() == []
+    assert [row["id"] for row in writer.get("/transactionservice/types/expense").json()] == [1]
+    cache.type_cache.clear()
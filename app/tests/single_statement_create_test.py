@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from main import app
+from app.config import settings
+from app.database.db import get_db
+from app.model.transection import Transaction, TransactionClosure
+from app.schemas.transection.request import Create
+from app.services import transection
+
+
+def insert(db, transaction_id, amount, parent_id=None, mode="adjacency"):
+    return transection.insert_transaction(db, Create(amount=amount, type="expense", parent_id=parent_id),
+                                          transaction_id, mode)
+
+
+@pytest.mark.parametrize("mode", ["adjacency", "closure", "path"])
+def test_insert_transaction_keeps_the_hierarchy_of_every_mode(sqlite_db, mode):
+    row = insert(sqlite_db, 1, 10.0, mode=mode)
+    insert(sqlite_db, 2, 20.0, parent_id=1, mode=mode)
+    insert(sqlite_db, 3, 30.0, parent_id=2, mode=mode)
+
+    assert (row.id, row.amount, row.type, row.parent_id) == (1, 10.0, "expense", None)
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 1) == 60.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 2) == 50.0
+    if mode == "closure":
+        assert sqlite_db.scalar(select(func.count()).select_from(TransactionClosure)) == 6
+        assert transection.calculate_sum_using_closure(sqlite_db, 1) == 60.0
+    if mode == "path":
+        assert transection.get_path(sqlite_db, 3) == "/1/2/3/"
+
+
+def test_insert_transaction_rejects_duplicates_and_missing_parents(sqlite_db):
+    insert(sqlite_db, 1, 10.0)
+
+    with pytest.raises(transection.TransactionRejected, match=transection.DUPLICATE_TRANSACTION):
+        insert(sqlite_db, 1, 99.0)
+    with pytest.raises(transection.TransactionRejected, match=transection.PARENT_NOT_FOUND):
+        insert(sqlite_db, 2, 20.0, parent_id=42)
+
+    assert sqlite_db.get(Transaction, 1).amount == 10.0
+    assert sqlite_db.get(Transaction, 2) is None
+
+
+def test_insert_transaction_without_returning_support(sqlite_engine, sqlite_db, monkeypatch):
+    monkeypatch.setattr(sqlite_engine.dialect, "insert_returning", False)
+    monkeypatch.setattr(transection, "ON_CONFLICT_INSERTS", {})
+
+    row = insert(sqlite_db, 1, 10.0)
+    assert (row.id, row.amount) == (1, 10.0)
+    with pytest.raises(transection.TransactionRejected, match=transection.DUPLICATE_TRANSACTION):
+        insert(sqlite_db, 1, 10.0)
+
+
+def test_put_transaction_with_single_statement_create(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_STATEMENT_CREATE", True)
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    client = TestClient(app)
+    try:
+        response = client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+        assert response.json() == {"id": 1, "amount": 10.0, "type": "expense", "parent_id": None}
+
+        response = client.put("/transactionservice/transaction/1", json={"amount": 10.0, "type": "expense"})
+        assert (response.status_code, response.json()["detail"]) == (400, transection.DUPLICATE_TRANSACTION)
+
+        response = client.put("/transactionservice/transaction/2",
+                              json={"amount": 10.0, "type": "expense", "parent_id": 3})
+        assert (response.status_code, response.json()["detail"]) == (400, transection.PARENT_NOT_FOUND)
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,39 @@
+from app.commands import subtree_sums
+from app.model.transection import Transaction
+from app.schemas.transection.request import Create
+from app.services import transection
+
+
+def build_tree(db, create=transection.create):
+    create(db, Create(amount=10.0, type="expense"), 1)
+    create(db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    create(db, Create(amount=30.0, type="expense", parent_id=1), 3)
+    create(db, Create(amount=40.0, type="expense", parent_id=2), 4)
+
+
+def test_create_updates_ancestor_subtree_sums(sqlite_db):
+    build_tree(sqlite_db)
+
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 1) == 100.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 2) == 60.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 3) == 30.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 999) == 0.0
+
+
+def test_create_v2_updates_ancestor_subtree_sums(sqlite_db):
+    build_tree(sqlite_db, create=transection.create_v2)
+
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 1) == 100.0
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 2) == 60.0
+
+
+def test_verify_reports_drift_and_rebuild_fixes_it(sqlite_db):
+    build_tree(sqlite_db)
+    sqlite_db.query(Transaction).filter(Transaction.id == 2).update({"subtree_sum": 5.0})
+    sqlite_db.commit()
+
+    assert subtree_sums.find_drift(sqlite_db) == [(2, 5.0, 60.0)]
+
+    subtree_sums.rebuild(sqlite_db, subtree_sums.find_drift(sqlite_db))
+    assert subtree_sums.find_drift(sqlite_db) == []
+    assert transection.calculate_sum_from_aggregate(sqlite_db, 2) == 60.0
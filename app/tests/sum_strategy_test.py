@@ -0,0 +1,32 @@
+import pytest
+
+from app.schemas.transection.request import Create
+from app.services import transection
+
+
+@pytest.fixture(scope="function")
+def tree_db(sqlite_db):
+    # 1 -> (2 -> 4, 5), 3 ; built with create_v2 so every strategy, closure included, can read it
+    transection.create_v2(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create_v2(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    transection.create_v2(sqlite_db, Create(amount=30.0, type="expense", parent_id=1), 3)
+    transection.create_v2(sqlite_db, Create(amount=40.0, type="expense", parent_id=2), 4)
+    transection.create_v2(sqlite_db, Create(amount=50.0, type="expense", parent_id=2), 5)
+    return sqlite_db
+
+
+@pytest.mark.parametrize("strategy", sorted(transection.SUM_STRATEGIES))
+def test_sum_strategies_agree(tree_db, strategy):
+    assert transection.calculate_transaction_sum(tree_db, 1, strategy) == 150.0
+    assert transection.calculate_transaction_sum(tree_db, 2, strategy) == 110.0
+    assert transection.calculate_transaction_sum(tree_db, 3, strategy) == 30.0
+
+
+def test_get_children_amounts_is_chunked(tree_db):
+    children = transection.get_children_amounts(tree_db, [1, 2], chunk_size=1)
+    assert sorted(children) == [(2, 20.0), (3, 30.0), (4, 40.0), (5, 50.0)]
+
+
+def test_unknown_sum_strategy(tree_db):
+    with pytest.raises(ValueError):
+        transection.calculate_transaction_sum(tree_db, 1, "unknown")
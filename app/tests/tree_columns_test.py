@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import select, update
+
+from app.commands import backfill_tree_columns, partition_by_root
+from app.config import settings
+from app.model.transection import Transaction
+from app.schemas.transection.request import BatchItem, Create
+from app.services import transection
+
+
+def positions(db) -> dict:
+    db.expire_all()
+    return {row.id: (row.root_id, row.depth)
+            for row in db.execute(select(Transaction.id, Transaction.root_id, Transaction.depth))}
+
+
+@pytest.mark.parametrize("mode", sorted(transection.CREATE_STRATEGIES))
+def test_create_paths_fill_root_and_depth(sqlite_db, mode):
+    transection.create_transaction(sqlite_db, Create(amount=10.0, type="expense"), 1, mode)
+    transection.create_transaction(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2, mode)
+    transection.insert_transaction(sqlite_db, Create(amount=30.0, type="expense", parent_id=2), 3, mode)
+    transection.create_batch(sqlite_db, [BatchItem(id=5, amount=5.0, type="expense", parent_id=4),
+                                         BatchItem(id=4, amount=4.0, type="expense", parent_id=3),
+                                         BatchItem(id=6, amount=6.0, type="expense")], mode)
+
+    assert positions(sqlite_db) == {1: (1, 0), 2: (1, 1), 3: (1, 2), 4: (1, 3), 5: (1, 4), 6: (6, 0)}
+
+
+def test_sum_in_tree(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TREE_COLUMNS_BACKFILLED", True)
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    transection.create(sqlite_db, Create(amount=30.0, type="expense", parent_id=2), 3)
+    transection.create(sqlite_db, Create(amount=40.0, type="expense", parent_id=1), 4)
+    transection.create(sqlite_db, Create(amount=1.0, type="expense"), 5)
+
+    assert transection.calculate_sum_in_tree(sqlite_db, 1) == 100.0
+    assert transection.calculate_sum_in_tree(sqlite_db, 2) == 50.0
+    assert transection.calculate_sum_in_tree(sqlite_db, 404) == 0.0
+
+    # rows written before the columns existed fall back to the parent_id walk
+    sqlite_db.execute(update(Transaction).values(root_id=None, depth=None))
+    assert transection.calculate_sum_in_tree(sqlite_db, 1) == 100.0
+
+
+def test_sum_in_tree_before_the_backfill(sqlite_db):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 2)
+    # the root is backfilled, its child not yet
+    sqlite_db.execute(update(Transaction).where(Transaction.id == 2).values(root_id=None, depth=None))
+    assert transection.calculate_sum_in_tree(sqlite_db, 1) == 30.0
+
+
+def test_backfill_tree_columns(sqlite_engine, sqlite_db):
+    # children are created with smaller ids than their parents to force several passes
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 5)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=5), 3)
+    transection.create(sqlite_db, Create(amount=30.0, type="expense", parent_id=3), 1)
+    transection.create(sqlite_db, Create(amount=40.0, type="expense"), 2)
+    sqlite_db.execute(update(Transaction).values(root_id=None, depth=None))
+    sqlite_db.commit()
+
+    assert backfill_tree_columns.ensure_tree_columns(sqlite_engine) is False
+    assert backfill_tree_columns.backfill_tree_columns(sqlite_engine, chunk_size=2) == 4
+    assert backfill_tree_columns.count_missing_positions(sqlite_engine) == 0
+    assert positions(sqlite_db) == {1: (5, 2), 2: (2, 0), 3: (5, 1), 5: (5, 0)}
+
+
+def test_bfs_export_of_a_root_from_the_tree_index(sqlite_db, monkeypatch):
+    transection.create(sqlite_db, Create(amount=10.0, type="expense"), 1)
+    transection.create(sqlite_db, Create(amount=20.0, type="expense", parent_id=1), 3)
+    transection.create(sqlite_db, Create(amount=30.0, type="expense", parent_id=1), 2)
+    transection.create(sqlite_db, Create(amount=40.0, type="expense", parent_id=3), 4)
+
+    def export(order, max_depth):
+        return [tuple(row) for row in transection.stream_subtree(sqlite_db, 1, order, max_depth)]
+
+    expected = {(order, max_depth): export(order, max_depth) for order in ("bfs", "dfs") for max_depth in (None, 1)}
+    monkeypatch.setattr(settings, "TREE_COLUMNS_BACKFILLED", True)
+    for (order, max_depth), rows in expected.items():
+        assert export(order, max_depth) == rows
+    assert [row.id for row in transection.stream_subtree(sqlite_db, 3)] == [3, 4]
+
+
+def test_partition_statements():
+    statements = partition_by_root.partition_statements(4)
+    assert sum("PARTITION OF transactions_partitioned" in statement for statement in statements) == 4
+    assert "PRIMARY KEY (root_id, id)" in statements[1]
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.database.db import get_db
+from app.repository.memory import InMemoryTransactionRepository
+from app.schemas.transection.request import BatchItem
+from app.services import transection
+
+# 1 -> (3 -> 5, 2 -> 4), 6 is another root
+ROWS = [(1, None, 1.0), (3, 1, 3.0), (2, 1, 2.0), (5, 3, 5.0), (4, 2, 4.0), (6, None, 6.0)]
+BFS = [(1, 0), (2, 1), (3, 1), (4, 2), (5, 2)]
+DFS = [(1, 0), (2, 1), (4, 2), (3, 1), (5, 2)]
+
+
+def items():
+    return [BatchItem(id=transaction_id, amount=amount, type="expense", parent_id=parent_id)
+            for transaction_id, parent_id, amount in ROWS]
+
+
+@pytest.fixture(scope="function")
+def tree_db(sqlite_db):
+    transection.create_batch(sqlite_db, items(), "adjacency")
+    return sqlite_db
+
+
+@pytest.mark.parametrize("order, expected", [("bfs", BFS), ("dfs", DFS)])
+def test_stream_subtree_orders(tree_db, order, expected):
+    rows = list(transection.stream_subtree(tree_db, 1, order=order, batch_size=2))
+    assert [(row.id, row.depth) for row in rows] == expected
+    assert rows[1]._asdict() == {"id": 2, "amount": 2.0, "type": "expense", "parent_id": 1, "depth": 1}
+
+
+def test_only_dfs_builds_the_sort_key():
+    assert "sort_key" not in transection.subtree_query("sqlite", "bfs").text
+    assert "sort_key" in transection.subtree_query("sqlite", "dfs").text
+
+
+def test_stream_subtree_max_depth(tree_db):
+    assert [row.id for row in transection.stream_subtree(tree_db, 1, max_depth=1)] == [1, 2, 3]
+    assert [row.id for row in transection.stream_subtree(tree_db, 3, max_depth=0)] == [3]
+    assert list(transection.stream_subtree(tree_db, 42)) == []
+
+
+@pytest.mark.parametrize("order, expected", [("bfs", BFS), ("dfs", DFS)])
+def test_memory_repository_uses_the_same_order(order, expected):
+    repository = InMemoryTransactionRepository()
+    repository.create_batch(items())
+    assert [(row.id, row.depth) for row in repository.stream_subtree(1, order=order)] == expected
+    assert [row.id for row in repository.stream_subtree(1, order=order, max_depth=1)] == [1, 2, 3]
+
+
+def test_tree_endpoint(tree_db):
+    app.dependency_overrides[get_db] = lambda: tree_db
+    try:
+        client = TestClient(app)
+        response = client.get("/transactionservice/tree/2")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {"id": 2, "amount": 2.0, "type": "expense", "parent_id": 1, "depth": 0},
+            {"id": 4, "amount": 4.0, "type": "expense", "parent_id": 2, "depth": 1},
+        ]
+        dfs = client.get("/transactionservice/tree/1", params={"order": "dfs", "max_depth": 1})
+        assert [json.loads(line)["id"] for line in dfs.text.splitlines()] == [1, 2, 3]
+        assert client.get("/transactionservice/tree/42").status_code == 404
+        assert client.get("/transactionservice/tree/1", params={"order": "random"}).status_code == 422
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,89 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from main import app
+from app.commands import type_stats
+from app.config import settings
+from app.database.db import get_db
+from app.model.transection import TransactionTypeStats
+from app.repository.memory import InMemoryTransactionRepository
+from app.schemas.transection.request import BatchItem, Create
+from app.services import transection
+
+EXPENSES = {"type": "expense", "count": 4, "sum": 100.0, "min": 5.0, "max": 50.0}
+
+
+def create_expenses(db):
+    transection.create(db, Create(amount=10.0, type="expense"), 1)
+    transection.create_v2(db, Create(amount=50.0, type="expense", parent_id=1), 2)
+    transection.create_batch(db, [BatchItem(id=3, amount=35.0, type="expense", parent_id=2),
+                                  BatchItem(id=4, amount=5.0, type="expense"),
+                                  BatchItem(id=5, amount=7.0, type="income")], "adjacency")
+
+
+def test_create_paths_update_the_type_stats(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", True)
+    create_expenses(sqlite_db)
+
+    assert transection.get_type_stats(sqlite_db, "expense") == EXPENSES
+    assert transection.get_type_stats(sqlite_db, "income") == \
+        {"type": "income", "count": 1, "sum": 7.0, "min": 7.0, "max": 7.0}
+    assert transection.get_type_stats(sqlite_db, "none") == \
+        {"type": "none", "count": 0, "sum": 0.0, "min": None, "max": None}
+
+
+def test_type_stats_rows_are_locked_in_type_order(sqlite_engine, sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", True)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "transaction_type_stats" in statement:
+            statements.append(parameters)
+
+    event.listen(sqlite_engine, "before_cursor_execute", record)
+    transection.add_to_type_stats(sqlite_db, [("income", 1.0), ("expense", 2.0), ("bonus", 3.0)])
+    event.remove(sqlite_engine, "before_cursor_execute", record)
+    # one upsert, its VALUES in type order: (type, count, total, min, max) per row
+    assert [value for value in statements[0] if isinstance(value, str)] == ["bonus", "expense", "income"]
+
+
+def test_type_stats_without_on_conflict_support(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", True)
+    monkeypatch.setattr(transection, "ON_CONFLICT_INSERTS", {})
+    create_expenses(sqlite_db)
+    assert transection.get_type_stats(sqlite_db, "expense") == EXPENSES
+
+
+def test_type_stats_from_the_index_when_disabled(sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", False)
+    create_expenses(sqlite_db)
+
+    assert sqlite_db.execute(select(TransactionTypeStats)).all() == []
+    assert transection.get_type_stats(sqlite_db, "expense") == EXPENSES
+
+
+def test_rebuild_type_stats(sqlite_engine, sqlite_db, monkeypatch):
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", False)
+    create_expenses(sqlite_db)
+    sqlite_db.close()
+    monkeypatch.setattr(settings, "TYPE_STATS_ENABLED", True)
+
+    type_stats.ensure_type_stats_schema(sqlite_engine)
+    assert type_stats.rebuild_type_stats(sqlite_engine) == 2
+    assert transection.get_type_stats(sqlite_db, "expense") == EXPENSES
+
+
+def test_memory_repository_type_stats():
+    repository = InMemoryTransactionRepository()
+    repository.create(Create(amount=10.0, type="expense"), 1)
+    repository.create_batch([BatchItem(id=2, amount=4.0, type="expense", parent_id=1)])
+    assert repository.type_stats("expense") == {"type": "expense", "count": 2, "sum": 14.0, "min": 4.0, "max": 10.0}
+
+
+def test_type_stats_endpoint(sqlite_db):
+    create_expenses(sqlite_db)
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    try:
+        assert TestClient(app).get("/transactionservice/types/expense/stats").json() == EXPENSES
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.database.db import get_db
+from app.schemas.transection.request import BatchItem
+from app.services import transection
+
+
+@pytest.fixture(scope="function")
+def client(sqlite_db):
+    transection.create_batch(sqlite_db, [
+        BatchItem(id=transaction_id, amount=float(transaction_id), type="expense" if transaction_id % 2 else "income")
+        for transaction_id in range(1, 11)
+    ], "adjacency")
+    app.dependency_overrides[get_db] = lambda: sqlite_db
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_types_keyset_pagination(client):
+    first_page = client.get("/transactionservice/types/expense", params={"limit": 3})
+    assert [row["id"] for row in first_page.json()] == [1, 3, 5]
+    assert first_page.headers["X-Next-Cursor"] == "5"
+
+    last_page = client.get("/transactionservice/types/expense", params={"limit": 3, "after": 5})
+    assert [row["id"] for row in last_page.json()] == [7, 9]
+    assert "X-Next-Cursor" not in last_page.headers
+
+
+def test_types_limit_is_bounded(client):
+    assert client.get("/transactionservice/types/expense", params={"limit": 0}).status_code == 422
+
+
+def test_types_stream_ndjson(client):
+    response = client.get("/transactionservice/types/income/stream", params={"after": 4})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"id": transaction_id, "amount": float(transaction_id), "type": "income", "parent_id": None}
+        for transaction_id in (6, 8, 10)
+    ]
+
+
+def test_stream_is_fetched_in_batches(sqlite_db, client):
+    rows = transection.stream_transactions_by_type(sqlite_db, "expense", batch_size=2)
+    assert [row.id for row in rows] == [1, 3, 5, 7, 9]
@@ -0,0 +1,66 @@
+"""
+Synthetic transaction hierarchies for the benchmarks.
+
+Every generator returns (id, parent_id, amount) tuples with parents listed before their children,
+ids start at 1 and amounts are deterministic so results are comparable between runs.
+"""
+import random
+
+SHAPES = ("chain", "star", "balanced", "forest")
+
+
+def chain(size: int) -> list:
+    """
+    Single deep branch, depth == size: worst case for the recursive walks and the closure table.
+    """
+    return [(i, i - 1 if i > 1 else None, float(i % 100 + 1)) for i in range(1, size + 1)]
+
+
+def star(size: int) -> list:
+    """
+    One root with size - 1 direct children: the widest possible level.
+    """
+    return [(i, 1 if i > 1 else None, float(i % 100 + 1)) for i in range(1, size + 1)]
+
+
+def balanced(size: int, branching: int = 2) -> list:
+    """
+    Complete tree with `branching` children per node, depth log(size).
+    """
+    return [(i, (i - 2) // branching + 1 if i > 1 else None, float(i % 100 + 1)) for i in range(1, size + 1)]
+
+
+def forest(size: int, root_probability: float = 0.01, seed: int = 42) -> list:
+    """
+    Random forest: every node starts a new tree with `root_probability`, otherwise it hangs from a random
+    earlier node, which gives a mix of shallow and deep subtrees.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, size + 1):
+        parent_id = None if i == 1 or rng.random() < root_probability else rng.randint(1, i - 1)
+        rows.append((i, parent_id, float(i % 100 + 1)))
+    return rows
+
+
+def generate(shape: str, size: int, seed: int = 42) -> list:
+    if shape == "chain":
+        return chain(size)
+    if shape == "star":
+        return star(size)
+    if shape == "balanced":
+        return balanced(size)
+    if shape == "forest":
+        return forest(size, seed=seed)
+    raise ValueError(f"Unknown shape '{shape}', expected one of {SHAPES}")
+
+
+def subtree_sums(rows: list) -> dict:
+    """
+    Reference totals used to check every strategy returns the right answer.
+    """
+    totals = {transaction_id: amount for transaction_id, _, amount in rows}
+    for transaction_id, parent_id, _ in reversed(rows):
+        if parent_id is not None:
+            totals[parent_id] += totals[transaction_id]
+    return totals
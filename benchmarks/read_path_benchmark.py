@@ -0,0 +1,138 @@
+"""
+CPU cost per row of the two read paths of GET /types/{type} (READ_PATH=orm|core) on large listings.
+
+    python -m benchmarks.read_path_benchmark --rows 10000 100000 --output read_paths.json
+
+For every listing size the rows of one type are read and encoded the way each read path of the route does:
+    orm  -> ORM query, Response model validation, JSON encoding of the validated models (what FastAPI does)
+    core -> Core select of row tuples, fast_json encoding
+CPU time (time.process_time) is reported per row for the fetch and the encode steps separately.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import sqlalchemy
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database.db import Base  # noqa: E402
+from app.model.transection import Transaction  # noqa: E402
+from app.route import fast_json  # noqa: E402
+from app.schemas.transection.response import Response  # noqa: E402
+from app.services import transection  # noqa: E402
+
+TYPE = "benchmark"
+RESPONSE_LIST = TypeAdapter(list[Response])
+
+
+def load_rows(engine, rows: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Transaction), [
+            {"id": transaction_id, "amount": float(transaction_id), "type": TYPE, "parent_id": None,
+             "subtree_sum": float(transaction_id)}
+            for transaction_id in range(1, rows + 1)
+        ])
+
+
+def orm_path(db):
+    transactions = transection.get_transactions_by_type(db, TYPE)
+    fetched_at = time.process_time()
+    # response_model validation followed by the serialization of the JSONResponse
+    body = json.dumps(jsonable_encoder(RESPONSE_LIST.validate_python(transactions, from_attributes=True)),
+                      ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return fetched_at, body
+
+
+def core_path(db):
+    rows = transection.get_transaction_rows_by_type(db, TYPE)
+    fetched_at = time.process_time()
+    body = fast_json.transactions_response(rows).body
+    return fetched_at, body
+
+
+READ_PATHS = {"orm": orm_path, "core": core_path}
+
+
+def time_read_path(session_factory, read_path, rows: int, repeat: int) -> dict:
+    fetch, encode = [], []
+    body = None
+    for _ in range(repeat):
+        # a fresh session per run, as per request, so the ORM identity map starts empty
+        db = session_factory()
+        try:
+            started_at = time.process_time()
+            fetched_at, body = read_path(db)
+            encode.append(time.process_time() - fetched_at)
+            fetch.append(fetched_at - started_at)
+        finally:
+            db.close()
+    fetch_us, encode_us = min(fetch) / rows * 1e6, min(encode) / rows * 1e6
+    return {"fetch_us_per_row": fetch_us, "encode_us_per_row": encode_us, "total_us_per_row": fetch_us + encode_us,
+            "body": body}
+
+
+def run(args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="transactions-read-bench-"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    results = []
+    try:
+        for rows in args.rows:
+            load_rows(engine, rows)
+            timings = {name: time_read_path(session_factory, read_path, rows, args.repeat)
+                       for name, read_path in READ_PATHS.items()}
+            if json.loads(timings["orm"].pop("body")) != json.loads(timings["core"].pop("body")):
+                raise AssertionError(f"read paths returned different documents for {rows} rows")
+            results.append({
+                "rows": rows,
+                **timings,
+                "cpu_saving_per_row_pct": 100 * (1 - timings["core"]["total_us_per_row"]
+                                                 / timings["orm"]["total_us_per_row"]),
+            })
+    finally:
+        engine.dispose()
+
+    return {
+        "metadata": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "encoder": "orjson" if fast_json.orjson is not None else "json",
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the orm and core read paths of GET /types/{type}")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per read path, the fastest one is reported")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
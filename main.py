@@ -1,15 +1,65 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import db
+from app.metrics import instrumentation
+from app.route import transection, transection_async
+from app.route.compression import CompressionMiddleware
+from app.services import coalescer
+
+logger = logging.getLogger("transactionservice")
+
+
+async def open_database():
+    """
+    Builds the engines and warms their pools. A failure is logged instead of stopping the worker,
+    GET /ready reports it until the database can be reached.
+    """
+    await run_in_threadpool(db.init_engines)
+    if settings.DB_MODE == "async":
+        await db.warm_up_async_pool(settings.DB_POOL_WARMUP)
+    else:
+        for sync_engine in [db.engine] + db.replica_engines:
+            await run_in_threadpool(db.warm_up_pool, sync_engine, settings.DB_POOL_WARMUP)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The schema is not created here, apply it with `python -m app.commands.migrate` before starting the workers.
+    """
+    if settings.STORAGE_BACKEND != "memory":
+        try:
+            await open_database()
+        except Exception:
+            logger.exception("database not available at startup")
+    yield
+    # the queued creates are written before their engine goes away
+    await run_in_threadpool(coalescer.close_coalescer)
+    await db.dispose_engines()
 
-from app.database.db import engine, Base
-from app.route.transection import router
 
-app = FastAPI()
-Base.metadata.create_all(bind=engine)
+app = FastAPI(lifespan=lifespan)
+if settings.METRICS_ENABLED:
+    app.add_middleware(instrumentation.MetricsMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE,
+                       level=settings.COMPRESSION_LEVEL)
 
 """
 Here we bind transaction with main app module  
+DB_MODE=async serves the same API through the async engine, the sync routes stay available for comparison
 """
-app.include_router(router)
+if settings.DB_MODE == "async":
+    app.include_router(transection_async.router)
+else:
+    app.include_router(transection.router)
 
 
 @app.get("/")
@@ -22,3 +72,39 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=500, detail="Service is not healthy")
 
+
+def ping_database():
+    with db.get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def ping_async_database():
+    db.get_engine()
+    async with db.async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint: 200 once the database answers, with the state of the connection pools of the worker,
+    503 otherwise. Unlike the / health check it needs the database.
+    """
+    if settings.STORAGE_BACKEND == "memory":
+        return {"status": "ready", "pools": {}}
+    try:
+        if settings.DB_MODE == "async":
+            await ping_async_database()
+        else:
+            await run_in_threadpool(ping_database)
+    except Exception as e:
+        return JSONResponse({"status": "unavailable", "error": type(e).__name__}, status_code=503)
+    return {"status": "ready", "pools": {name: db.pool_state(engine) for name, engine in db.engines().items()}}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint: per route latency, SQL query count/time, rows and pool checkout wait.
+    """
+    return PlainTextResponse(instrumentation.render(), media_type="text/plain; version=0.0.4")